@@ -1,11 +1,27 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
-from models import Listener, init_database
-from scheduler import start_scheduler, run_manual_check
+import models
+from models import Listener, AuctionItem, JobRecord, PriceHistory, DataVersion, SystemStats, init_database
 from email_service import email_service
+from listener_snapshot import listener_snapshot
+from events import event_bus, format_event
+from event_relay import stored_event_relay
+from jobs import job_summary
+from leases import lease_status
+from polling import PollPlanner
+from metrics import registry, CONTENT_TYPE
+from profiling import cycle_profiler
+from pricing import parse_amount, format_cents
+from queries import parse_query, fetch_terms_for, QuerySyntaxError
+import csv
+import io
+import json
 import logging
-from email_validator import validate_email, EmailNotValidError
+import os
+from email_validator import EmailNotValidError
+from email_validation import check_email, check_emails, validation_stats
 import threading
+import time
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -17,13 +33,167 @@ CORS(app)  # Enable CORS for all routes
 # Initialize database
 init_database()
 
-# Start the auction scheduler in a separate thread
-def start_background_scheduler():
-    start_scheduler()
+# 'embedded' runs the scheduler inside this process; 'external' leaves it to
+# worker.py so the API can run under a multi-worker WSGI server
+SCHEDULER_MODE = os.getenv('SCHEDULER_MODE', 'embedded').lower()
 
-# Start scheduler in background thread
-scheduler_thread = threading.Thread(target=start_background_scheduler, daemon=True)
-scheduler_thread.start()
+if SCHEDULER_MODE == 'embedded':
+    from scheduler import start_scheduler, auction_scheduler
+    
+    # Start the auction scheduler in a separate thread
+    def start_background_scheduler():
+        start_scheduler()
+    
+    # Start scheduler in background thread
+    scheduler_thread = threading.Thread(target=start_background_scheduler, daemon=True)
+    scheduler_thread.start()
+else:
+    # Checks are requested and tracked through the jobs table instead
+    auction_scheduler = None
+
+# Largest listener import accepted in one request
+IMPORT_MAX_ROWS = int(os.getenv('IMPORT_MAX_ROWS', '50000'))
+
+# Comment line sent to idle live event streams so proxies keep them open
+EVENT_KEEPALIVE_SECONDS = float(os.getenv('EVENT_KEEPALIVE_SECONDS', '15'))
+
+# Last /api/stats aggregates, reused until the data version moves
+stats_cache = {'version': None, 'stats': None}
+stats_lock = threading.Lock()
+
+def request_check(source='manual'):
+    """Request a full check, returning (job dict, merged)"""
+    if auction_scheduler is not None:
+        job, merged = auction_scheduler.request_check(source=source)
+        return job.to_dict(), merged
+    return JobRecord.request('full', source)
+
+def request_term_check(listener):
+    """Request a targeted check for a new listener, returning (job dict, merged)"""
+    if auction_scheduler is not None:
+        job, merged = auction_scheduler.request_term_check(listener)
+        return job.to_dict(), merged
+    return JobRecord.request('term', 'listener', term=listener.search_term, listener_ids=[listener.id])
+
+def job_status():
+    """Current, pending and recent jobs"""
+    if auction_scheduler is not None:
+        return auction_scheduler.jobs.status()
+    return JobRecord.status()
+
+def listener_data(listener):
+    """JSON view of a listener, with price bounds in cents and formatted"""
+    price_range = None
+    if listener.price_bounded:
+        price_range = (f"{format_cents(listener.min_price_cents) or 'any'} - "
+                       f"{format_cents(listener.max_price_cents) or 'any'}")
+    
+    return {
+        'id': listener.id,
+        'email': listener.email,
+        'search_term': listener.search_term,
+        'created_at': listener.created_at,
+        'active': listener.active,
+        'min_price_cents': listener.min_price_cents,
+        'max_price_cents': listener.max_price_cents,
+        'price_range': price_range
+    }
+
+def item_data(item):
+    """JSON view of a stored auction item"""
+    return {
+        'id': item.id,
+        'title': item.title,
+        'url': item.url,
+        'description': item.description,
+        'price': item.price,
+        'price_cents': item.price_cents,
+        'currency': item.currency,
+        'end_time': item.end_time,
+        'image_url': item.image_url,
+        'scraped_at': item.scraped_at
+    }
+
+def build_listener(data, email_checked=False):
+    """
+    Validate listener fields from a request body or an import row
+    Returns (listener, parsed query); raises ValueError with the message for the client.
+    email_checked skips the address check for callers that validated emails in bulk
+    """
+    email = str(data.get('email') or '').strip()
+    search_term = str(data.get('search_term') or '').strip()
+    
+    # Validate input
+    if not email or not search_term:
+        raise ValueError('Email and search term are required')
+    
+    # Validate email format and that the domain accepts mail (cached per domain)
+    if not email_checked:
+        try:
+            check_email(email)
+        except EmailNotValidError:
+            raise ValueError('Invalid email format')
+    
+    # Validate search term length
+    if len(search_term) < 2:
+        raise ValueError('Search term must be at least 2 characters long')
+    
+    # Plain terms match as substrings; AND / OR / NOT and "phrases" must parse
+    try:
+        query = parse_query(search_term)
+    except QuerySyntaxError as e:
+        raise ValueError(f'Invalid search query: {e}')
+    
+    # Optional price range, e.g. 500 or "R 1,500"
+    try:
+        min_price_cents = parse_amount(data.get('min_price'))
+        max_price_cents = parse_amount(data.get('max_price'))
+    except ValueError:
+        raise ValueError('Minimum and maximum price must be amounts like 1500 or "R 1,500"')
+    
+    if min_price_cents is not None and max_price_cents is not None and min_price_cents > max_price_cents:
+        raise ValueError('Minimum price cannot be above maximum price')
+    
+    listener = Listener(email=email, search_term=search_term,
+                        min_price_cents=min_price_cents, max_price_cents=max_price_cents)
+    return listener, query
+
+def export_row(listener):
+    """Flat view of a listener for export; prices in currency units so the file can be re-imported"""
+    return {
+        'id': listener.id,
+        'email': listener.email,
+        'search_term': listener.search_term,
+        'min_price': f"{listener.min_price_cents / 100:.2f}" if listener.min_price_cents is not None else '',
+        'max_price': f"{listener.max_price_cents / 100:.2f}" if listener.max_price_cents is not None else '',
+        'created_at': listener.created_at
+    }
+
+def read_import_rows(stream, fmt):
+    """Yield (row number, row dict or None, error or None) from a JSON lines or CSV upload"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        if not reader.fieldnames or not {'email', 'search_term'} <= set(reader.fieldnames):
+            raise ValueError('CSV imports need a header row with email and search_term columns')
+        for number, row in enumerate(reader, start=1):
+            yield number, row, None
+        return
+    
+    number = 0
+    for line in text:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield number, None, 'Line is not valid JSON'
+            continue
+        if not isinstance(row, dict):
+            yield number, None, 'Line is not a JSON object'
+            continue
+        yield number, row, None
 
 @app.route('/', methods=['GET'])
 def home():
@@ -33,6 +203,11 @@ def home():
         'message': 'Aucor Auction Listener API is running'
     })
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics for this process"""
+    return Response(registry.render(), mimetype=None, content_type=CONTENT_TYPE)
+
 @app.route('/api/listeners', methods=['POST'])
 def add_listener():
     """Add a new auction listener"""
@@ -42,35 +217,23 @@ def add_listener():
         if not data:
             return jsonify({'error': 'No data provided'}), 400
         
-        email = data.get('email', '').strip()
-        search_term = data.get('search_term', '').strip()
-        
-        # Validate input
-        if not email or not search_term:
-            return jsonify({'error': 'Email and search term are required'}), 400
-        
-        # Validate email format
         try:
-            validate_email(email)
-        except EmailNotValidError:
-            return jsonify({'error': 'Invalid email format'}), 400
-        
-        # Validate search term length
-        if len(search_term) < 2:
-            return jsonify({'error': 'Search term must be at least 2 characters long'}), 400
+            listener, query = build_listener(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         # Create and save listener
-        listener = Listener(email=email, search_term=search_term)
-        
         if listener.save():
-            logger.info(f"New listener added: {email} for term '{search_term}'")
+            logger.info(f"New listener added: {listener.email} for term '{listener.search_term}'")
+            
+            # Scrape just this term right away instead of waiting for the next full cycle
+            job, _ = request_term_check(listener)
+            
             return jsonify({
                 'message': 'Listener added successfully',
-                'listener': {
-                    'id': listener.id,
-                    'email': listener.email,
-                    'search_term': listener.search_term
-                }
+                'listener': listener_data(listener),
+                'fetch_terms': fetch_terms_for(query),
+                'job_id': job['id']
             }), 201
         else:
             return jsonify({'error': 'This email and search term combination already exists'}), 409
@@ -79,29 +242,114 @@ def add_listener():
         logger.error(f"Error adding listener: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/listeners/import', methods=['POST'])
+def import_listeners():
+    """
+    Add many listeners from JSON lines or CSV (email, search_term, min_price, max_price)
+    Valid rows are inserted in one transaction; invalid and duplicate rows are reported
+    """
+    try:
+        fmt = (request.args.get('format') or ('csv' if 'csv' in (request.content_type or '') else 'jsonl')).lower()
+        if fmt not in ('jsonl', 'csv'):
+            return jsonify({'error': 'format must be jsonl or csv'}), 400
+        
+        try:
+            rows = []
+            for row in read_import_rows(request.stream, fmt):
+                rows.append(row)
+                if len(rows) > IMPORT_MAX_ROWS:
+                    return jsonify({'error': f'Imports are limited to {IMPORT_MAX_ROWS} rows'}), 413
+        except (ValueError, csv.Error) as e:
+            return jsonify({'error': f'Could not read import: {e}'}), 400
+        
+        if not rows:
+            return jsonify({'error': 'No data provided'}), 400
+        
+        # Every distinct domain is checked once, through the shared domain cache
+        email_errors = check_emails(
+            str(data.get('email') or '').strip() for _, data, error in rows if error is None
+        )
+        
+        problems = []
+        accepted = []
+        for number, data, error in rows:
+            if error is None and email_errors.get(str(data.get('email') or '').strip()):
+                error = 'Invalid email format'
+            if error is None:
+                try:
+                    listener, _ = build_listener(data, email_checked=True)
+                    accepted.append((number, listener))
+                    continue
+                except ValueError as e:
+                    error = str(e)
+            problems.append({'row': number, 'status': 'invalid', 'error': error})
+        
+        inserted = Listener.save_many([listener for _, listener in accepted])
+        for (number, listener), created in zip(accepted, inserted):
+            if not created:
+                problems.append({'row': number, 'status': 'duplicate',
+                                 'error': 'This email and search term combination already exists'})
+        problems.sort(key=lambda problem: problem['row'])
+        
+        created = sum(inserted)
+        logger.info(f"Imported {created} listeners from {len(rows)} {fmt} rows")
+        
+        # New terms are picked up by the next scheduled check rather than one job per row
+        return jsonify({
+            'message': f'Imported {created} listeners',
+            'rows': len(rows),
+            'created': created,
+            'duplicates': sum(1 for problem in problems if problem['status'] == 'duplicate'),
+            'invalid': sum(1 for problem in problems if problem['status'] == 'invalid'),
+            'problems': problems
+        })
+        
+    except Exception as e:
+        logger.error(f"Error importing listeners: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/listeners/export', methods=['GET'])
+def export_listeners():
+    """Stream every active listener as JSON lines or CSV without loading them all at once"""
+    fmt = request.args.get('format', 'jsonl').lower()
+    if fmt not in ('jsonl', 'csv'):
+        return jsonify({'error': 'format must be jsonl or csv'}), 400
+    
+    def generate():
+        if fmt == 'jsonl':
+            for listener in Listener.iter_all():
+                yield json.dumps(export_row(listener)) + '\n'
+            return
+        
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=['id', 'email', 'search_term', 'min_price', 'max_price', 'created_at'])
+        writer.writeheader()
+        for listener in Listener.iter_all():
+            writer.writerow(export_row(listener))
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(generate(), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename=listeners.{fmt}'})
+
 @app.route('/api/listeners/<email>', methods=['GET'])
 def get_listeners(email):
     """Get all listeners for a specific email"""
     try:
-        # Validate email format
+        # Validate email format; a lookup needs no DNS check
         try:
-            validate_email(email)
+            check_email(email, deliverability=False)
         except EmailNotValidError:
             return jsonify({'error': 'Invalid email format'}), 400
         
-        listeners = Listener.get_by_email(email)
+        # Served from the shared listener snapshot rather than a query per request
+        listeners = listener_snapshot.get().by_email.get(email, ())
         
-        listeners_data = []
-        for listener in listeners:
-            listeners_data.append({
-                'id': listener.id,
-                'email': listener.email,
-                'search_term': listener.search_term,
-                'created_at': listener.created_at,
-                'active': listener.active
-            })
-        
-        return jsonify({'listeners': listeners_data})
+        return jsonify({'listeners': [listener_data(listener) for listener in listeners]})
         
     except Exception as e:
         logger.error(f"Error retrieving listeners: {e}")
@@ -132,9 +380,9 @@ def test_email():
         
         email = data.get('email', '').strip()
         
-        # Validate email format
+        # Validate email format and that the domain accepts mail (cached per domain)
         try:
-            validate_email(email)
+            check_email(email)
         except EmailNotValidError:
             return jsonify({'error': 'Invalid email format'}), 400
         
@@ -152,29 +400,255 @@ def test_email():
 def manual_check():
     """Manually trigger an auction check"""
     try:
-        # Run manual check in background thread to avoid blocking
-        check_thread = threading.Thread(target=run_manual_check, daemon=True)
-        check_thread.start()
+        # Overlapping requests are merged into the run already queued or in progress
+        job, merged = request_check(source='manual')
         
-        return jsonify({'message': 'Manual auction check started'})
+        current = job_status()['current']
+        if merged:
+            message = 'An auction check is already queued or running; your request was merged into it'
+        elif current is not None and current['id'] != job['id']:
+            message = 'Manual auction check queued behind the check in progress'
+        else:
+            message = 'Manual auction check started'
+        
+        return jsonify({'message': message, 'merged': merged, 'job': job}), 202
         
     except Exception as e:
         logger.error(f"Error running manual check: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/jobs', methods=['GET'])
+def get_jobs():
+    """Get the current, queued and recent check jobs"""
+    try:
+        return jsonify(job_status())
+        
+    except Exception as e:
+        logger.error(f"Error getting jobs: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get status and progress for a specific check job"""
+    try:
+        job = auction_scheduler.jobs.get(job_id) if auction_scheduler is not None else None
+        job = job.to_dict() if job is not None else JobRecord.get(job_id)
+        
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        return jsonify(job)
+        
+    except Exception as e:
+        logger.error(f"Error getting job {job_id}: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/events', methods=['GET'])
+def stream_events():
+    """
+    Server-Sent Events: check job progress for every viewer, plus new matches
+    and price changes for the listeners of ?email=. Browsers reconnect with
+    Last-Event-ID and are sent the recent events they missed. Without an
+    embedded scheduler the events are relayed from the database
+    """
+    email = (request.args.get('email') or '').strip() or None
+    if email:
+        try:
+            check_email(email, deliverability=False)
+        except EmailNotValidError:
+            return jsonify({'error': 'Invalid email format'}), 400
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    
+    subscription = event_bus.subscribe(email=email, last_event_id=last_event_id)
+    if subscription is None:
+        return jsonify({'error': 'Too many live viewers, try again later'}), 503
+    
+    if auction_scheduler is not None:
+        current = auction_scheduler.jobs.current
+        current = current.summary() if current is not None else None
+    else:
+        stored_event_relay.start()
+        current = JobRecord.status(limit=1)['current']
+        current = job_summary(current) if current is not None else None
+    
+    def generate():
+        try:
+            yield 'retry: 5000\n\n'
+            if current is not None and last_event_id is None:
+                # Where the check in progress stands when the viewer connects
+                yield format_event('job', current)
+            while True:
+                payload = subscription.get(timeout=EVENT_KEEPALIVE_SECONDS)
+                yield payload if payload is not None else ': keepalive\n\n'
+        finally:
+            subscription.close()
+    
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/pipeline', methods=['GET'])
+def get_pipeline_stats():
+    """Get per-stage throughput and queue depth for the latest check"""
+    if auction_scheduler is not None:
+        stats = auction_scheduler.pipeline_stats()
+    else:
+        status = JobRecord.status(limit=1)
+        latest = status['current'] or (status['recent'][0] if status['recent'] else None)
+        stats = latest['progress'] if latest else None
+    
+    if stats is None:
+        return jsonify({'message': 'No auction check has run yet'})
+    
+    return jsonify(stats)
+
+@app.route('/api/scrapers', methods=['GET'])
+def get_scrapers():
+    """Get the active scraper backend and each backend's circuit breaker state"""
+    if auction_scheduler is None:
+        return jsonify({'message': 'Scraping runs in separate worker processes; see their /metrics'})
+    
+    return jsonify(auction_scheduler.scraper_status())
+
+@app.route('/api/polling', methods=['GET'])
+def get_polling():
+    """Get adaptive polling state for every search term"""
+    try:
+        if auction_scheduler is not None:
+            return jsonify(auction_scheduler.planner.snapshot())
+        
+        # History and the request budget are shared through the database
+        return jsonify(PollPlanner().snapshot())
+        
+    except Exception as e:
+        logger.error(f"Error getting polling state: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/workers', methods=['GET'])
+def get_workers():
+    """Get live scrape workers and their shard leases"""
+    try:
+        return jsonify(lease_status())
+        
+    except Exception as e:
+        logger.error(f"Error getting worker leases: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/profiles', methods=['GET'])
+def get_profiles():
+    """List recent cycle captures and how many upcoming cycles are armed for profiling"""
+    try:
+        return jsonify({
+            'armed_cycles': cycle_profiler.armed(),
+            'slow_cycle_seconds': cycle_profiler.slow_seconds,
+            'captures': cycle_profiler.captures()
+        })
+        
+    except Exception as e:
+        logger.error(f"Error listing profiles: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/profiles', methods=['POST'])
+def arm_profiling():
+    """Profile the next N check cycles"""
+    try:
+        data = request.get_json(silent=True) or {}
+        cycles = data.get('cycles', 1)
+        
+        if not isinstance(cycles, int) or not 1 <= cycles <= 10:
+            return jsonify({'error': 'cycles must be an integer between 1 and 10'}), 400
+        
+        armed = cycle_profiler.arm(cycles)
+        return jsonify({'message': f'Profiling armed for the next {armed} check cycles', 'armed_cycles': armed}), 202
+        
+    except Exception as e:
+        logger.error(f"Error arming profiler: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/profiles/<name>/<filename>', methods=['GET'])
+def download_profile(name, filename):
+    """Download a file (profile.prof, profile.txt, timings.json) from a capture"""
+    if filename not in ('profile.prof', 'profile.txt', 'timings.json'):
+        return jsonify({'error': 'Unknown capture file'}), 404
+    
+    return send_from_directory(cycle_profiler.directory, f"{name}/{filename}", as_attachment=True)
+
+@app.route('/api/items/search', methods=['GET'])
+def search_items():
+    """Search stored auction history by substring of title or description"""
+    try:
+        query = request.args.get('q', '').strip()
+        
+        if len(query) < 2:
+            return jsonify({'error': 'Query must be at least 2 characters long'}), 400
+        
+        try:
+            limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        except ValueError:
+            return jsonify({'error': 'limit must be a number'}), 400
+        
+        started = time.perf_counter()
+        items = AuctionItem.search(query, limit=limit)
+        took_ms = (time.perf_counter() - started) * 1000
+        
+        return jsonify({
+            'query': query,
+            'engine': 'fts5' if models.FTS_ENABLED and len(query) >= models.FTS_MIN_TERM_LENGTH else 'like',
+            'took_ms': round(took_ms, 2),
+            'items': [item_data(item) for item in items]
+        })
+        
+    except Exception as e:
+        logger.error(f"Error searching items: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/items/<int:item_id>/history', methods=['GET'])
+def get_item_history(item_id):
+    """Price and end time changes recorded for an auction item"""
+    try:
+        item = AuctionItem.get_by_id(item_id)
+        if item is None:
+            return jsonify({'error': 'Auction item not found'}), 404
+        
+        return jsonify({
+            'item': item_data(item),
+            'changes': PriceHistory.for_item(item_id)
+        })
+        
+    except Exception as e:
+        logger.error(f"Error getting item history: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
-    """Get basic statistics about the system"""
+    """
+    Get basic statistics about the system
+    Aggregates are recomputed only after a write bumps the data version;
+    otherwise the cached ones are served, or 304 if the client's ETag matches.
+    The ETag follows the shared data version alone, so every API worker gives
+    the same one; the email validation counters are this process's and are
+    not part of it
+    """
     try:
-        listeners = Listener.get_all()
+        version = DataVersion.current()
+        with stats_lock:
+            stats = stats_cache['stats'] if stats_cache['version'] == version else None
         
-        stats = {
-            'total_listeners': len(listeners),
-            'unique_emails': len(set(listener.email for listener in listeners)),
-            'search_terms': [listener.search_term for listener in listeners]
-        }
+        if stats is None:
+            stats = SystemStats.summary()
+            stats['data_version'] = version
+            with stats_lock:
+                stats_cache.update(version=version, stats=stats)
         
-        return jsonify(stats)
+        response = Response(json.dumps(dict(stats, email_validation=validation_stats())),
+                            mimetype='application/json')
+        response.set_etag(f'stats-{version}')
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
         
     except Exception as e:
         logger.error(f"Error getting stats: {e}")
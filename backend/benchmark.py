@@ -0,0 +1,489 @@
+"""
+Benchmark suite for the check path
+Generates synthetic listeners, a historical catalog and a cycle's worth of new
+lots in a throwaway database, times matching, the pipeline fan-out, model CRUD
+and dedup, email rendering and page extraction, writes the results as JSON and
+fails when a benchmark is slower than a saved baseline by more than a threshold
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import models
+from models import Listener, AuctionItem, Notification, init_database
+from fallback_scraper import FallbackScraper, match_search_terms
+from email_service import EmailService
+import pipeline
+from pipeline import CheckPipeline
+from queries import QueryPlan
+from listener_snapshot import ListenerSnapshot, ListenerView
+from seen_urls import seen_urls
+from enrich import parse_detail
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 0.25
+
+# Lot titles read "<adjective> <brand> <noun> model <n>"; listener terms are
+# substrings of that shape, mostly specific with a tail of broad single words
+NOUNS = ['lamp', 'chair', 'table', 'mouse', 'laptop', 'drill', 'forklift', 'trailer', 'tractor', 'desk',
+         'monitor', 'printer', 'compressor', 'generator', 'cabinet', 'sofa', 'bicycle', 'camera', 'speaker',
+         'router', 'server', 'pallet', 'welder', 'grinder', 'ladder', 'bakkie', 'sedan', 'excavator', 'boat', 'safe']
+ADJECTIVES = ['vintage', 'industrial', 'wireless', 'electric', 'stainless', 'oak', 'brass', 'heavy', 'portable',
+              'commercial', 'used', 'refurbished', 'leather', 'steel', 'digital', 'hydraulic', 'folding', 'gaming']
+BRANDS = ['logitech', 'makita', 'bosch', 'dell', 'hp', 'toyota', 'caterpillar', 'samsung', 'lenovo', 'canon',
+          'yamaha', 'husqvarna', 'dewalt', 'apple', 'sony', 'lg', 'isuzu', 'nissan', 'volvo', 'hyster']
+
+def synthetic_title(rng):
+    return f"{rng.choice(ADJECTIVES)} {rng.choice(BRANDS)} {rng.choice(NOUNS)} model {rng.randint(100, 9999)}"
+
+def synthetic_listeners(count, seed=1):
+    """(email, search_term) pairs; distinct terms are shared by several listeners"""
+    rng = random.Random(seed)
+    listeners = []
+    for n in range(count):
+        shape = rng.random()
+        if shape < 0.05:
+            term = rng.choice(NOUNS)
+        elif shape < 0.55:
+            term = f"{rng.choice(BRANDS)} {rng.choice(NOUNS)}"
+        elif shape < 0.8:
+            term = f"{rng.choice(ADJECTIVES)} {rng.choice(BRANDS)}"
+        else:
+            term = f"{rng.choice(BRANDS)} {rng.choice(NOUNS)} model {rng.randint(100, 999)}"
+        listeners.append((f"user{n}@example.com", term))
+    return listeners
+
+def synthetic_items(count, seed=2, prefix='hist'):
+    """AuctionItems with unique URLs, closing over the next two weeks"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    items = []
+    for n in range(count):
+        title = synthetic_title(rng)
+        items.append(AuctionItem(
+            title=title,
+            url=f"https://live.aucor.com/lots/{prefix}-{n}",
+            description=f"{title}. Sold voetstoots, collection from the Johannesburg yard.",
+            price=f"R {rng.randint(100, 250000):,}",
+            end_time=(now + timedelta(minutes=rng.randint(30, 20160))).strftime('%Y-%m-%d %H:%M'),
+            image_url=""
+        ))
+    return items
+
+def synthetic_results_page(items):
+    """Results page shaped like an Aucor search, for extraction when no fixtures are recorded"""
+    cards = ''.join(
+        f'<div class="lot-item"><a href="/lots/{item.url.rsplit("/", 1)[-1]}"><h3>{item.title}</h3></a>'
+        f'<span class="price">{item.price}</span><p>{item.description}</p></div>'
+        for item in items
+    )
+    nav = '<nav><a href="/login">Login</a><a href="/register">Register</a><a href="/lots">Browse</a></nav>'
+    return f'<html><body>{nav}<main>{cards}</main></body></html>'
+
+def synthetic_detail_page(item):
+    """Lot detail page with an image, a closing time and a long description"""
+    description = ' '.join([item.description] * 8)
+    return (
+        f'<html><head><meta property="og:image" content="/images/{item.url.rsplit("/", 1)[-1]}.jpg"></head>'
+        f'<body><nav><a href="/lots">Browse</a><img src="/static/logo.png"></nav><main>'
+        f'<h1>{item.title}</h1><span class="price">{item.price}</span>'
+        f'<div class="lot-closing">Closes {item.end_time}</div>'
+        f'<div class="lot-description"><p>{description}</p></div></main></body></html>'
+    )
+
+class NullEmailService:
+    """Renders notifications like EmailService but never opens an SMTP connection"""
+
+    def __init__(self):
+        self.service = EmailService()
+
+    def send_notification(self, recipient_email, auction_item, search_term):
+        self.service.build_notification(recipient_email, auction_item, search_term).as_string()
+        return True
+
+class NullEnricher:
+    """Leaves items as scraped so the pipeline never fetches detail pages"""
+
+    def needs_details(self, item):
+        return False
+
+class StubScraper:
+    """Returns pre-generated lots for each term instead of fetching pages"""
+
+    def __init__(self, lots_by_term):
+        self.lots_by_term = lots_by_term
+
+    def scrape_term(self, search_term):
+        return list(self.lots_by_term.get(search_term, ()))
+
+class Workload:
+    """Synthetic data loaded into a throwaway database, removed by close()"""
+
+    def __init__(self, listeners, items, new_lots, fixtures=None, seed=1):
+        self._directory = tempfile.TemporaryDirectory(prefix='auction-bench-')
+        self.directory = self._directory.name
+        models.DATABASE_PATH = os.path.join(self.directory, 'bench.db')
+        init_database()
+
+        self.sizes = {'listeners': listeners, 'items': items, 'new_lots': new_lots}
+        self.seed = seed
+        self.listener_rows = synthetic_listeners(listeners, seed)
+        self.history = synthetic_items(items, seed + 1, prefix='hist')
+        self.new_lots = synthetic_items(new_lots, seed + 2, prefix='new')
+        self.fixtures = fixtures
+        self._round = 0
+
+        # Bulk-load the baseline state; the per-row model paths are what gets measured
+        conn = sqlite3.connect(models.DATABASE_PATH)
+        conn.executemany('INSERT OR IGNORE INTO listeners (email, search_term) VALUES (?, ?)', self.listener_rows)
+        conn.executemany(
+            'INSERT INTO auction_items (title, url, description, price, end_time, image_url, price_cents, currency, '
+            'content_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [(i.title, i.url, i.description, i.price, i.end_time, i.image_url, i.price_cents, i.currency,
+              i.content_hash) for i in self.history]
+        )
+        conn.commit()
+        conn.close()
+        # As at scheduler start, so lookups of new URLs skip the database
+        AuctionItem.load_seen_urls()
+
+        self.listeners = Listener.get_all()
+        self.terms = list(dict.fromkeys(listener.search_term for listener in self.listeners))
+
+    def close(self):
+        self._directory.cleanup()
+
+    def fresh_lots(self):
+        """This cycle's new lots with URLs no earlier round has stored"""
+        self._round += 1
+        return [
+            AuctionItem(title=lot.title, url=f"{lot.url}-r{self._round}", description=lot.description,
+                        price=lot.price, end_time=lot.end_time, image_url=lot.image_url)
+            for lot in self.new_lots
+        ]
+
+    def pages(self):
+        """Recorded result pages, or one synthetic page per 50 new lots"""
+        if self.fixtures:
+            paths = sorted(glob.glob(os.path.join(self.fixtures, '*.html')))
+            if paths:
+                pages = []
+                for path in paths:
+                    with open(path, 'rb') as f:
+                        pages.append(f.read().decode('utf-8', errors='replace'))
+                return pages
+        return [synthetic_results_page(self.new_lots[n:n + 50]) for n in range(0, len(self.new_lots), 50)]
+
+BENCHMARKS = {}
+
+def benchmark(name):
+    """Register a benchmark; the function prepares state and returns (run, ops)"""
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+@benchmark('match.search_terms')
+def bench_match(workload):
+    lots = workload.new_lots
+    terms = workload.terms
+
+    def run():
+        for lot in lots:
+            match_search_terms(lot, terms)
+    return run, len(lots)
+
+@benchmark('match.query_plan')
+def bench_query_plan(workload):
+    lots = workload.new_lots
+    # Listener terms plus boolean queries over the same vocabulary, sharing sub-terms
+    rng = random.Random(workload.seed)
+    queries = workload.terms + [
+        f"{rng.choice(BRANDS)} AND {rng.choice(NOUNS)} NOT {rng.choice(ADJECTIVES)}"
+        for _ in range(len(workload.terms) // 10)
+    ]
+    # Built once per listener snapshot, not per cycle
+    plan = QueryPlan(queries)
+
+    def run():
+        for lot in lots:
+            plan.match(lot)
+    return run, len(lots)
+
+@benchmark('pipeline.fanout')
+def bench_fanout(workload):
+    lots = workload.fresh_lots()
+    # Give each lot to one fetch term it matches, as the search page for that term would
+    fetch_terms = QueryPlan(workload.terms).fetch_terms
+    lots_by_term = defaultdict(list)
+    for lot in lots:
+        matching = match_search_terms(lot, fetch_terms)
+        if matching:
+            lots_by_term[matching[0]].append(lot)
+    pipeline.email_service = NullEmailService()
+    check = CheckPipeline(StubScraper(lots_by_term), workload.listeners, enricher=NullEnricher())
+
+    def run():
+        check.run()
+    return run, len(lots)
+
+@benchmark('models.listener_get_all')
+def bench_listener_get_all(workload):
+    def run():
+        for _ in range(10):
+            Listener.get_all()
+    return run, 10
+
+@benchmark('cycle.start_db')
+def bench_cycle_start_db(workload):
+    # What a cycle paid before the snapshot: read every listener and compile the plan
+    def run():
+        ListenerView(Listener.get_all())
+    return run, 1
+
+@benchmark('cycle.start_snapshot')
+def bench_cycle_start_snapshot(workload):
+    # Unchanged listeners: every cycle and API read reuses the loaded view
+    snapshot = ListenerSnapshot(check_interval=3600)
+    snapshot.get()
+
+    def run():
+        for _ in range(1000):
+            snapshot.get()
+    return run, 1000
+
+@benchmark('cycle.start_after_change')
+def bench_cycle_start_after_change(workload):
+    # One listener added since the last cycle: version check plus a full reload
+    snapshot = ListenerSnapshot(check_interval=3600)
+    snapshot.get()
+    Listener(email=f"bench{time.time_ns()}@example.com", search_term='vintage bosch').save()
+
+    def run():
+        snapshot.get()
+    return run, 1
+
+@benchmark('models.item_save')
+def bench_item_save(workload):
+    lots = workload.fresh_lots()
+
+    def run():
+        for lot in lots:
+            lot.save()
+    return run, len(lots)
+
+@benchmark('models.url_exists')
+def bench_url_exists(workload):
+    # Half known, half new, like a typical results page
+    known = [item.url for item in workload.history[:len(workload.new_lots) // 2]]
+    unknown = [f"{lot.url}-unseen" for lot in workload.new_lots[len(known):]]
+    urls = known + unknown
+
+    def run():
+        for url in urls:
+            AuctionItem.url_exists(url)
+    return run, len(urls)
+
+@benchmark('models.item_hashes')
+def bench_item_hashes(workload):
+    # The same half-known URLs, looked up one results page (60 lots) at a time
+    known = [item.url for item in workload.history[:len(workload.new_lots) // 2]]
+    unknown = [f"{lot.url}-unseen" for lot in workload.new_lots[len(known):]]
+    urls = known + unknown
+    pages = [urls[start:start + 60] for start in range(0, len(urls), 60)]
+
+    def run():
+        for page in pages:
+            AuctionItem.get_hashes(page)
+    return run, len(urls)
+
+@benchmark('models.item_hashes_unfiltered')
+def bench_item_hashes_unfiltered(workload):
+    # models.item_hashes with the seen-URL filter switched off: every URL is queried
+    run, ops = bench_item_hashes(workload)
+
+    def unfiltered():
+        seen_urls.loaded = False
+        try:
+            run()
+        finally:
+            seen_urls.loaded = True
+    return unfiltered, ops
+
+@benchmark('models.seen_url_load')
+def bench_seen_url_load(workload):
+    # Startup cost of filling the filter from every stored URL
+    def run():
+        seen_urls.last_id = 0
+        AuctionItem.load_seen_urls()
+    return run, len(workload.history)
+
+@benchmark('models.notification_claim')
+def bench_notification_claim(workload):
+    rng = random.Random(workload.seed)
+    ids = [listener.id for listener in workload.listeners]
+    pairs = [(rng.choice(ids), n + 1) for n in range(len(workload.new_lots))]
+
+    def run():
+        # The first round inserts; later rounds measure the already-claimed dedup path
+        for listener_id, item_id in pairs:
+            Notification.claim(listener_id, item_id)
+    return run, len(pairs)
+
+@benchmark('models.item_search')
+def bench_item_search(workload):
+    terms = workload.terms[:100]
+
+    def run():
+        for term in terms:
+            AuctionItem.search(term)
+    return run, len(terms)
+
+@benchmark('email.render')
+def bench_email_render(workload):
+    service = EmailService()
+    lots = workload.new_lots
+
+    def run():
+        for n, lot in enumerate(lots):
+            service.build_notification(f"user{n}@example.com", lot, 'logitech').as_string()
+    return run, len(lots)
+
+@benchmark('extract.http')
+def bench_extract_http(workload):
+    from bs4 import BeautifulSoup
+    scraper = FallbackScraper()
+    pages = workload.pages()
+
+    def run():
+        for page in pages:
+            scraper._extract_basic_items(BeautifulSoup(page, 'html.parser'), scraper.base_url)
+    return run, len(pages)
+
+@benchmark('extract.detail')
+def bench_extract_detail(workload):
+    pages = [synthetic_detail_page(lot) for lot in workload.new_lots[:100]]
+
+    def run():
+        for page in pages:
+            parse_detail(page, 'https://live.aucor.com/lots/1')
+    return run, len(pages)
+
+@benchmark('extract.web')
+def bench_extract_web(workload):
+    from bs4 import BeautifulSoup
+    from web_scraper import WebScraper
+    scraper = WebScraper(launch=False)
+    pages = workload.pages()
+
+    def run():
+        for page in pages:
+            scraper._extract_auction_items(BeautifulSoup(page, 'html.parser'), scraper.base_url)
+    return run, len(pages)
+
+def run_benchmarks(workload, names, repeat):
+    """Best-of-N wall time for each benchmark"""
+    results = {}
+    for name in names:
+        timings = []
+        ops = 0
+        try:
+            for _ in range(repeat):
+                run, ops = BENCHMARKS[name](workload)
+                started = time.perf_counter()
+                run()
+                timings.append(time.perf_counter() - started)
+        except ImportError as e:
+            print(f"  {name:<28} skipped ({e})")
+            continue
+
+        best = min(timings)
+        results[name] = {
+            'seconds': round(best, 6),
+            'ops': ops,
+            'ops_per_s': round(ops / best, 2) if best else 0.0,
+            'runs': [round(timing, 6) for timing in timings]
+        }
+        print(f"  {name:<28} {best * 1000:>10.1f} ms  {results[name]['ops_per_s']:>12,.1f} ops/s")
+    return results
+
+def compare(results, baseline, threshold):
+    """Benchmarks slower than the baseline by more than threshold (a fraction)"""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous or not previous.get('seconds'):
+            continue
+        change = result['seconds'] / previous['seconds'] - 1
+        if change > threshold:
+            regressions.append({'name': name, 'baseline_s': previous['seconds'],
+                                'seconds': result['seconds'], 'change': round(change, 3)})
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the auction check path on synthetic data')
+    parser.add_argument('--listeners', type=int, default=10000)
+    parser.add_argument('--items', type=int, default=100000, help='Historical items already stored')
+    parser.add_argument('--new-lots', type=int, default=1000, help='New lots per cycle')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help='Run only these benchmarks')
+    parser.add_argument('--fixtures', help='Directory of recorded pages (replay.py record) for extraction')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help='Earlier results file to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Allowed slowdown as a fraction of the baseline (default 0.25)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    # Per-item and per-notification INFO logs would dominate the timings
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"Generating {args.listeners} listeners, {args.items} stored items, {args.new_lots} new lots...")
+    started = time.perf_counter()
+    workload = Workload(args.listeners, args.items, args.new_lots, fixtures=args.fixtures, seed=args.seed)
+    print(f"Workload ready in {time.perf_counter() - started:.1f}s ({len(workload.terms)} distinct terms)")
+
+    names = args.only or list(BENCHMARKS)
+    try:
+        results = run_benchmarks(workload, names, args.repeat)
+    finally:
+        workload.close()
+
+    report = {
+        'created_at': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'workload': dict(workload.sizes, terms=len(workload.terms), seed=args.seed, repeat=args.repeat),
+        'results': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('workload', {}).get('listeners') != args.listeners:
+            print("Warning: baseline was recorded with a different workload size")
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression['name']}: {regression['baseline_s'] * 1000:.1f} ms -> "
+                  f"{regression['seconds'] * 1000:.1f} ms (+{regression['change']:.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} of {args.baseline}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Persistent Chrome profile for the JavaScript scraper
+Chrome keeps its user data and HTTP disk cache in a managed directory across
+launches, so the site's scripts, styles and fonts are downloaded once rather
+than on every start and search page. The disk cache is capped through Chrome
+itself; caches that Chrome does not cap are pruned while the browser is closed
+once the whole profile outgrows CHROME_PROFILE_MAX_MB
+"""
+import logging
+import os
+import shutil
+
+from metrics import BROWSER_PROFILE_BYTES
+
+logger = logging.getLogger(__name__)
+
+# Empty disables the persistent profile; Chrome then starts from a throwaway one
+PROFILE_ROOT = os.getenv('CHROME_PROFILE_DIR',
+                         os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chrome_profile'))
+CACHE_MAX_MB = int(os.getenv('CHROME_CACHE_MAX_MB', '256'))
+PROFILE_MAX_MB = int(os.getenv('CHROME_PROFILE_MAX_MB', '512'))
+# Load the site shell once after Chrome starts so the first term renders from cache
+PREWARM = os.getenv('CHROME_PREWARM', 'true').lower() == 'true'
+
+# Regenerable caches inside the user data directory, removed when pruning
+PRUNABLE = [
+    os.path.join('Default', 'Code Cache'),
+    os.path.join('Default', 'GPUCache'),
+    os.path.join('Default', 'Service Worker', 'CacheStorage'),
+    os.path.join('Default', 'Service Worker', 'ScriptCache'),
+    'GrShaderCache',
+    'ShaderCache',
+]
+
+def directory_size(path):
+    """Total size in bytes of the files under path"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass  # Removed while walking
+    return total
+
+class BrowserProfile:
+    """User data and disk cache directories for one scraper browser"""
+
+    def __init__(self, root=PROFILE_ROOT, cache_max_mb=CACHE_MAX_MB, profile_max_mb=PROFILE_MAX_MB):
+        # Chrome locks its user data directory, so each worker process gets its own
+        self.path = os.path.join(root, os.getenv('WORKER_ID', 'default')) if root else None
+        self.cache_max_bytes = cache_max_mb * 1024 * 1024
+        self.profile_max_bytes = profile_max_mb * 1024 * 1024
+        self.prunes = 0
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    @property
+    def user_data_dir(self):
+        return os.path.join(self.path, 'user-data')
+
+    @property
+    def cache_dir(self):
+        return os.path.join(self.path, 'cache')
+
+    def chrome_arguments(self):
+        """Command line switches pointing Chrome at this profile"""
+        if not self.enabled:
+            return []
+        os.makedirs(self.user_data_dir, exist_ok=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        return [
+            f'--user-data-dir={self.user_data_dir}',
+            f'--disk-cache-dir={self.cache_dir}',
+            f'--disk-cache-size={self.cache_max_bytes}',
+        ]
+
+    def size(self):
+        size = directory_size(self.path) if self.enabled else 0
+        BROWSER_PROFILE_BYTES.set(size)
+        return size
+
+    def needs_pruning(self):
+        return self.enabled and self.size() > self.profile_max_bytes
+
+    def prune(self):
+        """
+        Remove regenerable caches, and the HTTP cache too if that is not enough
+        Chrome must not be running. Returns the number of bytes freed
+        """
+        if not self.enabled:
+            return 0
+        before = self.size()
+        for relative in PRUNABLE:
+            shutil.rmtree(os.path.join(self.user_data_dir, relative), ignore_errors=True)
+        if self.size() > self.profile_max_bytes:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+        freed = before - self.size()
+        self.prunes += 1
+        logger.info(f"Pruned Chrome profile {self.path}: {freed / 1024 / 1024:.1f} MB freed")
+        return freed
+
+    def status(self):
+        return {
+            'path': self.path,
+            'size_bytes': self.size(),
+            'cache_max_bytes': self.cache_max_bytes,
+            'profile_max_bytes': self.profile_max_bytes,
+            'prunes': self.prunes
+        }
@@ -0,0 +1,87 @@
+"""
+Paginated incremental crawl of the lots search
+Each term remembers a watermark: the first lot on page one of its last complete
+crawl. A crawl follows &page=N until it reaches the watermark, a page whose
+lots are all stored already, or the end of the results, so large result sets
+are covered in full while a steady-state cycle costs about one page per term
+"""
+import logging
+import os
+
+from models import AuctionItem, TermWatermark, TermStats, PageRequests
+from metrics import SCRAPE_PAGES, CRAWL_STOPS
+
+logger = logging.getLogger(__name__)
+
+# Every crawl fetches at least the first page
+MAX_PAGES = max(1, int(os.getenv('SCRAPE_MAX_PAGES', '20')))
+
+class ScrapeError(Exception):
+    """A scraper backend could not fetch results at all (as opposed to finding none)"""
+
+def search_url(base_url, term, page=1):
+    """Lots search URL for a term; page one keeps the original unpaginated URL"""
+    url = f"{base_url}/lots?search={term.replace(' ', '+')}&lots_range=upcoming"
+    return f"{url}&page={page}" if page > 1 else url
+
+def crawl_term(term, fetch_page, scraper, max_pages=MAX_PAGES):
+    """
+    Fetch result pages for a term until nothing new can follow
+    fetch_page(page) returns the page's items, [] past the last page, or None
+    if the request failed. After a failed crawl the next one ignores the
+    watermark and known pages so lots behind the failed page are still reached.
+    Raises ScrapeError if not even the first page could be fetched
+    """
+    watermark, complete = TermWatermark.get(term)
+    items = []
+    collected = set()
+    newest = None
+    reason = 'max_pages'
+    pages = 0
+
+    for page in range(1, max(1, max_pages) + 1):
+        pages += 1
+        page_items = fetch_page(page)
+        if page_items is None:
+            reason = 'error'
+            break
+        SCRAPE_PAGES.inc(scraper=scraper)
+
+        fresh = [item for item in page_items if item.url not in collected]
+        if not fresh:
+            # Past the last page, or the site ignored the page number
+            reason = 'exhausted'
+            break
+        items.extend(fresh)
+        collected.update(item.url for item in fresh)
+        if page == 1:
+            newest = fresh[0].url
+
+        if not complete:
+            continue
+        if watermark is not None and watermark in collected:
+            reason = 'watermark'
+            break
+        urls = [item.url for item in fresh]
+        if len(AuctionItem.get_hashes(urls)) == len(urls):
+            reason = 'known'
+            break
+
+    CRAWL_STOPS.inc(reason=reason)
+    # Every attempted page counts against the shared polling budget
+    PageRequests.record(pages)
+    TermStats.record_pages(term, pages)
+    if reason == 'max_pages':
+        logger.warning(f"Stopped crawling '{term}' at the {pages} page limit (SCRAPE_MAX_PAGES)")
+
+    if reason == 'error':
+        state = (watermark, False)
+    else:
+        state = (newest or watermark, True)
+    if state != (watermark, complete):
+        TermWatermark.set(term, *state)
+
+    if reason == 'error' and pages == 1:
+        raise ScrapeError(f"First results page for '{term}' could not be fetched")
+    logger.info(f"Crawled {pages} page(s) for '{term}': {len(items)} items, stopped on {reason}")
+    return items
@@ -0,0 +1,111 @@
+"""
+Email delivery load test
+Pushes synthetic notifications through EmailService against a local SMTP sink
+and reports throughput, latency percentiles and failure counts
+"""
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from email_service import EmailService
+from smtp_sink import SMTPSink
+
+logger = logging.getLogger(__name__)
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def synthetic_item(n):
+    """Build an auction-item-like object for notification rendering"""
+    return SimpleNamespace(
+        id=n,
+        title=f"Synthetic Lot {n} - Logitech MX Master Mouse",
+        url=f"https://live.aucor.com/lots/synthetic-{n}",
+        description=f"Synthetic lot number {n} generated for email load testing",
+        price=f"R {1000 + n:,}",
+        end_time="",
+        image_url=""
+    )
+
+def build_service(host, port):
+    """EmailService pointed at the sink without TLS"""
+    service = EmailService()
+    service.smtp_server = host
+    service.smtp_port = port
+    service.use_tls = False
+    service.sender_email = 'loadtest@localhost'
+    service.sender_password = 'loadtest'
+    return service
+
+def run_load(service, kind, count, concurrency):
+    """Send `count` messages of the given kind and collect timings"""
+    def send_one(n):
+        start = time.perf_counter()
+        recipient = f"user{n}@example.com"
+        if kind == 'notification':
+            ok = service.send_notification(recipient, synthetic_item(n), 'logitech')
+        else:
+            ok = service.send_test_email(recipient)
+        return ok, time.perf_counter() - start
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(send_one, range(count)))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for _, latency in results]
+    failures = sum(1 for ok, _ in results if not ok)
+    return {
+        'kind': kind,
+        'messages': count,
+        'concurrency': concurrency,
+        'failures': failures,
+        'elapsed_s': round(elapsed, 3),
+        'messages_per_s': round(count / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2)
+    }
+
+def print_report(report, sink_stats):
+    print(f"{report['kind']}: {report['messages']} messages, concurrency {report['concurrency']}")
+    print(f"  throughput: {report['messages_per_s']} msg/s over {report['elapsed_s']}s")
+    print(f"  latency:    p50 {report['p50_ms']} ms, p99 {report['p99_ms']} ms")
+    print(f"  failures:   {report['failures']} reported by EmailService")
+    print(f"  sink:       {sink_stats['accepted']} accepted, {sink_stats['rejected']} rejected")
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test EmailService against a local SMTP sink')
+    parser.add_argument('-n', '--count', type=int, default=200, help='Messages per kind')
+    parser.add_argument('-c', '--concurrency', type=int, default=1, help='Concurrent senders')
+    parser.add_argument('--kind', choices=['notification', 'test', 'both'], default='both')
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--latency', type=float, default=0.0, help='Sink delay per message in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Extra random sink delay in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of messages the sink rejects')
+    args = parser.parse_args()
+
+    # EmailService logs every send; keep the report readable
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger('email_service').setLevel(logging.CRITICAL)
+    logging.getLogger('mail.log').setLevel(logging.ERROR)
+
+    kinds = ['notification', 'test'] if args.kind == 'both' else [args.kind]
+    host = '127.0.0.1'
+
+    with SMTPSink(host, args.port, args.latency, args.jitter, args.error_rate) as sink:
+        service = build_service(host, args.port)
+        for kind in kinds:
+            before = sink.handler.stats()
+            report = run_load(service, kind, args.count, args.concurrency)
+            after = sink.handler.stats()
+            print_report(report, {key: after[key] - before[key] for key in after})
+
+if __name__ == '__main__':
+    main()
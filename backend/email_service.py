@@ -3,8 +3,10 @@ import ssl
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
+import time
 from dotenv import load_dotenv
 import logging
+from metrics import SMTP_HANDSHAKE_SECONDS, SMTP_SEND_SECONDS, EMAILS
 
 # Load environment variables
 load_dotenv()
@@ -21,46 +23,118 @@ class EmailService:
         self.sender_password = os.getenv('SENDER_PASSWORD', 'your-app-password')
         self.use_tls = os.getenv('USE_TLS', 'true').lower() == 'true'
     
+    def _deliver(self, recipient_email, message):
+        """Open an SMTP session, authenticate and send one message"""
+        context = ssl.create_default_context()
+        
+        handshake_started = time.perf_counter()
+        with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
+            if self.use_tls:
+                server.starttls(context=context)
+            server.login(self.sender_email, self.sender_password)
+            SMTP_HANDSHAKE_SECONDS.observe(time.perf_counter() - handshake_started)
+            
+            with SMTP_SEND_SECONDS.time():
+                server.sendmail(self.sender_email, recipient_email, message.as_string())
+    
+    def build_notification(self, recipient_email, auction_item, search_term):
+        """Render the notification message without sending it"""
+        # Create message
+        message = MIMEMultipart("alternative")
+        message["Subject"] = f"🔔 Auction Alert: {search_term} - {auction_item.title}"
+        message["From"] = self.sender_email
+        message["To"] = recipient_email
+        
+        # Create HTML content
+        html_content = self._create_html_email(auction_item, search_term)
+        
+        # Create plain text content
+        text_content = self._create_text_email(auction_item, search_term)
+        
+        # Turn these into plain/html MIMEText objects
+        part1 = MIMEText(text_content, "plain")
+        part2 = MIMEText(html_content, "html")
+        
+        # Add HTML/plain-text parts to MIMEMultipart message
+        message.attach(part1)
+        message.attach(part2)
+        return message
+    
     def send_notification(self, recipient_email, auction_item, search_term):
         """Send auction notification email"""
         try:
-            # Create message
-            message = MIMEMultipart("alternative")
-            message["Subject"] = f"🔔 Auction Alert: {search_term} - {auction_item.title}"
-            message["From"] = self.sender_email
-            message["To"] = recipient_email
-            
-            # Create HTML content
-            html_content = self._create_html_email(auction_item, search_term)
-            
-            # Create plain text content
-            text_content = self._create_text_email(auction_item, search_term)
-            
-            # Turn these into plain/html MIMEText objects
-            part1 = MIMEText(text_content, "plain")
-            part2 = MIMEText(html_content, "html")
-            
-            # Add HTML/plain-text parts to MIMEMultipart message
-            message.attach(part1)
-            message.attach(part2)
+            message = self.build_notification(recipient_email, auction_item, search_term)
             
             # Create secure connection and send email
-            context = ssl.create_default_context()
-            
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                if self.use_tls:
-                    server.starttls(context=context)
-                server.login(self.sender_email, self.sender_password)
-                server.sendmail(self.sender_email, recipient_email, message.as_string())
+            self._deliver(recipient_email, message)
             
+            EMAILS.inc(kind='notification', result='sent')
             logger.info(f"Notification sent to {recipient_email} for item: {auction_item.title}")
             return True
             
         except Exception as e:
+            EMAILS.inc(kind='notification', result='failed')
             logger.error(f"Failed to send email to {recipient_email}: {e}")
             logger.error(f"SMTP Details - Server: {self.smtp_server}:{self.smtp_port}, TLS: {self.use_tls}, From: {self.sender_email}")
             return False
     
+    def build_price_change(self, recipient_email, auction_item, search_term, old_price):
+        """Render a price change message for a lot the recipient was already alerted about"""
+        message = MIMEMultipart("alternative")
+        message["Subject"] = f"💲 Price Change: {auction_item.title} - now {auction_item.price}"
+        message["From"] = self.sender_email
+        message["To"] = recipient_email
+        
+        text_content = f"""
+💲 PRICE CHANGE
+
+A lot matching your search term "{search_term}" has a new price.
+
+Title: {auction_item.title}
+Price: {old_price} -> {auction_item.price}
+{f'End Time: {auction_item.end_time}' if auction_item.end_time else ''}
+
+VIEW AUCTION: {auction_item.url}
+
+---
+Aucor Auction Listener - Automated Auction Monitoring
+This is an automated message. Please do not reply to this email.
+        """
+        html_content = f"""
+        <!DOCTYPE html>
+        <html>
+        <head><meta charset="utf-8"></head>
+        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 600px; margin: 0 auto; padding: 20px;">
+            <h2>💲 Price change on a lot you're watching</h2>
+            <p>A lot matching your search term "<strong>{search_term}</strong>" has a new price.</p>
+            <h3>{auction_item.title}</h3>
+            <p><strong>Price:</strong> <s>{old_price}</s> {auction_item.price}</p>
+            {f'<p><strong>End Time:</strong> {auction_item.end_time}</p>' if auction_item.end_time else ''}
+            <p><a href="{auction_item.url}" target="_blank">View Auction Item</a></p>
+            <p style="font-size: 12px; color: #777;">Aucor Auction Listener - Automated Auction Monitoring</p>
+        </body>
+        </html>
+        """
+        
+        message.attach(MIMEText(text_content, "plain"))
+        message.attach(MIMEText(html_content, "html"))
+        return message
+    
+    def send_price_change(self, recipient_email, auction_item, search_term, old_price):
+        """Send a price change alert email"""
+        try:
+            message = self.build_price_change(recipient_email, auction_item, search_term, old_price)
+            self._deliver(recipient_email, message)
+            
+            EMAILS.inc(kind='price_change', result='sent')
+            logger.info(f"Price change alert sent to {recipient_email} for item: {auction_item.title}")
+            return True
+            
+        except Exception as e:
+            EMAILS.inc(kind='price_change', result='failed')
+            logger.error(f"Failed to send price change alert to {recipient_email}: {e}")
+            return False
+    
     def _create_html_email(self, auction_item, search_term):
         """Create HTML email content"""
         return f"""
@@ -195,18 +269,14 @@ This is an automated message. Please do not reply to this email.
             message["From"] = self.sender_email
             message["To"] = recipient_email
             
-            context = ssl.create_default_context()
-            
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                if self.use_tls:
-                    server.starttls(context=context)
-                server.login(self.sender_email, self.sender_password)
-                server.sendmail(self.sender_email, recipient_email, message.as_string())
+            self._deliver(recipient_email, message)
             
+            EMAILS.inc(kind='test', result='sent')
             logger.info(f"Test email sent successfully to {recipient_email}")
             return True
             
         except Exception as e:
+            EMAILS.inc(kind='test', result='failed')
             logger.error(f"Failed to send test email to {recipient_email}: {e}")
             logger.error(f"SMTP Details - Server: {self.smtp_server}:{self.smtp_port}, TLS: {self.use_tls}, From: {self.sender_email}")
             return False
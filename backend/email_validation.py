@@ -0,0 +1,122 @@
+"""
+Email validation for the API
+Syntax is always checked locally. The DNS deliverability lookup is done once
+per domain and remembered in a TTL/LRU cache (failures for a shorter time),
+and read-only endpoints skip it entirely, so request latency does not depend
+on the resolver
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from email_validator import validate_email, EmailNotValidError, EmailUndeliverableError
+from metrics import EMAIL_DOMAIN_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+CHECK_DELIVERABILITY = os.getenv('EMAIL_CHECK_DELIVERABILITY', 'true').lower() == 'true'
+DOMAIN_CACHE_SIZE = int(os.getenv('EMAIL_DOMAIN_CACHE_SIZE', '1024'))
+DOMAIN_TTL_SECONDS = int(os.getenv('EMAIL_DOMAIN_TTL_SECONDS', '86400'))
+# Undeliverable domains are rechecked sooner in case DNS was only briefly broken
+UNDELIVERABLE_TTL_SECONDS = int(os.getenv('EMAIL_UNDELIVERABLE_TTL_SECONDS', '600'))
+
+class DomainCache:
+    """Thread-safe LRU of domain -> (error message or None, expiry), with hit counts"""
+
+    def __init__(self, size=DOMAIN_CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, domain):
+        """(True, error or None) for a fresh entry, (False, None) on a miss"""
+        with self._lock:
+            entry = self.entries.get(domain)
+            if entry is None or entry[1] <= time.monotonic():
+                self.entries.pop(domain, None)
+                self.misses += 1
+                return False, None
+            self.entries.move_to_end(domain)
+            self.hits += 1
+            return True, entry[0]
+
+    def put(self, domain, error, ttl):
+        with self._lock:
+            self.entries[domain] = (error, time.monotonic() + ttl)
+            self.entries.move_to_end(domain)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'domains': len(self.entries),
+                'capacity': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None
+            }
+
+domain_cache = DomainCache()
+
+def _domain_error(email, domain):
+    """Deliverability error for an address's domain, or None; cached per domain"""
+    cached, error = domain_cache.get(domain)
+    if cached:
+        EMAIL_DOMAIN_LOOKUPS.inc(result='hit')
+        return error
+
+    EMAIL_DOMAIN_LOOKUPS.inc(result='miss')
+    try:
+        validate_email(email, check_deliverability=True)
+    except EmailUndeliverableError as e:
+        logger.info(f"Email domain {domain} is not deliverable: {e}")
+        domain_cache.put(domain, str(e), UNDELIVERABLE_TTL_SECONDS)
+        return str(e)
+    domain_cache.put(domain, None, DOMAIN_TTL_SECONDS)
+    return None
+
+def check_email(email, deliverability=True):
+    """
+    Validate an address; raises EmailNotValidError if it is malformed or, when
+    deliverability is checked, its domain cannot receive mail
+    """
+    # Local syntax check only; no network
+    validated = validate_email(email, check_deliverability=False)
+    if deliverability and CHECK_DELIVERABILITY:
+        error = _domain_error(email, validated.ascii_domain)
+        if error:
+            raise EmailUndeliverableError(error)
+    return validated
+
+def check_emails(emails, deliverability=True):
+    """
+    Validate many addresses at once, looking up each distinct domain once
+    Returns {email: error message or None}
+    """
+    results = {}
+    by_domain = defaultdict(list)
+    for email in set(emails):
+        try:
+            validated = validate_email(email, check_deliverability=False)
+        except EmailNotValidError as e:
+            results[email] = str(e)
+            continue
+        results[email] = None
+        by_domain[validated.ascii_domain].append(email)
+
+    if deliverability and CHECK_DELIVERABILITY:
+        for domain, addresses in by_domain.items():
+            error = _domain_error(addresses[0], domain)
+            if error:
+                results.update((address, error) for address in addresses)
+    return results
+
+def validation_stats():
+    """Domain cache size and hit rate"""
+    return dict(domain_cache.stats(), deliverability_checks=CHECK_DELIVERABILITY)
@@ -0,0 +1,187 @@
+"""
+Lot detail enrichment
+Search result pages only carry a title, link and price. Detail pages of newly
+discovered lots are fetched over HTTP for their end time, main image and full
+description. Results are cached by URL for a TTL that shrinks as the lot nears
+closing, so each lot is normally fetched once
+"""
+import logging
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urljoin
+
+import requests
+from bs4 import BeautifulSoup
+
+from models import DetailCache
+from polling import parse_end_time
+from metrics import PAGE_LOAD_SECONDS, DETAIL_FETCHES
+import replay
+
+logger = logging.getLogger(__name__)
+
+ENRICH_DETAILS = os.getenv('ENRICH_DETAILS', 'true').lower() == 'true'
+ENRICH_WORKERS = int(os.getenv('ENRICH_WORKERS', '4'))
+# Multiplier on the politeness delay between detail requests; 0 when replaying
+SCRAPE_DELAY_SCALE = float(os.getenv('SCRAPE_DELAY_SCALE', '1'))
+
+# Cache lifetimes in seconds: lots with no known end time, closed lots, failed
+# fetches, and the bounds on the remaining-time based TTL of open lots
+UNKNOWN_END_TTL = 6 * 3600
+CLOSED_TTL = 7 * 86400
+FAILED_TTL = 3600
+MIN_TTL = 300
+MAX_TTL = 86400
+
+MAX_DESCRIPTION_LENGTH = 5000
+
+_DATE_RE = re.compile(
+    r'\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(?::\d{2})?'
+    r'|\d{1,2} [A-Za-z]{3,9},? \d{4},? \d{1,2}:\d{2}'
+    r'|\d{1,2}/\d{1,2}/\d{4},? \d{1,2}:\d{2}'
+)
+_END_HINTS = ('end', 'clos', 'countdown', 'timer', 'expire')
+
+def detail_ttl(end_at, now=None):
+    """Seconds to cache a lot's details: about a tenth of its remaining time"""
+    if end_at is None:
+        return UNKNOWN_END_TTL
+    remaining = end_at - (now or time.time())
+    if remaining <= 0:
+        return CLOSED_TTL
+    return min(max(remaining / 10, MIN_TTL), MAX_TTL)
+
+def _has_hint(value):
+    value = ' '.join(value) if isinstance(value, list) else (value or '')
+    return any(hint in value.lower() for hint in _END_HINTS)
+
+def _extract_end_time(soup):
+    """End time as 'YYYY-MM-DD HH:MM', from data attributes, <time> tags or labelled text"""
+    candidates = []
+    for elem in soup.find_all(True):
+        for attr, value in elem.attrs.items():
+            if attr.startswith('data-') and _has_hint(attr) and isinstance(value, str):
+                candidates.append(value)
+        if elem.name == 'time' and elem.get('datetime'):
+            candidates.append(elem['datetime'])
+        elif _has_hint(elem.get('class')) or _has_hint(elem.get('id')):
+            candidates.append(elem.get_text(' ', strip=True))
+
+    for text in candidates:
+        end_at = parse_end_time(text)
+        if end_at is None:
+            match = _DATE_RE.search(text)
+            end_at = parse_end_time(match.group(0).replace(',', '')) if match else None
+        if end_at is not None:
+            return datetime.fromtimestamp(end_at).strftime('%Y-%m-%d %H:%M')
+    return ''
+
+def _extract_image(soup, page_url):
+    meta = soup.find('meta', property='og:image') or soup.find('meta', attrs={'name': 'twitter:image'})
+    if meta and meta.get('content'):
+        return urljoin(page_url, meta['content'])
+
+    for img in soup.find_all('img', src=True):
+        src = img['src']
+        if src.startswith('data:') or any(skip in src.lower() for skip in ('logo', 'icon', 'sprite')):
+            continue
+        return urljoin(page_url, src)
+    return ''
+
+def _extract_description(soup):
+    """Longest of the page's description blocks and description meta tags"""
+    texts = []
+    for elem in soup.find_all(class_=lambda value: value and 'description' in value.lower()):
+        texts.append(elem.get_text(' ', strip=True))
+    for attrs in ({'property': 'og:description'}, {'name': 'description'}):
+        meta = soup.find('meta', attrs=attrs)
+        if meta and meta.get('content'):
+            texts.append(meta['content'].strip())
+    return max(texts, key=len, default='')[:MAX_DESCRIPTION_LENGTH]
+
+def parse_detail(html, page_url):
+    """End time, image URL and description found on a lot detail page"""
+    soup = BeautifulSoup(html, 'html.parser')
+    return {
+        'end_time': _extract_end_time(soup),
+        'image_url': _extract_image(soup, page_url),
+        'description': _extract_description(soup)
+    }
+
+class DetailEnricher:
+    """Fills in end time, image and description of auction items from their detail pages"""
+
+    def __init__(self):
+        # The enrich stage calls this from ENRICH_WORKERS threads, and
+        # requests.Session is not thread-safe, so each thread gets its own
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.headers.update({
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+                'Accept-Language': 'en-US,en;q=0.9'
+            })
+        return session
+
+    def needs_details(self, item):
+        return not item.end_time or not item.image_url
+
+    def details(self, url):
+        """Cached details for a lot URL, fetching the page on a miss; None if unavailable"""
+        cached = DetailCache.get(url)
+        if cached is not None:
+            DETAIL_FETCHES.inc(result='cached')
+            return cached or None
+
+        details = self._fetch(url)
+        if details is None:
+            DETAIL_FETCHES.inc(result='failed')
+            DetailCache.put(url, {}, time.time() + FAILED_TTL)
+            return None
+
+        DETAIL_FETCHES.inc(result='fetched')
+        DetailCache.put(url, details, time.time() + detail_ttl(parse_end_time(details['end_time'])))
+        return details
+
+    def _fetch(self, url):
+        try:
+            time.sleep(random.uniform(0.5, 1) * SCRAPE_DELAY_SCALE)  # Be respectful
+            with PAGE_LOAD_SECONDS.time(scraper='detail'):
+                response = self.session.get(url, timeout=10)
+            if response.status_code != 200:
+                logger.warning(f"HTTP {response.status_code} for lot detail page {url}")
+                return None
+            if replay.recorder is not None:
+                replay.recorder.record('http', url, response.content,
+                                       content_type=response.headers.get('Content-Type', 'text/html; charset=utf-8'))
+            return parse_detail(response.content, url)
+        except Exception as e:
+            logger.warning(f"Failed to fetch lot detail page {url}: {e}")
+            return None
+
+    def enrich(self, item):
+        """Fill the item's missing fields in place; True if anything changed"""
+        details = self.details(item.url)
+        if not details:
+            return False
+
+        changed = False
+        for field in ('end_time', 'image_url'):
+            if details[field] and not getattr(item, field):
+                setattr(item, field, details[field])
+                changed = True
+        if len(details['description']) > len(item.description or ''):
+            item.description = details['description']
+            changed = True
+        return changed
+
+detail_enricher = DetailEnricher()
@@ -0,0 +1,91 @@
+"""
+Live events for API processes that do not run the scheduler
+With SCHEDULER_MODE=external, checks run in another process whose event bus
+this one cannot see. While anyone is watching GET /api/events, one thread per
+API process polls the jobs table and the notification and price alert logs
+every EVENT_POLL_SECONDS and republishes what changed on the local bus, so
+viewers get the same events a poll interval late. As in the scheduler process,
+alerts are relayed only once their email was sent (sent_seq is set)
+"""
+import logging
+import os
+import threading
+
+from models import JobRecord, Notification, PriceAlert
+from jobs import job_summary, HISTORY_SIZE
+from events import event_bus
+from pricing import format_cents
+
+logger = logging.getLogger(__name__)
+
+POLL_SECONDS = float(os.getenv('EVENT_POLL_SECONDS', '2'))
+
+class StoredEventRelay:
+    """Polls the database for job progress and sent alerts while viewers are connected"""
+
+    def __init__(self, bus=event_bus, interval=POLL_SECONDS):
+        self.bus = bus
+        self.interval = interval
+        self.polls = 0
+        self._jobs = None
+        self._notification_seq = None
+        self._price_alert_seq = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start polling if not already; it pauses by itself while nobody is watching"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='event-relay', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not self.bus.subscribers():
+                # Start again from the current state when the next viewer arrives
+                self._jobs = self._notification_seq = self._price_alert_seq = None
+                continue
+            try:
+                self.poll()
+            except Exception as e:
+                logger.warning(f"Could not relay stored events: {e}")
+
+    def poll(self):
+        """Publish job changes and alerts recorded since the previous poll"""
+        self.polls += 1
+        status = JobRecord.status(limit=HISTORY_SIZE)
+        summaries = {}
+        for record in status['running'] + status['pending'] + status['recent']:
+            summaries.setdefault(record['id'], job_summary(record))
+
+        if self._jobs is None:
+            # First poll: viewers were sent the current job on connect
+            self._jobs = summaries
+            self._notification_seq = Notification.last_sent()
+            self._price_alert_seq = PriceAlert.last_sent()
+            return
+
+        for alert in Notification.sent_since(self._notification_seq):
+            self._notification_seq = alert.pop('sent_seq')
+            email = alert.pop('email')
+            self.bus.publish('match', alert, email=email)
+
+        for alert in PriceAlert.sent_since(self._price_alert_seq):
+            self._price_alert_seq = alert.pop('sent_seq')
+            email = alert.pop('email')
+            old_price = format_cents(alert.pop('old_price_cents'), alert.pop('currency')) or 'unknown'
+            self.bus.publish('price_change', dict(alert, old_price=old_price), email=email)
+
+        # After the alerts, so a finished job follows the matches it found
+        for job_id, summary in summaries.items():
+            if self._jobs.get(job_id) != summary:
+                self.bus.publish('job', summary)
+        self._jobs = summaries
+
+stored_event_relay = StoredEventRelay()
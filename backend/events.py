@@ -0,0 +1,123 @@
+"""
+In-process event bus for live updates
+Check jobs publish their progress and the notify stage publishes new matches;
+GET /api/events relays them to browsers as Server-Sent Events. Each event is
+serialized once and handed to every viewer's bounded queue, so viewers cost no
+database work and a slow one only loses its own oldest events. Matches are
+only delivered to viewers subscribed with the listener's email
+"""
+import json
+import logging
+import os
+import queue
+import threading
+from collections import deque
+
+from metrics import EVENTS_PUBLISHED, EVENTS_DROPPED, EVENT_SUBSCRIBERS
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = int(os.getenv('EVENT_QUEUE_SIZE', '100'))
+MAX_SUBSCRIBERS = int(os.getenv('EVENT_STREAM_MAX_CLIENTS', '100'))
+# Recent events kept so a reconnecting browser can resume from Last-Event-ID
+HISTORY_SIZE = 200
+
+def format_event(kind, data, event_id=None):
+    """One Server-Sent Events message"""
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"event: {kind}")
+    lines.append(f"data: {json.dumps(data)}")
+    return '\n'.join(lines) + '\n\n'
+
+class Subscription:
+    """One viewer's queue of formatted events"""
+
+    def __init__(self, bus, email=None, queue_size=QUEUE_SIZE):
+        self.bus = bus
+        self.email = email.lower() if email else None
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def wants(self, event):
+        return event['email'] is None or event['email'] == self.email
+
+    def offer(self, event):
+        """Queue an event, discarding the oldest one if the viewer is falling behind"""
+        while True:
+            try:
+                self.queue.put_nowait(event['payload'])
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                    EVENTS_DROPPED.inc()
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        """Next formatted event, or None if none arrived within timeout"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+class EventBus:
+    """Fan-out of published events to subscribed viewers"""
+
+    def __init__(self, max_subscribers=MAX_SUBSCRIBERS):
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._history = deque(maxlen=HISTORY_SIZE)
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def publish(self, kind, data, email=None):
+        """Send an event to every interested viewer; email restricts it to that listener's viewers"""
+        with self._lock:
+            event_id = self._next_id
+            self._next_id += 1
+            event = {
+                'id': event_id,
+                'email': email.lower() if email else None,
+                'payload': format_event(kind, data, event_id)
+            }
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+
+        for subscription in subscribers:
+            if subscription.wants(event):
+                subscription.offer(event)
+        EVENTS_PUBLISHED.inc(event=kind)
+
+    def subscribe(self, email=None, last_event_id=None):
+        """A new Subscription, replaying missed events after last_event_id; None if at capacity"""
+        subscription = Subscription(self, email)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            self._subscribers.add(subscription)
+            missed = [event for event in self._history
+                      if last_event_id is not None and event['id'] > last_event_id]
+            count = len(self._subscribers)
+
+        for event in missed:
+            if subscription.wants(event):
+                subscription.offer(event)
+        EVENT_SUBSCRIBERS.set(count)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+            count = len(self._subscribers)
+        EVENT_SUBSCRIBERS.set(count)
+
+    def subscribers(self):
+        with self._lock:
+            return len(self._subscribers)
+
+event_bus = EventBus()
@@ -6,23 +6,32 @@ from bs4 import BeautifulSoup
 import time
 import random
 from models import AuctionItem
+from metrics import PAGE_LOAD_SECONDS, PARSE_SECONDS, ITEMS_EXTRACTED, SCRAPE_ERRORS
+from crawl import search_url, crawl_term, ScrapeError
+import replay
 import logging
+import os
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Point at a replay server to scrape recorded fixtures instead of the live site
+BASE_URL = os.getenv('AUCOR_BASE_URL', 'https://live.aucor.com').rstrip('/')
+# Multiplier on the politeness delay between requests; 0 when replaying
+SCRAPE_DELAY_SCALE = float(os.getenv('SCRAPE_DELAY_SCALE', '1'))
+
 class FallbackScraper:
     """Fallback scraper using basic HTTP requests"""
     
     def __init__(self):
-        self.base_url = "https://live.aucor.com"
+        self.base_url = BASE_URL
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
             'Accept-Language': 'en-US,en;q=0.9',
-            'Referer': 'https://live.aucor.com/'
+            'Referer': f'{BASE_URL}/'
         })
     
     def scrape_auction_listings(self, search_terms=None):
@@ -37,29 +46,63 @@ class FallbackScraper:
         
         for term in search_terms:
             logger.info(f"Basic search for exact term: '{term}'")
-            items = self._search_basic(term)
+            try:
+                items = self._search_basic(term)
+            except ScrapeError as e:
+                logger.warning(str(e))
+                continue
             all_items.extend(items)
         
         return self._filter_and_deduplicate(all_items)
     
+    def scrape_term(self, search_term):
+        """Basic scrape for a single exact search term; raises ScrapeError if the site can't be reached"""
+        logger.info(f"Basic search for exact term: '{search_term}'")
+        return self._filter_and_deduplicate(self._search_basic(search_term))
+    
+    def probe(self):
+        """Health check for the scraper router: the site answers plain HTTP requests"""
+        try:
+            response = self.session.get(f"{self.base_url}/", timeout=10)
+            return response.status_code < 500
+        except Exception as e:
+            logger.warning(f"HTTP probe failed: {e}")
+            return False
+    
     def _search_basic(self, search_term):
-        """Basic search without JavaScript rendering"""
-        search_url = f"{self.base_url}/lots?search={search_term.replace(' ', '+')}&lots_range=upcoming"
+        """Basic search without JavaScript rendering, following result pages"""
+        return crawl_term(search_term, lambda page: self._fetch_basic_page(search_term, page), scraper='http')
+    
+    def _fetch_basic_page(self, search_term, page):
+        """Items on one result page, [] for a page without lots, or None if the request failed"""
+        page_url = search_url(self.base_url, search_term, page)
         
         try:
-            time.sleep(random.uniform(1, 2))  # Be respectful
-            response = self.session.get(search_url, timeout=10)
+            time.sleep(random.uniform(1, 2) * SCRAPE_DELAY_SCALE)  # Be respectful
+            with PAGE_LOAD_SECONDS.time(scraper='http'):
+                response = self.session.get(page_url, timeout=10)
             
             if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
-                return self._extract_basic_items(soup, search_url)
-            else:
-                logger.warning(f"HTTP {response.status_code} for term: {search_term}")
+                if replay.recorder is not None:
+                    replay.recorder.record('http', page_url, response.content,
+                                           content_type=response.headers.get('Content-Type', 'text/html; charset=utf-8'))
+                with PARSE_SECONDS.time(scraper='http'):
+                    soup = BeautifulSoup(response.content, 'html.parser')
+                    items = self._extract_basic_items(soup, page_url)
+                ITEMS_EXTRACTED.inc(len(items), scraper='http')
+                return items
+            elif response.status_code == 404 and page > 1:
+                # Asked for a page past the last one
                 return []
+            else:
+                SCRAPE_ERRORS.inc(scraper='http')
+                logger.warning(f"HTTP {response.status_code} for term: {search_term} (page {page})")
+                return None
                 
         except Exception as e:
-            logger.warning(f"Basic search failed for '{search_term}': {e}")
-            return []
+            SCRAPE_ERRORS.inc(scraper='http')
+            logger.warning(f"Basic search failed for '{search_term}' (page {page}): {e}")
+            return None
     
     def _extract_basic_items(self, soup, source_url):
         """Extract items using basic HTML parsing"""
@@ -81,7 +124,7 @@ class FallbackScraper:
                     items.append(item)
         
         logger.info(f"Basic extraction found {len(items)} potential items")
-        return items[:10]  # Limit results
+        return items
     
     def _is_auction_link(self, href, text):
         """Check if link appears to be an auction item"""
@@ -135,12 +178,12 @@ class FallbackScraper:
     
     def get_new_items(self):
         """Get new auction items that haven't been processed yet"""
-        from models import Listener
+        from listener_snapshot import listener_snapshot
         
         try:
-            listeners = Listener.get_all()
+            listeners = listener_snapshot.get()
             if listeners:
-                search_terms = [listener.search_term for listener in listeners]
+                search_terms = listeners.plan.fetch_terms
                 logger.info(f"Basic scraper using exact terms: {search_terms}")
                 all_items = self.scrape_auction_listings(search_terms)
             else:
@@ -0,0 +1,228 @@
+"""
+Single-flight coordination for auction check jobs
+Overlapping check requests are merged: at most one run is in progress and at
+most one follow-up full run is queued behind it. Targeted single-term jobs run
+ahead of full checks and are merged per term
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from models import JobRecord
+from events import event_bus
+from metrics import CYCLE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+HISTORY_SIZE = 20
+# How often a running job's progress is written to the jobs table
+PROGRESS_FLUSH_SECONDS = float(os.getenv('JOB_PROGRESS_FLUSH_SECONDS', '2'))
+
+# Lower runs first
+PRIORITY_TARGETED = 0
+PRIORITY_FULL = 1
+
+def job_summary(record):
+    """Job state and headline counts from a job's dict form, as published to live viewers"""
+    progress = record['progress'] or {}
+    summary = {key: record[key] for key in ('id', 'kind', 'source', 'term', 'status',
+                                            'started_at', 'finished_at', 'error')}
+    for key in ('terms', 'terms_done', 'new_items', 'changed_items', 'matches',
+                'notifications_sent', 'elapsed_s'):
+        summary[key] = progress.get(key)
+    return summary
+
+class Job:
+    """A single requested check run"""
+
+    def __init__(self, kind, source, term=None, listener_ids=None, terms=None, job_id=None):
+        self.id = job_id or uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.source = source
+        self.term = term
+        self.listener_ids = list(listener_ids or [])
+        self.terms = list(terms or [])
+        self.priority = PRIORITY_TARGETED if kind == 'term' else PRIORITY_FULL
+        self.status = 'queued'
+        self.requests = 1
+        self.created_at = datetime.utcnow().isoformat()
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self.result = None
+        self.pipeline = None
+
+    def to_dict(self):
+        """Serializable view including live pipeline progress"""
+        progress = self.result
+        if progress is None and self.pipeline is not None:
+            progress = self.pipeline.stats()
+
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'source': self.source,
+            'term': self.term,
+            'terms': self.terms,
+            'listener_ids': self.listener_ids,
+            'status': self.status,
+            'requests': self.requests,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'error': self.error,
+            'progress': progress
+        }
+
+    def summary(self):
+        """Job state and headline counts, as published to live viewers"""
+        return job_summary(self.to_dict())
+
+class JobCoordinator:
+    """
+    Runs check jobs one at a time on a dedicated worker thread
+    Job state is mirrored to the jobs table so other processes can follow it
+    """
+
+    def __init__(self, runner, worker_id=None):
+        self.runner = runner
+        self.worker_id = worker_id
+        self.current = None
+        self.pending = []
+        self.history = OrderedDict()
+        self._cond = threading.Condition()
+        self._worker = None
+
+    def submit(self, kind='full', source='manual', term=None, listener_ids=None, terms=None, job_id=None,
+               requests=1):
+        """
+        Request a check run, returning (job, merged)
+        Requests made while a matching run is queued are merged into it; a full
+        check requested while one is in progress queues a single follow-up run.
+        job_id and requests carry over a request made through the jobs table
+        """
+        with self._cond:
+            job, merged = self._merge(kind, source, term, listener_ids, terms, requests)
+            if job is None:
+                job = Job(kind, source, term=term, listener_ids=listener_ids, terms=terms, job_id=job_id)
+                job.requests = requests
+                self._remember(job)
+                self.pending.append(job)
+                self._ensure_worker()
+                self._cond.notify()
+
+        if not merged:
+            event_bus.publish('job', job.summary())
+        if merged and job_id:
+            self._persist(JobRecord.mark_merged, job_id, job.id)
+        self._persist(JobRecord.save, job.to_dict(), self.worker_id)
+        return job, merged
+
+    def _merge(self, kind, source, term, listener_ids, terms, requests):
+        key = self._key(kind, term)
+        for job in self.pending:
+            if self._key(job.kind, job.term) == key:
+                job.requests += requests
+                job.listener_ids.extend(i for i in listener_ids or [] if i not in job.listener_ids)
+                job.terms.extend(t for t in terms or [] if t not in job.terms)
+                return job, True
+            if kind == 'poll' and job.kind == 'full':
+                # A queued full check already scrapes every term
+                job.requests += requests
+                return job, True
+
+        current = self.current
+        if current is not None and kind == 'full' and current.kind == 'full' and source == 'scheduled':
+            # The run in progress already covers a periodic check
+            current.requests += requests
+            return current, True
+
+        return None, False
+
+    def busy(self):
+        """True while a job is running or queued"""
+        with self._cond:
+            return self.current is not None or bool(self.pending)
+
+    def get(self, job_id):
+        """Look up a job by id"""
+        with self._cond:
+            return self.history.get(job_id)
+
+    def status(self):
+        """Current, queued and recent jobs"""
+        with self._cond:
+            return {
+                'current': self.current.to_dict() if self.current else None,
+                'pending': [job.to_dict() for job in self.pending],
+                'recent': [job.to_dict() for job in reversed(self.history.values())]
+            }
+
+    def _persist(self, write, *args):
+        try:
+            write(*args)
+        except Exception as e:
+            logger.warning(f"Could not record job state: {e}")
+
+    def _flush_progress(self, job, done):
+        while not done.wait(PROGRESS_FLUSH_SECONDS):
+            self._persist(JobRecord.save, job.to_dict(), self.worker_id)
+            event_bus.publish('job', job.summary())
+
+    @staticmethod
+    def _key(kind, term):
+        return kind if term is None else f"{kind}:{term.lower()}"
+
+    def _remember(self, job):
+        self.history[job.id] = job
+        while len(self.history) > HISTORY_SIZE:
+            self.history.popitem(last=False)
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name='check-jobs', daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self.pending:
+                    self._cond.wait()
+                # Targeted jobs jump ahead of full checks; FIFO otherwise
+                job = min(self.pending, key=lambda queued: queued.priority)
+                self.pending.remove(job)
+                self.current = job
+                job.status = 'running'
+                job.started_at = datetime.utcnow().isoformat()
+
+            logger.info(f"Starting {job.kind} check job {job.id} ({job.source}, {job.requests} requests)")
+            self._persist(JobRecord.save, job.to_dict(), self.worker_id)
+            event_bus.publish('job', job.summary())
+            done = threading.Event()
+            flusher = threading.Thread(target=self._flush_progress, args=(job, done), daemon=True)
+            flusher.start()
+            started = time.perf_counter()
+            try:
+                job.result = self.runner(job)
+                job.status = 'completed'
+            except Exception as e:
+                logger.error(f"Error during auction check: {e}")
+                job.status = 'failed'
+                job.error = str(e)
+            finally:
+                done.set()
+                flusher.join()
+                CYCLE_SECONDS.observe(time.perf_counter() - started, kind=job.kind, status=job.status)
+
+            with self._cond:
+                if job.result is None and job.pipeline is not None:
+                    job.result = job.pipeline.stats()
+                job.pipeline = None
+                job.finished_at = datetime.utcnow().isoformat()
+                self.current = None
+            self._persist(JobRecord.save, job.to_dict(), self.worker_id)
+            event_bus.publish('job', job.summary())
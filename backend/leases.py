@@ -0,0 +1,180 @@
+"""
+Lease-based sharding of scrape work across worker processes
+Search terms are hashed into a fixed number of shards. Each worker heartbeats
+into the shared database and holds expiring leases on its fair share of shards,
+so a crashed worker's terms are picked up by the others once its leases lapse
+"""
+import argparse
+import logging
+import math
+import multiprocessing
+import os
+import socket
+import sqlite3
+import time
+import uuid
+import zlib
+
+import models
+
+logger = logging.getLogger(__name__)
+
+SHARD_COUNT = int(os.getenv('SHARD_COUNT', '16'))
+LEASE_TTL_SECONDS = int(os.getenv('LEASE_TTL_SECONDS', '90'))
+HEARTBEAT_SECONDS = int(os.getenv('HEARTBEAT_SECONDS', '30'))
+
+def shard_of(term, shard_count=SHARD_COUNT):
+    """Stable shard number for a search term (same in every process)"""
+    return zlib.crc32(term.strip().lower().encode('utf-8')) % shard_count
+
+def default_worker_id():
+    return os.getenv('WORKER_ID') or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+class LeaseManager:
+    """Claims, renews and releases this worker's shard leases"""
+
+    def __init__(self, worker_id=None, shard_count=SHARD_COUNT, lease_ttl=LEASE_TTL_SECONDS):
+        self.worker_id = worker_id or default_worker_id()
+        self.shard_count = shard_count
+        self.lease_ttl = lease_ttl
+        self.shards = frozenset()
+        self.started_at = time.time()
+
+    def heartbeat(self):
+        """
+        Record liveness, renew held leases and rebalance to a fair share
+        Returns the set of shards this worker owns afterwards
+        """
+        now = time.time()
+        expires_at = now + self.lease_ttl
+
+        conn = sqlite3.connect(models.DATABASE_PATH, timeout=30, isolation_level=None)
+        cursor = conn.cursor()
+        try:
+            # Take the write lock up front so two workers never claim the same shard
+            cursor.execute('BEGIN IMMEDIATE')
+
+            cursor.execute('''
+                INSERT INTO workers (worker_id, started_at, heartbeat_at) VALUES (?, ?, ?)
+                ON CONFLICT(worker_id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at
+            ''', (self.worker_id, self.started_at, now))
+            cursor.execute('DELETE FROM workers WHERE heartbeat_at < ?', (now - self.lease_ttl,))
+            cursor.execute('SELECT COUNT(*) FROM workers')
+            live_workers = max(1, cursor.fetchone()[0])
+            fair_share = math.ceil(self.shard_count / live_workers)
+
+            cursor.execute('SELECT shard FROM shard_leases WHERE worker_id = ? AND expires_at >= ? ORDER BY shard',
+                           (self.worker_id, now))
+            owned = [row[0] for row in cursor.fetchall()]
+
+            # Hand back shards beyond our share so newly started workers get some
+            surplus = owned[fair_share:]
+            owned = owned[:fair_share]
+            if surplus:
+                cursor.executemany('DELETE FROM shard_leases WHERE shard = ? AND worker_id = ?',
+                                   [(shard, self.worker_id) for shard in surplus])
+
+            cursor.executemany('UPDATE shard_leases SET expires_at = ? WHERE shard = ? AND worker_id = ?',
+                               [(expires_at, shard, self.worker_id) for shard in owned])
+
+            if len(owned) < fair_share:
+                cursor.execute('SELECT shard FROM shard_leases WHERE expires_at >= ?', (now,))
+                taken = {row[0] for row in cursor.fetchall()}
+                free = [shard for shard in range(self.shard_count) if shard not in taken]
+                claimed = free[:fair_share - len(owned)]
+                cursor.executemany('''
+                    INSERT INTO shard_leases (shard, worker_id, expires_at) VALUES (?, ?, ?)
+                    ON CONFLICT(shard) DO UPDATE SET worker_id = excluded.worker_id, expires_at = excluded.expires_at
+                ''', [(shard, self.worker_id, expires_at) for shard in claimed])
+                owned.extend(claimed)
+
+            cursor.execute('COMMIT')
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+        shards = frozenset(owned)
+        if shards != self.shards:
+            logger.info(f"Worker {self.worker_id} now owns {len(shards)}/{self.shard_count} shards "
+                        f"({live_workers} live workers)")
+        self.shards = shards
+        return shards
+
+    def owns(self, term):
+        """True if this worker's leases cover the term"""
+        return shard_of(term, self.shard_count) in self.shards
+
+    def filter_terms(self, terms):
+        """Keep only the terms this worker is responsible for"""
+        return [term for term in terms if self.owns(term)]
+
+    def release(self):
+        """Give up all leases, e.g. on clean shutdown"""
+        conn = sqlite3.connect(models.DATABASE_PATH, timeout=30)
+        try:
+            conn.execute('DELETE FROM shard_leases WHERE worker_id = ?', (self.worker_id,))
+            conn.execute('DELETE FROM workers WHERE worker_id = ?', (self.worker_id,))
+            conn.commit()
+        finally:
+            conn.close()
+        self.shards = frozenset()
+        logger.info(f"Worker {self.worker_id} released its leases")
+
+def lease_status():
+    """Live workers and current shard assignments"""
+    conn = sqlite3.connect(models.DATABASE_PATH, timeout=30)
+    cursor = conn.cursor()
+    cursor.execute('SELECT worker_id, started_at, heartbeat_at FROM workers ORDER BY started_at')
+    workers = [{'worker_id': row[0], 'started_at': row[1], 'heartbeat_at': row[2]} for row in cursor.fetchall()]
+    cursor.execute('SELECT shard, worker_id, expires_at FROM shard_leases ORDER BY shard')
+    leases = [{'shard': row[0], 'worker_id': row[1], 'expires_at': row[2]} for row in cursor.fetchall()]
+    conn.close()
+    return {'workers': workers, 'leases': leases}
+
+def _demo_worker(name, seconds, heartbeat, ttl):
+    manager = LeaseManager(worker_id=name, lease_ttl=ttl)
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        shards = manager.heartbeat()
+        print(f"{name}: {sorted(shards)}", flush=True)
+        time.sleep(heartbeat)
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect or exercise shard leases')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('status', help='Show live workers and lease owners')
+    demo = sub.add_parser('demo', help='Run several lease-holding processes against one database')
+    demo.add_argument('--workers', type=int, default=3)
+    demo.add_argument('--seconds', type=int, default=20)
+    demo.add_argument('--heartbeat', type=float, default=1.0)
+    demo.add_argument('--ttl', type=float, default=3.0)
+    demo.add_argument('--kill-after', type=float, default=8.0, help='Terminate the first worker after this many seconds')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == 'status':
+        status = lease_status()
+        for worker in status['workers']:
+            print(f"worker {worker['worker_id']} last heartbeat {time.time() - worker['heartbeat_at']:.0f}s ago")
+        for lease in status['leases']:
+            print(f"shard {lease['shard']:>3} -> {lease['worker_id']} (expires in {lease['expires_at'] - time.time():.0f}s)")
+        return
+
+    processes = [
+        multiprocessing.Process(target=_demo_worker, name=f"demo-{n}",
+                                args=(f"demo-{n}", args.seconds, args.heartbeat, args.ttl))
+        for n in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    time.sleep(args.kill_after)
+    print(f"Killing {processes[0].name} without releasing its leases", flush=True)
+    processes[0].kill()
+    for process in processes[1:]:
+        process.join()
+
+if __name__ == '__main__':
+    main()
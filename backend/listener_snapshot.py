@@ -0,0 +1,101 @@
+"""
+Process-wide snapshot of active listeners
+Check cycles and API reads share one immutable view of the listeners table
+instead of each loading it from SQLite. Writes through Listener in this process
+bump an in-memory counter, so the next read notices them at once; writes from
+other processes are noticed through the trigger-maintained listener_version,
+re-read at most every LISTENER_SNAPSHOT_CHECK_SECONDS. A changed version
+builds a new view and swaps it in; readers holding the old one are unaffected
+"""
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from types import MappingProxyType
+
+from models import Listener, DataVersion
+from queries import QueryPlan
+from metrics import LISTENER_SNAPSHOT_LOADS, LISTENER_SNAPSHOT_SIZE
+
+logger = logging.getLogger(__name__)
+
+CHECK_SECONDS = float(os.getenv('LISTENER_SNAPSHOT_CHECK_SECONDS', '1'))
+
+class ListenerView:
+    """
+    Immutable set of listeners with the indexes a check cycle needs
+    Listener objects are shared between readers and must not be modified
+    """
+
+    def __init__(self, listeners, version=None):
+        self.listeners = tuple(listeners)
+        self.version = version
+        by_term = defaultdict(list)
+        by_email = defaultdict(list)
+        for listener in self.listeners:
+            by_term[listener.search_term].append(listener)
+            by_email[listener.email].append(listener)
+        self.by_term = MappingProxyType({term: tuple(group) for term, group in by_term.items()})
+        self.by_email = MappingProxyType({email: tuple(group) for email, group in by_email.items()})
+        # Every listener query compiled together, once per view
+        self.plan = QueryPlan(self.by_term)
+        self.price_bounded = any(listener.price_bounded for listener in self.listeners)
+
+    def __len__(self):
+        return len(self.listeners)
+
+    def __iter__(self):
+        return iter(self.listeners)
+
+    def for_terms(self, terms):
+        """Listeners whose query is one of terms"""
+        return [listener for term in terms for listener in self.by_term.get(term, ())]
+
+class ListenerSnapshot:
+    """Copy-on-write holder of the current ListenerView"""
+
+    def __init__(self, check_interval=CHECK_SECONDS):
+        self.check_interval = check_interval
+        self.view = None
+        self.loads = 0
+        self._local_changes = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        """The current view; touches SQLite only if it may be stale"""
+        view = self.view
+        if (view is not None and self._local_changes == Listener.changes
+                and time.monotonic() - self._checked_at < self.check_interval):
+            return view
+
+        with self._lock:
+            changes = Listener.changes
+            if (self.view is not None and self._local_changes == changes
+                    and time.monotonic() - self._checked_at < self.check_interval):
+                return self.view  # Another thread refreshed it while we waited
+
+            if self.view is None or DataVersion.listeners() != self.view.version:
+                started = time.perf_counter()
+                version, listeners = Listener.load_versioned()
+                self.view = ListenerView(listeners, version)
+                self.loads += 1
+                LISTENER_SNAPSHOT_LOADS.inc()
+                LISTENER_SNAPSHOT_SIZE.set(len(listeners))
+                logger.info(f"Loaded {len(listeners)} listeners (version {version}) "
+                            f"in {(time.perf_counter() - started) * 1000:.0f}ms")
+            self._local_changes = changes
+            self._checked_at = time.monotonic()
+            return self.view
+
+    def status(self):
+        view = self.view
+        return {
+            'listeners': len(view) if view is not None else None,
+            'version': view.version if view is not None else None,
+            'loads': self.loads,
+            'check_interval_s': self.check_interval
+        }
+
+listener_snapshot = ListenerSnapshot()
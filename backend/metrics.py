@@ -0,0 +1,275 @@
+"""
+Lightweight in-process metrics with Prometheus text exposition
+Counters, gauges and histograms keyed by label values; recording is a dict
+lookup and an addition under a per-metric lock
+"""
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds; covers sub-millisecond DB reads up to multi-minute check cycles
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(values.items())]
+
+class Gauge(Metric):
+    """Value that can go up and down"""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def _samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(values.items())]
+
+class Histogram(Metric):
+    """Distribution of observed values in fixed buckets"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (last slot is +Inf), sum, count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def timed(self, **labels):
+        """Decorator observing each call's duration"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - start, **labels)
+            return wrapper
+        return decorator
+
+    def _samples(self):
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+
+        lines = []
+        for key, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ('le', _format_value(float(bound))))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+class Registry:
+    """Holds every metric and renders them in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(port, host='0.0.0.0'):
+    """Expose /metrics on a background thread, for processes without Flask"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
+
+# Scraping
+PAGE_LOAD_SECONDS = registry.histogram(
+    'auction_scrape_page_load_seconds', 'Time to fetch or render a search results page', ['scraper'])
+PARSE_SECONDS = registry.histogram(
+    'auction_scrape_parse_seconds', 'Time to parse a results page and extract items', ['scraper'])
+ITEMS_EXTRACTED = registry.counter(
+    'auction_scrape_items_extracted_total', 'Auction items extracted from results pages', ['scraper'])
+SCRAPE_ERRORS = registry.counter(
+    'auction_scrape_errors_total', 'Search term scrapes that failed', ['scraper'])
+SCRAPE_PAGES = registry.counter(
+    'auction_scrape_pages_total', 'Search result pages fetched', ['scraper'])
+SCRAPER_ACTIVE = registry.gauge(
+    'auction_scraper_backend_active', 'Scraper backend that served the latest scrape (1) or not (0)', ['backend'])
+SCRAPER_BREAKER_STATE = registry.gauge(
+    'auction_scraper_breaker_state', 'Circuit breaker per scraper backend: 0 closed, 1 open, 2 probing', ['backend'])
+BROWSER_CACHE_REQUESTS = registry.counter(
+    'auction_browser_cache_requests_total', 'Chrome page and asset requests by HTTP cache result (hit, miss)',
+    ['result'])
+BROWSER_PROFILE_BYTES = registry.gauge(
+    'auction_browser_profile_bytes', 'Size on disk of the scraper browser profile and cache')
+SCRAPER_FAILOVERS = registry.counter(
+    'auction_scraper_failovers_total', 'Term scrapes that failed on a backend and moved to the next', ['backend'])
+DETAIL_FETCHES = registry.counter(
+    'auction_detail_fetches_total', 'Lot detail lookups by result (fetched, cached, failed)', ['result'])
+CRAWL_STOPS = registry.counter(
+    'auction_crawl_stops_total', 'Paginated term crawls by the reason they stopped', ['reason'])
+
+# Live events
+EVENTS_PUBLISHED = registry.counter(
+    'auction_events_published_total', 'Events published to live viewers', ['event'])
+EVENTS_DROPPED = registry.counter(
+    'auction_events_dropped_total', 'Events discarded because a live viewer fell behind')
+EVENT_SUBSCRIBERS = registry.gauge(
+    'auction_event_subscribers', 'Connected live event viewers')
+
+# Database
+DB_SECONDS = registry.histogram(
+    'auction_db_operation_seconds', 'Latency of database operations', ['operation'])
+
+# Matching and cycles
+MATCH_SECONDS = registry.histogram(
+    'auction_match_seconds', 'Time to match one item against every listener term')
+CYCLE_SECONDS = registry.histogram(
+    'auction_check_cycle_seconds', 'Duration of a check job', ['kind', 'status'])
+ITEMS_NEW = registry.counter(
+    'auction_items_new_total', 'Newly discovered auction items saved')
+ITEMS_CHANGED = registry.counter(
+    'auction_items_changed_total', 'Stored auction items whose price or end time changed')
+SEEN_URL_CHECKS = registry.counter(
+    'auction_seen_url_checks_total', 'Seen-URL filter answers (new: skipped the database, maybe: looked up, '
+    'false_positive: looked up but not stored)', ['result'])
+SEEN_URL_FILTER_BYTES = registry.gauge(
+    'auction_seen_url_filter_bytes', 'Memory used by the seen-URL Bloom filter')
+SEEN_URL_FILTER_ENTRIES = registry.gauge(
+    'auction_seen_url_filter_entries', 'URLs added to the seen-URL Bloom filter')
+LISTENER_SNAPSHOT_LOADS = registry.counter(
+    'auction_listener_snapshot_loads_total', 'Active listener snapshots read from the database')
+LISTENER_SNAPSHOT_SIZE = registry.gauge(
+    'auction_listener_snapshot_listeners', 'Active listeners in the current snapshot')
+
+# Email
+SMTP_HANDSHAKE_SECONDS = registry.histogram(
+    'auction_smtp_handshake_seconds', 'SMTP connect, STARTTLS and login time')
+SMTP_SEND_SECONDS = registry.histogram(
+    'auction_smtp_send_seconds', 'SMTP message transmission time')
+EMAIL_DOMAIN_LOOKUPS = registry.counter(
+    'auction_email_domain_lookups_total', 'Email domain deliverability checks by cache result', ['result'])
+EMAILS = registry.counter(
+    'auction_emails_total', 'Emails attempted by kind and result', ['kind', 'result'])
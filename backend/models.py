@@ -1,14 +1,115 @@
 import sqlite3
 import os
+import json
+import uuid
+import hashlib
+import threading
+import time
 from datetime import datetime
+from metrics import DB_SECONDS, SEEN_URL_CHECKS
+from seen_urls import seen_urls
+from pricing import parse_price, DEFAULT_CURRENCY
 
-DATABASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app_data.db')
+DATABASE_PATH = os.getenv('DATABASE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app_data.db'))
+
+# Set by init_database when SQLite has FTS5 with the trigram tokenizer (3.34+)
+FTS_ENABLED = False
+
+# Trigram tokens make a quoted query a case-insensitive substring match, the
+# same semantics as match_search_terms; shorter terms fall back to LIKE
+FTS_MIN_TERM_LENGTH = 3
+
+# SQLite's default limit on bound parameters in older builds
+MAX_SQL_PARAMETERS = 999
+
+def compute_content_hash(price, end_time, price_cents=None, currency=None):
+    """
+    Short hash of the fields tracked for changes (price and end time)
+    Uses the normalized price when there is one so formatting changes don't count
+    """
+    price_key = f"{price_cents} {currency}" if price_cents is not None else (price or '').strip()
+    text = f"{price_key}|{(end_time or '').strip()}"
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+def _create_fts_index(cursor):
+    """Create the auction_items full-text index and its sync triggers; False if unsupported"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'auction_items_fts'")
+    exists = cursor.fetchone() is not None
+    
+    try:
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS auction_items_fts USING fts5(
+                title, description,
+                content='auction_items', content_rowid='id',
+                tokenize='trigram'
+            )
+        ''')
+    except sqlite3.OperationalError:
+        return False
+    
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS auction_items_fts_insert AFTER INSERT ON auction_items BEGIN
+            INSERT INTO auction_items_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS auction_items_fts_delete AFTER DELETE ON auction_items BEGIN
+            INSERT INTO auction_items_fts (auction_items_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS auction_items_fts_update AFTER UPDATE OF title, description ON auction_items BEGIN
+            INSERT INTO auction_items_fts (auction_items_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO auction_items_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+        END
+    ''')
+    
+    if not exists:
+        # Index the items stored before the index existed
+        cursor.execute("INSERT INTO auction_items_fts (auction_items_fts) VALUES ('rebuild')")
+    return True
+
+def _add_column(cursor, table, column, definition):
+    """Add a column to an existing table if it is missing; True if it was added"""
+    cursor.execute(f'PRAGMA table_info({table})')
+    if column in (row[1] for row in cursor.fetchall()):
+        return False
+    cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    return True
+
+# (trigger name, event) pairs that bump data_version; job rows count once finished
+DATA_VERSION_TRIGGERS = [
+    ('listener_insert', 'AFTER INSERT ON listeners'),
+    ('listener_update', 'AFTER UPDATE OF email, search_term, active ON listeners'),
+    ('listener_delete', 'AFTER DELETE ON listeners'),
+    ('item_insert', 'AFTER INSERT ON auction_items'),
+    ('item_delete', 'AFTER DELETE ON auction_items'),
+    ('notification_insert', 'AFTER INSERT ON notifications'),
+    ('notification_delete', 'AFTER DELETE ON notifications'),
+    ('job_finished', 'AFTER INSERT ON jobs WHEN NEW.finished_at IS NOT NULL'),
+]
+
+# Fields of Notification.sent_since and PriceAlert.sent_since rows, as published to live viewers
+ALERT_FIELDS = ['sent_seq', 'email', 'listener_id', 'search_term', 'item_id', 'title', 'url',
+                'price', 'end_time', 'image_url']
+
+# Events that bump data_version.listener_version, which listener snapshots watch
+LISTENER_VERSION_TRIGGERS = [
+    ('insert', 'AFTER INSERT ON listeners'),
+    ('update', 'AFTER UPDATE ON listeners'),
+    ('delete', 'AFTER DELETE ON listeners'),
+]
 
 def init_database():
     """Initialize the SQLite database with required tables"""
     conn = sqlite3.connect(DATABASE_PATH)
     cursor = conn.cursor()
     
+    # WAL lets several worker processes read while one writes
+    cursor.execute('PRAGMA journal_mode=WAL')
+    
     # Create listeners table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS listeners (
@@ -17,10 +118,16 @@ def init_database():
             search_term TEXT NOT NULL,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             active BOOLEAN DEFAULT TRUE,
+            min_price_cents INTEGER,
+            max_price_cents INTEGER,
             UNIQUE(email, search_term)
         )
     ''')
     
+    # Optional price bounds, in cents of DEFAULT_CURRENCY
+    _add_column(cursor, 'listeners', 'min_price_cents', 'INTEGER')
+    _add_column(cursor, 'listeners', 'max_price_cents', 'INTEGER')
+    
     # Create auction_items table to track processed items
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS auction_items (
@@ -31,10 +138,73 @@ def init_database():
             price TEXT,
             end_time TEXT,
             image_url TEXT,
-            scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            price_cents INTEGER,
+            currency TEXT,
+            content_hash TEXT
         )
     ''')
     
+    # Normalized price so items can be filtered and compared in SQL
+    added = _add_column(cursor, 'auction_items', 'price_cents', 'INTEGER')
+    _add_column(cursor, 'auction_items', 'currency', 'TEXT')
+    if added:
+        cursor.execute("SELECT id, price FROM auction_items WHERE price IS NOT NULL AND price != ''")
+        parsed = [(*parse_price(price), item_id) for item_id, price in cursor.fetchall()]
+        cursor.executemany('UPDATE auction_items SET price_cents = ?, currency = ? WHERE id = ?',
+                           [row for row in parsed if row[0] is not None])
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_auction_items_price ON auction_items (currency, price_cents)')
+    
+    # Hash of the tracked fields so an unchanged re-scrape costs one comparison
+    if _add_column(cursor, 'auction_items', 'content_hash', 'TEXT'):
+        cursor.execute('SELECT id, price, end_time, price_cents, currency FROM auction_items')
+        cursor.executemany('UPDATE auction_items SET content_hash = ? WHERE id = ?',
+                           [(compute_content_hash(*row[1:]), row[0]) for row in cursor.fetchall()])
+    
+    # Create lot_details table; cached detail page extracts, expiring by closing time
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS lot_details (
+            url TEXT PRIMARY KEY,
+            details TEXT,
+            fetched_at REAL,
+            expires_at REAL
+        )
+    ''')
+    
+    # Create price_history table; one row per observed price or end time change
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS price_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            auction_item_id INTEGER NOT NULL,
+            old_price_cents INTEGER,
+            new_price_cents INTEGER,
+            currency TEXT,
+            old_end_time TEXT,
+            new_end_time TEXT,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (auction_item_id) REFERENCES auction_items (id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_price_history_item ON price_history (auction_item_id)')
+    
+    # Create price_alerts table; one price change alert per listener, item and price
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS price_alerts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            listener_id INTEGER NOT NULL,
+            auction_item_id INTEGER NOT NULL,
+            price_cents INTEGER NOT NULL,
+            sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(listener_id, auction_item_id, price_cents),
+            FOREIGN KEY (listener_id) REFERENCES listeners (id),
+            FOREIGN KEY (auction_item_id) REFERENCES auction_items (id)
+        )
+    ''')
+    
+    # Full-text index over item history for retroactive matching and search
+    global FTS_ENABLED
+    FTS_ENABLED = _create_fts_index(cursor)
+    
     # Create notifications table to track sent notifications
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS notifications (
@@ -47,17 +217,173 @@ def init_database():
         )
     ''')
     
+    # One notification per listener/item, even with several workers racing
+    cursor.execute('''
+        DELETE FROM notifications WHERE id NOT IN (
+            SELECT MIN(id) FROM notifications GROUP BY listener_id, auction_item_id
+        )
+    ''')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_notifications_listener_item
+        ON notifications (listener_id, auction_item_id)
+    ''')
+    
+    # Order in which alert emails were confirmed sent, for relaying live events
+    # to other processes; NULL while a claim is still being sent
+    for table in ('notifications', 'price_alerts'):
+        _add_column(cursor, table, 'sent_seq', 'INTEGER')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_sent_seq ON {table} (sent_seq)')
+    
+    # Create workers and shard_leases tables to split scraping across processes
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS workers (
+            worker_id TEXT PRIMARY KEY,
+            started_at REAL,
+            heartbeat_at REAL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS shard_leases (
+            shard INTEGER PRIMARY KEY,
+            worker_id TEXT,
+            expires_at REAL
+        )
+    ''')
+    
+    # Create jobs table so API processes can request checks and read their progress
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            source TEXT,
+            term TEXT,
+            terms TEXT,
+            listener_ids TEXT,
+            status TEXT NOT NULL,
+            requests INTEGER DEFAULT 1,
+            created_at TEXT,
+            started_at TEXT,
+            finished_at TEXT,
+            error TEXT,
+            progress TEXT,
+            merged_into TEXT,
+            worker_id TEXT
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_kind_finished ON jobs (kind, finished_at)')
+    
+    # Create term_stats table to drive adaptive per-term polling
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS term_stats (
+            term TEXT PRIMARY KEY,
+            last_polled_at REAL,
+            next_poll_at REAL,
+            yield_ema REAL DEFAULT 1.0,
+            polls INTEGER DEFAULT 0,
+            new_items INTEGER DEFAULT 0,
+            soonest_end_at REAL
+        )
+    ''')
+    # Result pages the term's last crawl fetched; what polling it again will likely cost
+    _add_column(cursor, 'term_stats', 'pages', 'INTEGER DEFAULT 1')
+    
+    # Create page_requests table; search result pages fetched per minute by every
+    # process, so the polling budget is shared across workers
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS page_requests (
+            minute INTEGER PRIMARY KEY,
+            requests INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    
+    # Create profile_arms table; check cycles armed for profiling, shared by the
+    # API process that arms them and the scheduler process that runs them
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS profile_arms (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            cycles INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO profile_arms (id, cycles) VALUES (1, 0)')
+    
+    # Create term_watermarks table; where each term's paginated crawl may stop
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS term_watermarks (
+            term TEXT PRIMARY KEY,
+            url TEXT,
+            complete BOOLEAN DEFAULT TRUE,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Create data_version table; a counter bumped by triggers on every write that
+    # changes /api/stats, so readers in any process can tell when cached stats are stale
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS data_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0)')
+    for name, event in DATA_VERSION_TRIGGERS:
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS data_version_{name} {event} BEGIN
+                UPDATE data_version SET version = version + 1 WHERE id = 1;
+            END
+        ''')
+    
+    # Separate counter for listener writes only, so item churn never reloads listener snapshots
+    _add_column(cursor, 'data_version', 'listener_version', 'INTEGER NOT NULL DEFAULT 0')
+    for name, event in LISTENER_VERSION_TRIGGERS:
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS listener_version_{name} {event} BEGIN
+                UPDATE data_version SET listener_version = listener_version + 1 WHERE id = 1;
+            END
+        ''')
+    
     conn.commit()
     conn.close()
 
 class Listener:
-    def __init__(self, id=None, email=None, search_term=None, created_at=None, active=True):
+    # Writes made through this class in this process; snapshots compare it to skip
+    # re-reading the database version while nothing local has changed
+    changes = 0
+    _changes_lock = threading.Lock()
+    
+    def __init__(self, id=None, email=None, search_term=None, created_at=None, active=True,
+                 min_price_cents=None, max_price_cents=None):
         self.id = id
         self.email = email
         self.search_term = search_term
         self.created_at = created_at
         self.active = active
+        self.min_price_cents = min_price_cents
+        self.max_price_cents = max_price_cents
+    
+    @property
+    def price_bounded(self):
+        """True if this listener only wants lots within a price range"""
+        return self.min_price_cents is not None or self.max_price_cents is not None
+    
+    @staticmethod
+    def _changed():
+        with Listener._changes_lock:
+            Listener.changes += 1
+    
+    @staticmethod
+    def _from_row(row):
+        return Listener(
+            id=row[0],
+            email=row[1],
+            search_term=row[2],
+            created_at=row[3],
+            active=row[4],
+            min_price_cents=row[5],
+            max_price_cents=row[6]
+        )
     
+    @DB_SECONDS.timed(operation='listener_save')
     def save(self):
         """Save the listener to the database"""
         conn = sqlite3.connect(DATABASE_PATH)
@@ -65,11 +391,12 @@ class Listener:
         
         try:
             cursor.execute('''
-                INSERT INTO listeners (email, search_term, active)
-                VALUES (?, ?, ?)
-            ''', (self.email, self.search_term, self.active))
+                INSERT INTO listeners (email, search_term, active, min_price_cents, max_price_cents)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (self.email, self.search_term, self.active, self.min_price_cents, self.max_price_cents))
             self.id = cursor.lastrowid
             conn.commit()
+            Listener._changed()
             return True
         except sqlite3.IntegrityError:
             return False  # Duplicate entry
@@ -77,6 +404,53 @@ class Listener:
             conn.close()
     
     @staticmethod
+    @DB_SECONDS.timed(operation='listener_save_many')
+    def save_many(listeners):
+        """
+        Insert listeners in a single transaction, setting each new listener's id
+        Returns one flag per listener: True if inserted, False if it already existed
+        """
+        conn = sqlite3.connect(DATABASE_PATH, timeout=30)
+        cursor = conn.cursor()
+        
+        try:
+            inserted = []
+            for listener in listeners:
+                cursor.execute('''
+                    INSERT OR IGNORE INTO listeners (email, search_term, active, min_price_cents, max_price_cents)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (listener.email, listener.search_term, listener.active,
+                      listener.min_price_cents, listener.max_price_cents))
+                if cursor.rowcount > 0:
+                    listener.id = cursor.lastrowid
+                    inserted.append(True)
+                else:
+                    inserted.append(False)
+            conn.commit()
+            if any(inserted):
+                Listener._changed()
+            return inserted
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def iter_all(batch_size=1000):
+        """Yield every active listener in id order, reading batch_size rows at a time"""
+        conn = sqlite3.connect(DATABASE_PATH)
+        
+        try:
+            cursor = conn.execute('SELECT * FROM listeners WHERE active = TRUE ORDER BY id')
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield Listener._from_row(row)
+        finally:
+            conn.close()
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='listener_get_all')
     def get_all():
         """Get all active listeners"""
         conn = sqlite3.connect(DATABASE_PATH)
@@ -86,20 +460,28 @@ class Listener:
         rows = cursor.fetchall()
         conn.close()
         
-        listeners = []
-        for row in rows:
-            listener = Listener(
-                id=row[0],
-                email=row[1],
-                search_term=row[2],
-                created_at=row[3],
-                active=row[4]
-            )
-            listeners.append(listener)
+        return [Listener._from_row(row) for row in rows]
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='listener_load_versioned')
+    def load_versioned():
+        """(listener_version, active listeners in id order) read from one consistent snapshot"""
+        conn = sqlite3.connect(DATABASE_PATH, isolation_level=None)
+        cursor = conn.cursor()
         
-        return listeners
+        try:
+            cursor.execute('BEGIN')
+            cursor.execute('SELECT listener_version FROM data_version WHERE id = 1')
+            version = cursor.fetchone()[0]
+            cursor.execute('SELECT * FROM listeners WHERE active = TRUE ORDER BY id')
+            listeners = [Listener._from_row(row) for row in cursor.fetchall()]
+            cursor.execute('COMMIT')
+            return version, listeners
+        finally:
+            conn.close()
     
     @staticmethod
+    @DB_SECONDS.timed(operation='listener_get_by_email')
     def get_by_email(email):
         """Get all listeners for a specific email"""
         conn = sqlite3.connect(DATABASE_PATH)
@@ -109,20 +491,56 @@ class Listener:
         rows = cursor.fetchall()
         conn.close()
         
-        listeners = []
-        for row in rows:
-            listener = Listener(
-                id=row[0],
-                email=row[1],
-                search_term=row[2],
-                created_at=row[3],
-                active=row[4]
-            )
-            listeners.append(listener)
+        return [Listener._from_row(row) for row in rows]
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='listener_get_by_ids')
+    def get_by_ids(listener_ids):
+        """Get the active listeners with the given IDs"""
+        if not listener_ids:
+            return []
+        
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        placeholders = ','.join('?' for _ in listener_ids)
+        cursor.execute(f'SELECT * FROM listeners WHERE id IN ({placeholders}) AND active = TRUE', list(listener_ids))
+        rows = cursor.fetchall()
+        conn.close()
         
-        return listeners
+        return [Listener._from_row(row) for row in rows]
     
     @staticmethod
+    @DB_SECONDS.timed(operation='listener_filter_by_price')
+    def filter_by_price(listener_ids, price_cents, currency):
+        """
+        IDs among listener_ids whose price bounds admit an item's price
+        Bounds apply to prices in the default currency; lots with no parsed price
+        or another currency are let through rather than silently dropped
+        """
+        if not listener_ids:
+            return set()
+        
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        placeholders = ','.join('?' for _ in listener_ids)
+        cursor.execute(f'''
+            SELECT id FROM listeners
+            WHERE id IN ({placeholders})
+              AND (
+                  ? IS NULL OR ? != ?
+                  OR ((min_price_cents IS NULL OR ? >= min_price_cents)
+                      AND (max_price_cents IS NULL OR ? <= max_price_cents))
+              )
+        ''', [*listener_ids, price_cents, currency, DEFAULT_CURRENCY, price_cents, price_cents])
+        allowed = {row[0] for row in cursor.fetchall()}
+        conn.close()
+        
+        return allowed
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='listener_delete')
     def delete(listener_id):
         """Delete a listener by ID"""
         conn = sqlite3.connect(DATABASE_PATH)
@@ -133,11 +551,14 @@ class Listener:
         conn.commit()
         conn.close()
         
+        if deleted:
+            Listener._changed()
         return deleted
 
 class AuctionItem:
     def __init__(self, id=None, title=None, url=None, description=None, price=None, 
-                 end_time=None, image_url=None, scraped_at=None):
+                 end_time=None, image_url=None, scraped_at=None, price_cents=None, currency=None,
+                 content_hash=None):
         self.id = id
         self.title = title
         self.url = url
@@ -146,7 +567,21 @@ class AuctionItem:
         self.end_time = end_time
         self.image_url = image_url
         self.scraped_at = scraped_at
+        if price_cents is None and price:
+            price_cents, currency = parse_price(price)
+        self.price_cents = price_cents
+        self.currency = currency
+        self.content_hash = content_hash or compute_content_hash(price, end_time, price_cents, currency)
     
+    @staticmethod
+    def _from_row(row):
+        return AuctionItem(
+            id=row[0], title=row[1], url=row[2], description=row[3],
+            price=row[4], end_time=row[5], image_url=row[6], scraped_at=row[7],
+            price_cents=row[8], currency=row[9], content_hash=row[10]
+        )
+    
+    @DB_SECONDS.timed(operation='auction_item_save')
     def save(self):
         """Save the auction item to the database"""
         conn = sqlite3.connect(DATABASE_PATH)
@@ -154,20 +589,46 @@ class AuctionItem:
         
         try:
             cursor.execute('''
-                INSERT INTO auction_items (title, url, description, price, end_time, image_url)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (self.title, self.url, self.description, self.price, self.end_time, self.image_url))
+                INSERT INTO auction_items (title, url, description, price, end_time, image_url,
+                                           price_cents, currency, content_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (self.title, self.url, self.description, self.price, self.end_time, self.image_url,
+                  self.price_cents, self.currency, self.content_hash))
             self.id = cursor.lastrowid
             conn.commit()
+            seen_urls.add(self.url)
             return True
         except sqlite3.IntegrityError:
+            if self.url:
+                seen_urls.add(self.url)
             return False  # Duplicate URL
         finally:
             conn.close()
     
+    @DB_SECONDS.timed(operation='auction_item_update_details')
+    def update_details(self):
+        """
+        Store enriched end time, image and description for a saved item
+        content_hash is left as scraped so the next results page still compares equal
+        """
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            UPDATE auction_items
+            SET end_time = ?, image_url = ?, description = ?
+            WHERE id = ?
+        ''', (self.end_time, self.image_url, self.description, self.id))
+        conn.commit()
+        conn.close()
+    
     @staticmethod
+    @DB_SECONDS.timed(operation='auction_item_url_exists')
     def url_exists(url):
         """Check if an auction item with this URL already exists"""
+        if not seen_urls.might_contain(url):
+            return False
+        
         conn = sqlite3.connect(DATABASE_PATH)
         cursor = conn.cursor()
         
@@ -178,6 +639,121 @@ class AuctionItem:
         return exists
     
     @staticmethod
+    @DB_SECONDS.timed(operation='auction_item_get_hashes')
+    def get_hashes(urls):
+        """Map each stored URL among urls to its (id, content_hash)"""
+        # URLs the seen filter has never had are new without a query
+        urls = seen_urls.possibly_stored(dict.fromkeys(urls))
+        if not urls:
+            return {}
+        
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        hashes = {}
+        for start in range(0, len(urls), MAX_SQL_PARAMETERS):
+            chunk = urls[start:start + MAX_SQL_PARAMETERS]
+            placeholders = ','.join('?' for _ in chunk)
+            cursor.execute(f'SELECT url, id, content_hash FROM auction_items WHERE url IN ({placeholders})', chunk)
+            hashes.update((url, (item_id, item_hash)) for url, item_id, item_hash in cursor.fetchall())
+        conn.close()
+        
+        if seen_urls.loaded and len(hashes) < len(urls):
+            SEEN_URL_CHECKS.inc(len(urls) - len(hashes), result='false_positive')
+        return hashes
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='auction_item_load_seen_urls')
+    def load_seen_urls(batch_size=10000):
+        """
+        Add URLs stored since the seen filter last loaded: every URL the first time,
+        then only rows other processes inserted since; returns how many were added
+        """
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        added = 0
+        cursor.execute('SELECT id, url FROM auction_items WHERE id > ? ORDER BY id', (seen_urls.last_id,))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            seen_urls.add_many([url for _, url in rows], last_id=rows[-1][0])
+            added += len(rows)
+        conn.close()
+        
+        seen_urls.loaded = True
+        return added
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='auction_item_get_by_url')
+    def get_by_url(url):
+        """Get the stored auction item for a URL, or None"""
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT * FROM auction_items WHERE url = ?', (url,))
+        row = cursor.fetchone()
+        conn.close()
+        
+        if row is None:
+            return None
+        
+        return AuctionItem._from_row(row)
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='auction_item_get_by_id')
+    def get_by_id(item_id):
+        """Get a stored auction item by ID, or None"""
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT * FROM auction_items WHERE id = ?', (item_id,))
+        row = cursor.fetchone()
+        conn.close()
+        
+        if row is None:
+            return None
+        
+        return AuctionItem._from_row(row)
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='auction_item_search')
+    def search(term, limit=100, since=None):
+        """
+        Get stored auction items whose title or description contains the term,
+        newest first; since limits results to items scraped at or after a
+        'YYYY-MM-DD HH:MM:SS' UTC timestamp
+        """
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        term = term.strip()
+        if FTS_ENABLED and len(term) >= FTS_MIN_TERM_LENGTH:
+            # Quoted so the whole term is one substring, not FTS query syntax
+            query = '"' + term.replace('"', '""') + '"'
+            cursor.execute('''
+                SELECT a.* FROM auction_items_fts f
+                JOIN auction_items a ON a.id = f.rowid
+                WHERE auction_items_fts MATCH ? AND (? IS NULL OR a.scraped_at >= ?)
+                ORDER BY f.rowid DESC
+                LIMIT ?
+            ''', (query, since, since, limit))
+        else:
+            pattern = f"%{term}%"
+            cursor.execute('''
+                SELECT * FROM auction_items
+                WHERE (title LIKE ? OR description LIKE ?) AND (? IS NULL OR scraped_at >= ?)
+                ORDER BY id DESC
+                LIMIT ?
+            ''', (pattern, pattern, since, since, limit))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [AuctionItem._from_row(row) for row in rows]
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='auction_item_get_all')
     def get_all():
         """Get all auction items from the database"""
         conn = sqlite3.connect(DATABASE_PATH)
@@ -187,31 +763,56 @@ class AuctionItem:
         rows = cursor.fetchall()
         conn.close()
         
-        items = []
-        for row in rows:
-            item = AuctionItem(
-                id=row[0], title=row[1], url=row[2], description=row[3],
-                price=row[4], end_time=row[5], image_url=row[6], scraped_at=row[7]
-            )
-            items.append(item)
-        
-        return items
+        return [AuctionItem._from_row(row) for row in rows]
 
 class Notification:
     @staticmethod
+    @DB_SECONDS.timed(operation='notification_save')
     def save(listener_id, auction_item_id):
         """Save a notification record"""
         conn = sqlite3.connect(DATABASE_PATH)
         cursor = conn.cursor()
         
         cursor.execute('''
-            INSERT INTO notifications (listener_id, auction_item_id)
+            INSERT OR IGNORE INTO notifications (listener_id, auction_item_id)
+            VALUES (?, ?)
+        ''', (listener_id, auction_item_id))
+        conn.commit()
+        conn.close()
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='notification_claim')
+    def claim(listener_id, auction_item_id):
+        """Reserve a notification before sending; False if it was already sent or claimed"""
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT OR IGNORE INTO notifications (listener_id, auction_item_id)
             VALUES (?, ?)
         ''', (listener_id, auction_item_id))
+        claimed = cursor.rowcount > 0
         conn.commit()
         conn.close()
+        
+        return claimed
     
     @staticmethod
+    @DB_SECONDS.timed(operation='notification_release')
+    def release(listener_id, auction_item_id):
+        """Drop a claim whose email failed so a later run can retry it"""
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            DELETE FROM notifications
+            WHERE listener_id = ? AND auction_item_id = ?
+        ''', (listener_id, auction_item_id))
+        conn.commit()
+        conn.close()
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='notification_already_sent')
     def already_sent(listener_id, auction_item_id):
         """Check if a notification has already been sent"""
         conn = sqlite3.connect(DATABASE_PATH)
@@ -225,6 +826,687 @@ class Notification:
         conn.close()
         
         return exists
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='notification_mark_sent')
+    def mark_sent(listener_id, auction_item_id):
+        """Record that a claimed notification's email went out, giving it the next sent_seq"""
+        conn = sqlite3.connect(DATABASE_PATH, timeout=30)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            UPDATE notifications SET sent_seq = (SELECT IFNULL(MAX(sent_seq), 0) + 1 FROM notifications)
+            WHERE listener_id = ? AND auction_item_id = ?
+        ''', (listener_id, auction_item_id))
+        conn.commit()
+        conn.close()
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='notification_last_sent')
+    def last_sent():
+        """sent_seq of the latest confirmed notification"""
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT IFNULL(MAX(sent_seq), 0) FROM notifications')
+        last = cursor.fetchone()[0]
+        conn.close()
+        
+        return last
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='notification_sent_since')
+    def sent_since(after_seq, limit=500):
+        """Notifications confirmed sent after after_seq, with their listener and lot, in send order"""
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT n.sent_seq, l.email,
+                   l.id, l.search_term, i.id, i.title, i.url, i.price, i.end_time, i.image_url
+            FROM notifications n
+            JOIN listeners l ON l.id = n.listener_id
+            JOIN auction_items i ON i.id = n.auction_item_id
+            WHERE n.sent_seq > ?
+            ORDER BY n.sent_seq LIMIT ?
+        ''', (after_seq, limit))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [dict(zip(ALERT_FIELDS, row)) for row in rows]
+
+class DetailCache:
+    @staticmethod
+    @DB_SECONDS.timed(operation='detail_cache_get')
+    def get(url):
+        """Cached lot details for a URL ({} for a cached failure), or None if missing or expired"""
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT details FROM lot_details WHERE url = ? AND expires_at > ?
+        ''', (url, datetime.utcnow().timestamp()))
+        row = cursor.fetchone()
+        conn.close()
+        
+        return json.loads(row[0]) if row else None
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='detail_cache_put')
+    def put(url, details, expires_at):
+        """Cache lot details until expires_at (a Unix timestamp)"""
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT OR REPLACE INTO lot_details (url, details, fetched_at, expires_at)
+            VALUES (?, ?, ?, ?)
+        ''', (url, json.dumps(details), datetime.utcnow().timestamp(), expires_at))
+        conn.commit()
+        conn.close()
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='detail_cache_prune')
+    def prune():
+        """Drop expired entries; returns how many were removed"""
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('DELETE FROM lot_details WHERE expires_at <= ?', (datetime.utcnow().timestamp(),))
+        removed = cursor.rowcount
+        conn.commit()
+        conn.close()
+        
+        return removed
+
+class PriceHistory:
+    @staticmethod
+    @DB_SECONDS.timed(operation='price_history_record')
+    def record(item_id, item):
+        """
+        Apply a re-scraped item's price and end time to the stored lot and log the change
+        Returns the change, or None if nothing tracked changed (another worker
+        recorded it first, or the scrape only lacked a field we already have)
+        """
+        conn = sqlite3.connect(DATABASE_PATH, timeout=30, isolation_level=None)
+        cursor = conn.cursor()
+        
+        try:
+            # Write lock up front so racing workers log each change once
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('SELECT price, price_cents, currency, end_time FROM auction_items WHERE id = ?', (item_id,))
+            row = cursor.fetchone()
+            if row is None:
+                cursor.execute('ROLLBACK')
+                return None
+            old_price, old_cents, old_currency, old_end_time = row
+            
+            # A field missing from this scrape keeps its stored value
+            if item.price_cents is not None:
+                price, cents, currency = item.price, item.price_cents, item.currency
+            else:
+                price, cents, currency = old_price, old_cents, old_currency
+            end_time = item.end_time or old_end_time
+            
+            # The stored hash is of the lot as last scraped, so the next identical scrape compares equal
+            if (cents, currency, end_time) == (old_cents, old_currency, old_end_time):
+                cursor.execute('UPDATE auction_items SET content_hash = ? WHERE id = ?', (item.content_hash, item_id))
+                cursor.execute('COMMIT')
+                return None
+            
+            cursor.execute('''
+                UPDATE auction_items
+                SET price = ?, price_cents = ?, currency = ?, end_time = ?, content_hash = ?
+                WHERE id = ?
+            ''', (price, cents, currency, end_time, item.content_hash, item_id))
+            cursor.execute('''
+                INSERT INTO price_history
+                    (auction_item_id, old_price_cents, new_price_cents, currency, old_end_time, new_end_time)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (item_id, old_cents, cents, currency, old_end_time, end_time))
+            cursor.execute('COMMIT')
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        
+        return {
+            'auction_item_id': item_id,
+            'old_price_cents': old_cents,
+            'new_price_cents': cents,
+            'currency': currency,
+            'old_end_time': old_end_time,
+            'new_end_time': end_time,
+            'price_changed': cents != old_cents
+        }
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='price_history_for_item')
+    def for_item(item_id):
+        """Recorded changes for an item, oldest first"""
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT old_price_cents, new_price_cents, currency, old_end_time, new_end_time, changed_at
+            FROM price_history WHERE auction_item_id = ? ORDER BY id
+        ''', (item_id,))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [
+            {
+                'old_price_cents': row[0], 'new_price_cents': row[1], 'currency': row[2],
+                'old_end_time': row[3], 'new_end_time': row[4], 'changed_at': row[5]
+            }
+            for row in rows
+        ]
+
+class PriceAlert:
+    @staticmethod
+    @DB_SECONDS.timed(operation='price_alert_claim')
+    def claim(listener_id, auction_item_id, price_cents):
+        """Reserve a price change alert; False if this price was already alerted"""
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT OR IGNORE INTO price_alerts (listener_id, auction_item_id, price_cents)
+            VALUES (?, ?, ?)
+        ''', (listener_id, auction_item_id, price_cents))
+        claimed = cursor.rowcount > 0
+        conn.commit()
+        conn.close()
+        
+        return claimed
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='price_alert_release')
+    def release(listener_id, auction_item_id, price_cents):
+        """Drop a claim whose email failed so a later run can retry it"""
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            DELETE FROM price_alerts
+            WHERE listener_id = ? AND auction_item_id = ? AND price_cents = ?
+        ''', (listener_id, auction_item_id, price_cents))
+        conn.commit()
+        conn.close()
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='price_alert_mark_sent')
+    def mark_sent(listener_id, auction_item_id, price_cents):
+        """Record that a claimed price alert's email went out, giving it the next sent_seq"""
+        conn = sqlite3.connect(DATABASE_PATH, timeout=30)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            UPDATE price_alerts SET sent_seq = (SELECT IFNULL(MAX(sent_seq), 0) + 1 FROM price_alerts)
+            WHERE listener_id = ? AND auction_item_id = ? AND price_cents = ?
+        ''', (listener_id, auction_item_id, price_cents))
+        conn.commit()
+        conn.close()
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='price_alert_last_sent')
+    def last_sent():
+        """sent_seq of the latest confirmed price alert"""
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT IFNULL(MAX(sent_seq), 0) FROM price_alerts')
+        last = cursor.fetchone()[0]
+        conn.close()
+        
+        return last
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='price_alert_sent_since')
+    def sent_since(after_seq, limit=500):
+        """
+        Price alerts confirmed sent after after_seq, in send order, with their
+        listener, lot and the price the lot moved from
+        """
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT a.sent_seq, l.email,
+                   l.id, l.search_term, i.id, i.title, i.url, i.price, i.end_time, i.image_url,
+                   (SELECT h.old_price_cents FROM price_history h
+                    WHERE h.auction_item_id = a.auction_item_id AND h.new_price_cents = a.price_cents
+                    ORDER BY h.id DESC LIMIT 1),
+                   i.currency
+            FROM price_alerts a
+            JOIN listeners l ON l.id = a.listener_id
+            JOIN auction_items i ON i.id = a.auction_item_id
+            WHERE a.sent_seq > ?
+            ORDER BY a.sent_seq LIMIT ?
+        ''', (after_seq, limit))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [dict(zip(ALERT_FIELDS + ['old_price_cents', 'currency'], row)) for row in rows]
+
+class TermStats:
+    def __init__(self, term=None, last_polled_at=None, next_poll_at=None, yield_ema=1.0,
+                 polls=0, new_items=0, soonest_end_at=None, pages=1):
+        self.term = term
+        self.last_polled_at = last_polled_at
+        self.next_poll_at = next_poll_at
+        self.yield_ema = yield_ema
+        self.polls = polls
+        self.new_items = new_items
+        self.soonest_end_at = soonest_end_at
+        self.pages = pages
+    
+    @DB_SECONDS.timed(operation='term_stats_save')
+    def save(self):
+        """Insert or update the polling history for this term"""
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT OR REPLACE INTO term_stats
+                (term, last_polled_at, next_poll_at, yield_ema, polls, new_items, soonest_end_at, pages)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (self.term, self.last_polled_at, self.next_poll_at, self.yield_ema,
+              self.polls, self.new_items, self.soonest_end_at, self.pages))
+        conn.commit()
+        conn.close()
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='term_stats_pages')
+    def record_pages(term, pages):
+        """Remember how many result pages a crawl of the term fetched"""
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('INSERT OR IGNORE INTO term_stats (term) VALUES (?)', (term.lower(),))
+        cursor.execute('UPDATE term_stats SET pages = ? WHERE term = ?', (pages, term.lower()))
+        conn.commit()
+        conn.close()
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='term_stats_get')
+    def get(term):
+        """Get polling history for a single term, or None"""
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT * FROM term_stats WHERE term = ?', (term,))
+        row = cursor.fetchone()
+        conn.close()
+        
+        return TermStats(*row) if row else None
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='term_stats_get_all')
+    def get_all():
+        """Get polling history for every term, keyed by term"""
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT * FROM term_stats')
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return {row[0]: TermStats(*row) for row in rows}
+
+class PageRequests:
+    """Search result pages fetched by every process, in one-minute buckets"""
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='page_requests_record')
+    def record(count, now=None):
+        minute = int((now or time.time()) // 60)
+        conn = sqlite3.connect(DATABASE_PATH, timeout=30)
+        cursor = conn.cursor()
+        
+        cursor.execute('INSERT OR IGNORE INTO page_requests (minute) VALUES (?)', (minute,))
+        cursor.execute('UPDATE page_requests SET requests = requests + ? WHERE minute = ?', (count, minute))
+        cursor.execute('DELETE FROM page_requests WHERE minute <= ?', (minute - 60,))
+        conn.commit()
+        conn.close()
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='page_requests_last_hour')
+    def last_hour(now=None):
+        """Pages fetched in the rolling hour"""
+        minute = int((now or time.time()) // 60)
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT IFNULL(SUM(requests), 0) FROM page_requests WHERE minute > ?', (minute - 60,))
+        requests = cursor.fetchone()[0]
+        conn.close()
+        
+        return requests
+
+class ProfileArms:
+    """Count of upcoming check cycles to profile, in whichever process runs them"""
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='profile_arm')
+    def arm(cycles):
+        """Add cycles to the armed count, returning the new total"""
+        conn = sqlite3.connect(DATABASE_PATH, timeout=30, isolation_level=None)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('UPDATE profile_arms SET cycles = cycles + ? WHERE id = 1', (cycles,))
+            cursor.execute('SELECT cycles FROM profile_arms WHERE id = 1')
+            total = cursor.fetchone()[0]
+            cursor.execute('COMMIT')
+            return total
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='profile_take')
+    def take():
+        """Use up one armed cycle; False if none are armed"""
+        conn = sqlite3.connect(DATABASE_PATH, timeout=30)
+        cursor = conn.cursor()
+        
+        cursor.execute('UPDATE profile_arms SET cycles = cycles - 1 WHERE id = 1 AND cycles > 0')
+        taken = cursor.rowcount > 0
+        conn.commit()
+        conn.close()
+        
+        return taken
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='profile_armed')
+    def armed():
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT cycles FROM profile_arms WHERE id = 1')
+        row = cursor.fetchone()
+        conn.close()
+        
+        return row[0] if row else 0
+
+class TermWatermark:
+    @staticmethod
+    @DB_SECONDS.timed(operation='term_watermark_get')
+    def get(term):
+        """(newest lot URL seen, whether the last crawl completed) for a term"""
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT url, complete FROM term_watermarks WHERE term = ?', (term.lower(),))
+        row = cursor.fetchone()
+        conn.close()
+        
+        return (row[0], bool(row[1])) if row else (None, True)
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='term_watermark_set')
+    def set(term, url, complete=True):
+        """Record where the next crawl of a term may stop"""
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT OR REPLACE INTO term_watermarks (term, url, complete, updated_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        ''', (term.lower(), url, complete))
+        conn.commit()
+        conn.close()
+
+class JobRecord:
+    """Check jobs as seen by every process: requested, queued, running or finished"""
+    
+    COLUMNS = ['id', 'kind', 'source', 'term', 'terms', 'listener_ids', 'status', 'requests',
+               'created_at', 'started_at', 'finished_at', 'error', 'progress', 'merged_into', 'worker_id']
+    JSON_COLUMNS = ('terms', 'listener_ids', 'progress')
+    
+    @staticmethod
+    def _from_row(row):
+        record = dict(zip(JobRecord.COLUMNS, row))
+        for column in JobRecord.JSON_COLUMNS:
+            record[column] = json.loads(record[column]) if record[column] else None
+        return record
+    
+    @staticmethod
+    def _to_row(record):
+        return [json.dumps(record.get(column)) if column in JobRecord.JSON_COLUMNS and record.get(column) is not None
+                else record.get(column) for column in JobRecord.COLUMNS]
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='job_save')
+    def save(job, worker_id=None):
+        """Insert or update a job from its dict form"""
+        conn = sqlite3.connect(DATABASE_PATH, timeout=30)
+        cursor = conn.cursor()
+        
+        cursor.execute(f'''
+            INSERT OR REPLACE INTO jobs ({', '.join(JobRecord.COLUMNS)})
+            VALUES ({', '.join('?' for _ in JobRecord.COLUMNS)})
+        ''', JobRecord._to_row(dict(job, worker_id=worker_id)))
+        conn.commit()
+        conn.close()
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='job_request')
+    def request(kind, source, term=None, terms=None, listener_ids=None):
+        """
+        Ask a scheduler process to run a check, returning (record, merged)
+        A request matching one that no scheduler has picked up yet is merged into it
+        """
+        conn = sqlite3.connect(DATABASE_PATH, timeout=30, isolation_level=None)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+                SELECT * FROM jobs
+                WHERE status = 'requested' AND kind = ? AND IFNULL(LOWER(term), '') = IFNULL(LOWER(?), '')
+            ''', (kind, term))
+            row = cursor.fetchone()
+            
+            if row is not None:
+                record = JobRecord._from_row(row)
+                merged_ids = list(record['listener_ids'] or [])
+                merged_ids.extend(i for i in listener_ids or [] if i not in merged_ids)
+                cursor.execute('UPDATE jobs SET requests = requests + 1, listener_ids = ? WHERE id = ?',
+                               (json.dumps(merged_ids), record['id']))
+                cursor.execute('COMMIT')
+                record['requests'] += 1
+                record['listener_ids'] = merged_ids
+                return record, True
+            
+            record = {
+                'id': uuid.uuid4().hex[:12], 'kind': kind, 'source': source, 'term': term,
+                'terms': list(terms or []), 'listener_ids': list(listener_ids or []),
+                'status': 'requested', 'requests': 1, 'created_at': datetime.utcnow().isoformat(),
+                'started_at': None, 'finished_at': None, 'error': None, 'progress': None,
+                'merged_into': None, 'worker_id': None
+            }
+            cursor.execute(f'''
+                INSERT INTO jobs ({', '.join(JobRecord.COLUMNS)})
+                VALUES ({', '.join('?' for _ in JobRecord.COLUMNS)})
+            ''', JobRecord._to_row(record))
+            cursor.execute('COMMIT')
+            return record, False
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def mark_merged(job_id, merged_into):
+        """Record that a requested job was folded into another one"""
+        conn = sqlite3.connect(DATABASE_PATH, timeout=30)
+        cursor = conn.cursor()
+        
+        cursor.execute("UPDATE jobs SET status = 'merged', merged_into = ? WHERE id = ?", (merged_into, job_id))
+        conn.commit()
+        conn.close()
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='job_claim_requested')
+    def claim_requested(worker_id):
+        """Take ownership of requested jobs no scheduler has picked up yet"""
+        conn = sqlite3.connect(DATABASE_PATH, timeout=30)
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT * FROM jobs WHERE status = 'requested' ORDER BY created_at")
+        candidates = [JobRecord._from_row(row) for row in cursor.fetchall()]
+        
+        claimed = []
+        for record in candidates:
+            cursor.execute("""
+                UPDATE jobs SET status = 'queued', worker_id = ?
+                WHERE id = ? AND status = 'requested'
+            """, (worker_id, record['id']))
+            if cursor.rowcount > 0:
+                conn.commit()
+                # Re-read: more requests may have been merged in before the claim
+                cursor.execute('SELECT * FROM jobs WHERE id = ?', (record['id'],))
+                claimed.append(JobRecord._from_row(cursor.fetchone()))
+        
+        conn.close()
+        return claimed
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='job_get')
+    def get(job_id):
+        """Get a job by id, following merges to the job that actually ran"""
+        conn = sqlite3.connect(DATABASE_PATH, timeout=30)
+        cursor = conn.cursor()
+        
+        record = None
+        for _ in range(5):
+            cursor.execute('SELECT * FROM jobs WHERE id = ?', (job_id,))
+            row = cursor.fetchone()
+            if row is None:
+                break
+            record = JobRecord._from_row(row)
+            if not record['merged_into']:
+                break
+            job_id = record['merged_into']
+        
+        conn.close()
+        return record
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='job_status')
+    def status(limit=20):
+        """Running, waiting and recent jobs across every scheduler process"""
+        conn = sqlite3.connect(DATABASE_PATH, timeout=30)
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT * FROM jobs WHERE status = 'running' ORDER BY started_at")
+        running = [JobRecord._from_row(row) for row in cursor.fetchall()]
+        cursor.execute("SELECT * FROM jobs WHERE status IN ('requested', 'queued') ORDER BY created_at")
+        pending = [JobRecord._from_row(row) for row in cursor.fetchall()]
+        cursor.execute("SELECT * FROM jobs WHERE status != 'merged' ORDER BY created_at DESC LIMIT ?", (limit,))
+        recent = [JobRecord._from_row(row) for row in cursor.fetchall()]
+        conn.close()
+        
+        return {
+            'current': running[0] if running else None,
+            'running': running,
+            'pending': pending,
+            'recent': recent
+        }
+
+class DataVersion:
+    """Database-wide write counter maintained by triggers (see DATA_VERSION_TRIGGERS)"""
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='data_version_get')
+    def current():
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT version FROM data_version WHERE id = 1')
+        row = cursor.fetchone()
+        conn.close()
+        
+        return row[0] if row else 0
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='listener_version_get')
+    def listeners():
+        """Counter bumped by every write to the listeners table, from any process"""
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT listener_version FROM data_version WHERE id = 1')
+        row = cursor.fetchone()
+        conn.close()
+        
+        return row[0] if row else 0
+
+class SystemStats:
+    """System-wide counts computed with SQL aggregates"""
+    
+    @staticmethod
+    @DB_SECONDS.timed(operation='stats_summary')
+    def summary(top_terms=10):
+        """Listener, item and notification counts, the most watched terms and the last check cycle"""
+        conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT COUNT(*), COUNT(DISTINCT email), COUNT(DISTINCT LOWER(search_term))
+            FROM listeners WHERE active = TRUE
+        ''')
+        total_listeners, unique_emails, unique_terms = cursor.fetchone()
+        
+        cursor.execute('''
+            SELECT MIN(search_term), COUNT(*) FROM listeners WHERE active = TRUE
+            GROUP BY LOWER(search_term) ORDER BY COUNT(*) DESC, LOWER(search_term) LIMIT ?
+        ''', (top_terms,))
+        terms = [{'search_term': term, 'listeners': count} for term, count in cursor.fetchall()]
+        
+        cursor.execute('SELECT COUNT(*) FROM auction_items')
+        total_items = cursor.fetchone()[0]
+        cursor.execute('SELECT COUNT(*) FROM notifications')
+        total_notifications = cursor.fetchone()[0]
+        
+        # Scheduled cycles are 'poll' jobs under adaptive polling, 'full' otherwise
+        cursor.execute('''
+            SELECT id, kind, status, started_at, finished_at,
+                   (julianday(finished_at) - julianday(started_at)) * 86400
+            FROM jobs
+            WHERE kind IN ('full', 'poll') AND finished_at IS NOT NULL AND started_at IS NOT NULL
+            ORDER BY finished_at DESC LIMIT 1
+        ''')
+        row = cursor.fetchone()
+        conn.close()
+        
+        last_cycle = None
+        if row is not None:
+            last_cycle = {
+                'job_id': row[0],
+                'kind': row[1],
+                'status': row[2],
+                'started_at': row[3],
+                'finished_at': row[4],
+                'duration_s': round(row[5], 3) if row[5] is not None else None
+            }
+        
+        return {
+            'total_listeners': total_listeners,
+            'unique_emails': unique_emails,
+            'unique_search_terms': unique_terms,
+            'top_search_terms': terms,
+            'total_items': total_items,
+            'total_notifications': total_notifications,
+            'last_cycle': last_cycle
+        }
 
 # Initialize database when module is imported
 init_database()
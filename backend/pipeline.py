@@ -0,0 +1,386 @@
+"""
+Staged check pipeline: scrape -> persist -> enrich -> match -> notify
+Stages run on their own threads connected by bounded queues, so items found for
+the first term are saved, matched and emailed while later terms are still loading
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+
+from listener_snapshot import ListenerView
+from seen_urls import seen_urls as seen_url_filter
+from events import event_bus
+from models import Listener, AuctionItem, Notification, PriceHistory, PriceAlert
+from email_service import email_service
+from polling import parse_end_time
+from pricing import format_cents
+from enrich import detail_enricher, ENRICH_DETAILS, ENRICH_WORKERS
+from metrics import MATCH_SECONDS, ITEMS_NEW, ITEMS_CHANGED
+import profiling
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '100'))
+NOTIFY_WORKERS = int(os.getenv('NOTIFY_WORKERS', '1'))
+# Email listeners already alerted about a lot when its price changes
+PRICE_CHANGE_ALERTS = os.getenv('PRICE_CHANGE_ALERTS', 'false').lower() == 'true'
+
+# Marks the end of a stage's input
+_DONE = object()
+
+class Stage:
+    """One pipeline stage: a handler run by worker threads over a bounded inbox"""
+
+    def __init__(self, name, handler, inbox, workers=1):
+        self.name = name
+        self.handler = handler
+        self.inbox = inbox
+        self.downstream = None
+        self.workers = workers
+        self.threads = []
+        self.processed = 0
+        self.emitted = 0
+        self.errors = 0
+        self.busy_s = 0.0
+        self.blocked_s = 0.0
+        self.max_depth = 0
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the worker threads"""
+        self.started_at = time.monotonic()
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"pipeline-{self.name}-{n}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def join(self):
+        """Wait for every worker to drain its input"""
+        for thread in self.threads:
+            thread.join()
+        self.finished_at = time.monotonic()
+
+    def emit(self, value):
+        """Send a value downstream, blocking while the next stage is full"""
+        if self.downstream is None:
+            return
+        start = time.monotonic()
+        self.downstream.inbox.put(value)
+        waited = time.monotonic() - start
+        with self._lock:
+            self.emitted += 1
+            self.blocked_s += waited
+        self.downstream.observe_depth()
+
+    def observe_depth(self):
+        """Record the current inbox depth for max-depth reporting"""
+        depth = self.inbox.qsize()
+        with self._lock:
+            if depth > self.max_depth:
+                self.max_depth = depth
+
+    def _run(self):
+        with ExitStack() as stack:
+            # Profiling is best effort; the inbox must be drained regardless
+            try:
+                stack.enter_context(profiling.thread_profile())
+            except Exception as e:
+                logger.warning(f"Pipeline stage '{self.name}' running unprofiled: {e}")
+            self._drain()
+
+    def _drain(self):
+        while True:
+            value = self.inbox.get()
+            if value is _DONE:
+                break
+
+            start = time.monotonic()
+            try:
+                self.handler(value, self.emit)
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                logger.error(f"Pipeline stage '{self.name}' failed: {e}")
+            finally:
+                with self._lock:
+                    self.processed += 1
+                    self.busy_s += time.monotonic() - start
+
+    def stats(self):
+        """Throughput and queue depth for this stage"""
+        with self._lock:
+            end = self.finished_at or time.monotonic()
+            elapsed = end - self.started_at if self.started_at else 0.0
+            depth = self.inbox.qsize()
+            return {
+                'processed': self.processed,
+                'emitted': self.emitted,
+                'errors': self.errors,
+                'busy_s': round(self.busy_s, 3),
+                'blocked_s': round(self.blocked_s, 3),
+                'per_second': round(self.processed / elapsed, 2) if elapsed else 0.0,
+                'queue_depth': depth,
+                'max_queue_depth': max(self.max_depth, depth),
+                'queue_capacity': self.inbox.maxsize,
+                'running': self.started_at is not None and self.finished_at is None
+            }
+
+def match_event(listener, item):
+    """Live event payload for a lot a listener was just emailed about"""
+    return {
+        'listener_id': listener.id,
+        'search_term': listener.search_term,
+        'item_id': item.id,
+        'title': item.title,
+        'url': item.url,
+        'price': item.price,
+        'end_time': item.end_time,
+        'image_url': item.image_url
+    }
+
+class CheckPipeline:
+    """Runs one check cycle through scrape, persist, match and notify stages"""
+
+    def __init__(self, scraper, listeners, queue_size=QUEUE_SIZE, notify_workers=NOTIFY_WORKERS,
+                 include_known=False, enricher=None):
+        self.scraper = scraper
+        # A ListenerView from the shared snapshot, or a plain list (targeted checks)
+        view = listeners if isinstance(listeners, ListenerView) else ListenerView(listeners)
+        self.listeners = view.listeners
+        self.view = view
+        # Fetches lot detail pages for items saved without an end time or image
+        self.enricher = enricher if enricher is not None else (detail_enricher if ENRICH_DETAILS else None)
+        # Backfill mode: also match items already stored by earlier cycles
+        self.include_known = include_known
+        # Every listener query compiled together; scraping covers the plan's fetch terms
+        self.plan = view.plan
+        self.search_terms = self.plan.fetch_terms
+        # Only consult the database for price bounds when some listener has them
+        self.price_bounded = view.price_bounded
+        self.terms = self.search_terms
+        self.seen_urls = set()
+        # Per-term new item counts and soonest closing lot, for adaptive polling
+        self.term_new_items = defaultdict(int)
+        self.term_soonest_end = {}
+        # Per-term scrape time and item counts, for slow-cycle captures
+        self.term_scrape_s = {}
+        self.term_items = defaultdict(int)
+        self.items_changed = 0
+        self.items_enriched = 0
+        self.notifications_sent = 0
+        self.price_alerts_sent = 0
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+        self.stages = [
+            Stage('scrape', self._scrape, queue.Queue(maxsize=queue_size)),
+            Stage('persist', self._persist, queue.Queue(maxsize=queue_size)),
+            Stage('enrich', self._enrich, queue.Queue(maxsize=queue_size), workers=ENRICH_WORKERS),
+            Stage('match', self._match, queue.Queue(maxsize=queue_size)),
+            Stage('notify', self._notify, queue.Queue(maxsize=queue_size), workers=notify_workers)
+        ]
+        for stage, downstream in zip(self.stages, self.stages[1:]):
+            stage.downstream = downstream
+        self.stage = {stage.name: stage for stage in self.stages}
+
+    def run(self, terms=None, stored_items=()):
+        """
+        Run the pipeline over the given terms (default: every listener term)
+        stored_items skip scraping and persisting and go straight to matching
+        """
+        if terms is not None:
+            self.terms = list(terms)
+        self.started_at = time.monotonic()
+
+        for stage in self.stages:
+            stage.start()
+
+        for item in stored_items:
+            # A scraped copy of a stored item is already being matched
+            self.seen_urls.add(item.url)
+            self.stage['match'].inbox.put((item, None))
+
+        source = self.stages[0]
+        for term in self.terms:
+            source.inbox.put(term)
+
+        # Close each stage once everything upstream of it has drained
+        for stage in self.stages:
+            for _ in range(stage.workers):
+                stage.inbox.put(_DONE)
+            stage.join()
+
+        self.finished_at = time.monotonic()
+        return self.stats()
+
+    def _scrape(self, term, emit):
+        start = time.monotonic()
+        items = self.scraper.scrape_term(term)
+        with self._lock:
+            self.term_scrape_s[term] = time.monotonic() - start
+            self.term_items[term] += len(items)
+        # One lookup per page; persist then only compares hashes for lots it has seen
+        stored = AuctionItem.get_hashes(item.url for item in items)
+        for item in items:
+            emit((term, item, stored.get(item.url)))
+
+    def _persist(self, scraped, emit):
+        term, item, stored = scraped
+        self._track_end_time(term, item)
+        if item.url in self.seen_urls:
+            return
+        self.seen_urls.add(item.url)
+
+        if stored is None:
+            if item.save():
+                logger.info(f"💾 Saved new auction item: {item.title}")
+                self.term_new_items[term] += 1
+                ITEMS_NEW.inc()
+                emit((term, item, None))
+                return
+            # Another worker stored it since this process last synced its seen filter
+            stored = AuctionItem.get_hashes([item.url]).get(item.url)
+            if stored is None:
+                return
+
+        item_id, stored_hash = stored
+        if stored_hash != item.content_hash:
+            self._record_change(term, item_id, item, emit)
+        if self.include_known:
+            known = AuctionItem.get_by_id(item_id)
+            if known is not None:
+                emit((term, known, None))
+
+    def _record_change(self, term, item_id, item, emit):
+        change = PriceHistory.record(item_id, item)
+        if change is None:
+            return
+        with self._lock:
+            self.items_changed += 1
+        ITEMS_CHANGED.inc()
+        logger.info(f"Auction item '{item.title}' changed: price {change['old_price_cents']} -> "
+                    f"{change['new_price_cents']}, end time {change['old_end_time']} -> {change['new_end_time']}")
+
+        # Backfill runs emit the stored copy anyway; alerts come from regular cycles only
+        if not PRICE_CHANGE_ALERTS or self.include_known:
+            return
+        if change['price_changed'] and change['new_price_cents'] is not None:
+            item.id = item_id
+            emit((term, item, change))
+
+    def _enrich(self, persisted, emit):
+        term, item, change = persisted
+        if self.enricher is not None and change is None and self.enricher.needs_details(item):
+            if self.enricher.enrich(item):
+                item.update_details()
+                with self._lock:
+                    self.items_enriched += 1
+                self._track_end_time(term, item)
+        emit((item, change))
+
+    def _track_end_time(self, term, item):
+        end_at = parse_end_time(item.end_time)
+        if end_at is None or end_at <= time.time():
+            return
+        # Persist and the enrich workers both report end times
+        with self._lock:
+            if term not in self.term_soonest_end or end_at < self.term_soonest_end[term]:
+                self.term_soonest_end[term] = end_at
+
+    def _match(self, matched_item, emit):
+        item, change = matched_item
+        with MATCH_SECONDS.time():
+            matching_terms = set(self.plan.match(item))
+        if not matching_terms:
+            return
+
+        logger.info(f"Item '{item.title}' matches terms: {matching_terms}")
+        matched = self.view.for_terms(matching_terms)
+
+        if self.price_bounded and any(listener.price_bounded for listener in matched):
+            # Evaluate every matched listener's price range in one query
+            allowed = Listener.filter_by_price([listener.id for listener in matched], item.price_cents, item.currency)
+            skipped = len(matched) - len(allowed)
+            if skipped:
+                logger.info(f"Item '{item.title}' outside the price range of {skipped} listeners")
+            matched = [listener for listener in matched if listener.id in allowed]
+
+        for listener in matched:
+            emit((listener, item, change))
+
+    def _notify(self, match, emit):
+        listener, item, change = match
+        if change is not None:
+            self._notify_price_change(listener, item, change)
+            return
+
+        # Claim the combination first so concurrent workers never send it twice
+        if not Notification.claim(listener.id, item.id):
+            return
+
+        if email_service.send_notification(listener.email, item, listener.search_term):
+            Notification.mark_sent(listener.id, item.id)
+            with self._lock:
+                self.notifications_sent += 1
+            logger.info(f"Notification sent to {listener.email} for '{item.title}'")
+            event_bus.publish('match', match_event(listener, item), email=listener.email)
+        else:
+            Notification.release(listener.id, item.id)
+            logger.error(f"Failed to send notification to {listener.email}")
+
+    def _notify_price_change(self, listener, item, change):
+        # Only listeners who were told about the lot hear that its price moved
+        if not Notification.already_sent(listener.id, item.id):
+            return
+        if not PriceAlert.claim(listener.id, item.id, change['new_price_cents']):
+            return
+
+        old_price = format_cents(change['old_price_cents'], change['currency']) or 'unknown'
+        if email_service.send_price_change(listener.email, item, listener.search_term, old_price):
+            PriceAlert.mark_sent(listener.id, item.id, change['new_price_cents'])
+            with self._lock:
+                self.price_alerts_sent += 1
+            event_bus.publish('price_change', dict(match_event(listener, item), old_price=old_price),
+                              email=listener.email)
+        else:
+            PriceAlert.release(listener.id, item.id, change['new_price_cents'])
+            logger.error(f"Failed to send price change alert to {listener.email}")
+
+    def term_timings(self):
+        """Scrape time, items found and new items per term, slowest first"""
+        with self._lock:
+            timings = {
+                term: {
+                    'scrape_s': round(seconds, 3),
+                    'items': self.term_items.get(term, 0),
+                    'new_items': self.term_new_items.get(term, 0)
+                }
+                for term, seconds in self.term_scrape_s.items()
+            }
+        return dict(sorted(timings.items(), key=lambda entry: entry[1]['scrape_s'], reverse=True))
+
+    def stats(self):
+        """Per-stage throughput and queue depth plus cycle totals"""
+        end = self.finished_at or time.monotonic()
+        return {
+            'running': self.started_at is not None and self.finished_at is None,
+            'backfill': self.include_known,
+            'elapsed_s': round(end - self.started_at, 3) if self.started_at else 0.0,
+            'terms': len(self.terms),
+            'terms_done': self.stage['scrape'].processed,
+            'new_items': sum(self.term_new_items.values()),
+            'changed_items': self.items_changed,
+            'enriched_items': self.items_enriched,
+            'matches': self.stage['match'].emitted,
+            'notifications_sent': self.notifications_sent,
+            'price_alerts_sent': self.price_alerts_sent,
+            'seen_url_filter': seen_url_filter.status(),
+            'stages': {stage.name: stage.stats() for stage in self.stages}
+        }
@@ -0,0 +1,153 @@
+"""
+Adaptive per-term polling
+Tracks how many new lots each term yields and when its lots close, and decides
+which terms are due for a scrape within a global hourly request budget. The
+budget counts search result pages fetched by every process (page_requests), and
+each term is charged the pages its last crawl took
+"""
+import logging
+import os
+import time
+from datetime import datetime
+
+from models import TermStats, PageRequests
+
+logger = logging.getLogger(__name__)
+
+BASE_INTERVAL_MINUTES = float(os.getenv('POLL_BASE_INTERVAL_MINUTES', '30'))
+MIN_INTERVAL_MINUTES = float(os.getenv('POLL_MIN_INTERVAL_MINUTES', '10'))
+MAX_INTERVAL_MINUTES = float(os.getenv('POLL_MAX_INTERVAL_MINUTES', '240'))
+# Result pages per hour across every worker, full checks included
+REQUEST_BUDGET_PER_HOUR = int(os.getenv('POLL_REQUEST_BUDGET_PER_HOUR', '120'))
+ENDING_SOON_HOURS = float(os.getenv('POLL_ENDING_SOON_HOURS', '6'))
+
+# Weight of the latest poll in the yield moving average
+YIELD_ALPHA = 0.3
+# New items per poll at which a term is polled at the base interval
+TARGET_YIELD = 1.0
+
+END_TIME_FORMATS = [
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d %H:%M',
+    '%d %b %Y %H:%M',
+    '%d %B %Y %H:%M',
+    '%d/%m/%Y %H:%M'
+]
+
+def parse_end_time(text):
+    """Parse a lot end time into a Unix timestamp, or None if unrecognised"""
+    if not text:
+        return None
+
+    text = text.strip()
+    try:
+        return datetime.fromisoformat(text.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        pass
+
+    for fmt in END_TIME_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).timestamp()
+        except ValueError:
+            continue
+
+    return None
+
+class PollPlanner:
+    """Chooses which terms to scrape next based on yield history and closing lots"""
+
+    def __init__(self, budget_per_hour=REQUEST_BUDGET_PER_HOUR):
+        self.budget_per_hour = budget_per_hour
+
+    def interval_for(self, stats, now=None):
+        """Seconds until a term should be polled again"""
+        now = now or time.time()
+
+        if stats.soonest_end_at and now < stats.soonest_end_at <= now + ENDING_SOON_HOURS * 3600:
+            return MIN_INTERVAL_MINUTES * 60
+
+        # Productive terms are polled proportionally more often than dormant ones
+        minutes = BASE_INTERVAL_MINUTES * TARGET_YIELD / max(stats.yield_ema, 0.01)
+        minutes = max(MIN_INTERVAL_MINUTES, min(MAX_INTERVAL_MINUTES, minutes))
+        return minutes * 60
+
+    def remaining_budget(self, now=None):
+        """Result pages still available in the rolling hour, across every process"""
+        return max(0, self.budget_per_hour - PageRequests.last_hour(now))
+
+    def due_terms(self, terms, now=None, share=1.0):
+        """
+        Pick the terms to poll now, most overdue first, within the request budget
+        Terms never polled before are always due. A sharded worker passes the
+        fraction of all terms it owns as share and spends only that part of the
+        remaining budget, so workers polling at once stay within it together
+        """
+        now = now or time.time()
+        history = TermStats.get_all()
+
+        candidates = []
+        unique_terms = {term.lower(): term for term in terms}
+        for term in unique_terms.values():
+            stats = history.get(term.lower())
+            if stats is None or stats.next_poll_at is None:
+                candidates.append((float('inf'), 1, term))
+                continue
+
+            # Re-evaluate with the current clock so closing lots pull a term forward
+            next_poll_at = min(stats.next_poll_at, stats.last_polled_at + self.interval_for(stats, now))
+            if next_poll_at <= now:
+                interval = max(next_poll_at - stats.last_polled_at, 1)
+                candidates.append(((now - next_poll_at) / interval, max(stats.pages or 1, 1), term))
+
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        budget = int(self.remaining_budget(now) * share)
+
+        due = []
+        for _, pages, term in candidates:
+            if pages <= budget:
+                due.append(term)
+                budget -= pages
+        if len(due) < len(candidates):
+            logger.info(f"Poll budget allows {len(due)} of {len(candidates)} due terms this tick")
+
+        return due
+
+    def record_poll(self, term, new_items, soonest_end_at=None, now=None):
+        """Update a term's yield history after it has been scraped"""
+        now = now or time.time()
+        key = term.lower()
+
+        stats = TermStats.get(key) or TermStats(term=key)
+        # The first poll sees every current lot as new, so it says nothing about yield
+        if stats.polls:
+            stats.yield_ema = YIELD_ALPHA * new_items + (1 - YIELD_ALPHA) * stats.yield_ema
+        stats.polls += 1
+        stats.new_items += new_items
+        stats.last_polled_at = now
+        if soonest_end_at is not None:
+            stats.soonest_end_at = soonest_end_at
+        elif stats.soonest_end_at and stats.soonest_end_at <= now:
+            stats.soonest_end_at = None
+        stats.next_poll_at = now + self.interval_for(stats, now)
+        stats.save()
+
+    def snapshot(self):
+        """Polling state for every known term"""
+        now = time.time()
+        return {
+            'budget_per_hour': self.budget_per_hour,
+            'remaining_budget': self.remaining_budget(now),
+            'terms': [
+                {
+                    'term': stats.term,
+                    'yield_ema': round(stats.yield_ema, 3),
+                    'polls': stats.polls,
+                    'pages': stats.pages,
+                    'new_items': stats.new_items,
+                    'last_polled_at': stats.last_polled_at,
+                    'next_poll_in_s': round(stats.next_poll_at - now) if stats.next_poll_at else None,
+                    'soonest_end_at': stats.soonest_end_at
+                }
+                for stats in TermStats.get_all().values()
+            ]
+        }
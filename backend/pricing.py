@@ -0,0 +1,109 @@
+"""
+Price normalization
+Turns scraped price text ("R 1,250", "R1 250.00", "$99.50") into integer cents
+and an ISO currency code so prices can be indexed and compared in SQL
+"""
+import math
+import os
+import re
+
+DEFAULT_CURRENCY = os.getenv('DEFAULT_CURRENCY', 'ZAR')
+
+CURRENCY_SYMBOLS = {
+    'R': 'ZAR',
+    'ZAR': 'ZAR',
+    'US$': 'USD',
+    'USD': 'USD',
+    '$': 'USD',
+    '€': 'EUR',
+    'EUR': 'EUR',
+    '£': 'GBP',
+    'GBP': 'GBP'
+}
+
+_CURRENCY = '|'.join(re.escape(symbol) for symbol in sorted(CURRENCY_SYMBOLS, key=len, reverse=True))
+# Grouped thousands (comma, dot, space, no-break space, apostrophe) or plain digits, with optional decimals
+_NUMBER = r"\d{1,3}(?:[,.'\s\u00a0\u202f]\d{3})+(?:[.,]\d{1,2})?|\d+(?:[.,]\d{1,2})?"
+_PREFIXED = re.compile(rf"(?<![A-Za-z])({_CURRENCY})\s*({_NUMBER})(?!\d)")
+_SUFFIXED = re.compile(rf"(?<![\d.,])({_NUMBER})\s*({_CURRENCY})(?![A-Za-z])")
+_BARE = re.compile(_NUMBER)
+# A minus sign (ASCII or U+2212) before an amount, with or without its currency
+_NEGATIVE = re.compile(rf"[-\u2212]\s*(?:(?:{_CURRENCY})\s*)?\d")
+
+def _to_cents(number):
+    """Cents for a number string, or None; handles 1,250.00 / 1 250,00 / 1.250,00"""
+    number = re.sub(r"[\s'\u00a0\u202f]", '', number).rstrip('.,')
+    if not number:
+        return None
+
+    last_comma = number.rfind(',')
+    last_dot = number.rfind('.')
+    decimal = max(last_comma, last_dot)
+    # The last separator is a decimal point only when followed by one or two digits
+    if decimal != -1 and 1 <= len(number) - decimal - 1 <= 2:
+        whole, fraction = number[:decimal], number[decimal + 1:]
+    else:
+        whole, fraction = number, ''
+    whole = re.sub(r'[.,]', '', whole)
+
+    if not whole.isdigit() and whole != '':
+        return None
+    return int(whole or 0) * 100 + int(fraction.ljust(2, '0') or 0)
+
+def parse_price(text):
+    """
+    Parse price text into (cents, currency)
+    Returns (None, None) when there is no amount; currency defaults to DEFAULT_CURRENCY
+    """
+    if not text:
+        return None, None
+
+    text = str(text).strip()
+    match = _PREFIXED.search(text)
+    if match:
+        symbol, number = match.groups()
+    else:
+        match = _SUFFIXED.search(text)
+        if match:
+            number, symbol = match.groups()
+        else:
+            # Without a currency marker only accept text that is just a number ("1,250")
+            match = _BARE.search(text)
+            if not match or re.search(r'[A-Za-z]', text):
+                return None, None
+            number, symbol = match.group(0), None
+
+    cents = _to_cents(number)
+    if cents is None:
+        return None, None
+    return cents, CURRENCY_SYMBOLS.get(symbol, DEFAULT_CURRENCY)
+
+def parse_amount(value):
+    """
+    Cents for a user-supplied bound: a number of currency units or price text
+    Returns None for empty input and raises ValueError for anything unparseable,
+    negative or not finite, whether given as a number or as text
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool):
+        raise ValueError(f"Invalid amount: {value!r}")
+    if isinstance(value, (int, float)):
+        if not math.isfinite(value) or value < 0:
+            raise ValueError(f"Invalid amount: {value!r}")
+        return int(round(value * 100))
+
+    # parse_price reads only the digits, so a sign would otherwise be dropped
+    if _NEGATIVE.search(str(value)):
+        raise ValueError(f"Invalid amount: {value!r}")
+    cents, _ = parse_price(value)
+    if cents is None:
+        raise ValueError(f"Invalid amount: {value!r}")
+    return cents
+
+def format_cents(cents, currency=DEFAULT_CURRENCY):
+    """Human-readable amount, e.g. 'R 1,250.00'"""
+    if cents is None:
+        return ''
+    symbol = 'R' if currency == 'ZAR' else currency
+    return f"{symbol} {cents / 100:,.2f}"
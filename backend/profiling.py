@@ -0,0 +1,218 @@
+"""
+On-demand profiling of check cycles
+Every cycle records cheap span timers; cycles armed through the API or
+PROFILE_CYCLES also run cProfile in each pipeline thread. Armed cycles and any
+cycle slower than SLOW_CYCLE_SECONDS are written to PROFILE_DIR
+"""
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import shutil
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+from models import ProfileArms
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles'))
+PROFILE_CYCLES = os.getenv('PROFILE_CYCLES', 'false').lower() == 'true'
+SLOW_CYCLE_SECONDS = float(os.getenv('SLOW_CYCLE_SECONDS', '600'))
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '20'))
+
+class CycleCapture:
+    """Span timings and per-thread profiles collected during one cycle"""
+
+    def __init__(self, job, cprofile):
+        self.job = job
+        self.cprofile = cprofile
+        self.spans = defaultdict(float)
+        self.pipeline = None
+        self._profiles = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.spans[name] += elapsed
+
+    @contextmanager
+    def thread_profile(self):
+        """Profile the calling thread for the duration of the block"""
+        if not self.cprofile:
+            yield
+            return
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows one active profiler per process; it already
+            # sees every thread, so this one runs under the cycle's profiler
+            profile = None
+        if profile is None:
+            yield
+            return
+
+        try:
+            yield
+        finally:
+            profile.disable()
+            with self._lock:
+                self._profiles.append(profile)
+
+    def stats(self):
+        """Merged pstats across every profiled thread, or None"""
+        with self._lock:
+            profiles = list(self._profiles)
+        if not profiles:
+            return None
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        return stats
+
+class CycleProfiler:
+    """Wraps check cycles and writes captures for armed or slow cycles"""
+
+    def __init__(self, directory=PROFILE_DIR, slow_seconds=SLOW_CYCLE_SECONDS, always=PROFILE_CYCLES):
+        self.directory = directory
+        self.slow_seconds = slow_seconds
+        self.always = always
+        self._current = None
+
+    def current(self):
+        return self._current
+
+    def arm(self, cycles=1):
+        """Profile the next N cycles in whichever process runs them"""
+        # Kept in SQLite so concurrent arms and takes from any process are atomic
+        return ProfileArms.arm(cycles)
+
+    def armed(self):
+        return ProfileArms.armed()
+
+    def _take_armed(self):
+        try:
+            return ProfileArms.take()
+        except Exception as e:
+            logger.warning(f"Could not check for an armed profile: {e}")
+            return False
+
+    @contextmanager
+    def cycle(self, job):
+        """Time (and optionally profile) one check cycle"""
+        capture = CycleCapture(job, cprofile=self.always or self._take_armed())
+        self._current = capture
+        started_at = datetime.utcnow()
+        start = time.perf_counter()
+        try:
+            with capture.thread_profile():
+                yield capture
+        finally:
+            elapsed = time.perf_counter() - start
+            self._current = None
+            if capture.cprofile or elapsed >= self.slow_seconds:
+                try:
+                    self._dump(capture, started_at, elapsed)
+                except Exception as e:
+                    logger.error(f"Failed to write cycle profile: {e}")
+
+    def _dump(self, capture, started_at, elapsed):
+        job = capture.job
+        name = f"{started_at.strftime('%Y%m%dT%H%M%S')}-{job.kind}-{job.id}"
+        path = os.path.join(self.directory, name)
+        os.makedirs(path, exist_ok=True)
+
+        pipeline = capture.pipeline.stats() if capture.pipeline is not None else None
+        terms = capture.pipeline.term_timings() if capture.pipeline is not None else {}
+        summary = {
+            'job_id': job.id,
+            'kind': job.kind,
+            'started_at': started_at.isoformat(),
+            'elapsed_s': round(elapsed, 3),
+            'slow': elapsed >= self.slow_seconds,
+            'profiled': capture.cprofile,
+            'spans': {span: round(seconds, 3) for span, seconds in capture.spans.items()},
+            'terms': terms,
+            'pipeline': pipeline
+        }
+        with open(os.path.join(path, 'timings.json'), 'w') as f:
+            json.dump(summary, f, indent=2)
+
+        stats = capture.stats()
+        if stats is not None:
+            stats.dump_stats(os.path.join(path, 'profile.prof'))
+            report = io.StringIO()
+            stats.stream = report
+            stats.sort_stats('cumulative').print_stats(60)
+            with open(os.path.join(path, 'profile.txt'), 'w') as f:
+                f.write(report.getvalue())
+
+        logger.info(f"Cycle capture written to {path} ({elapsed:.1f}s, profiled={capture.cprofile})")
+        self._prune()
+
+    def _prune(self):
+        captures = self.captures()
+        for capture in captures[PROFILE_KEEP:]:
+            shutil.rmtree(os.path.join(self.directory, capture['name']), ignore_errors=True)
+
+    def captures(self):
+        """Recent captures, newest first"""
+        if not os.path.isdir(self.directory):
+            return []
+
+        captures = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            path = os.path.join(self.directory, name)
+            if not os.path.isdir(path):
+                continue
+            try:
+                with open(os.path.join(path, 'timings.json')) as f:
+                    summary = json.load(f)
+            except (OSError, ValueError):
+                continue
+            captures.append({
+                'name': name,
+                'job_id': summary.get('job_id'),
+                'kind': summary.get('kind'),
+                'started_at': summary.get('started_at'),
+                'elapsed_s': summary.get('elapsed_s'),
+                'slow': summary.get('slow'),
+                'profiled': summary.get('profiled'),
+                'files': sorted(os.listdir(path))
+            })
+        return captures
+
+cycle_profiler = CycleProfiler()
+
+@contextmanager
+def span(name):
+    """Time a block against the cycle in progress, if any"""
+    capture = cycle_profiler.current()
+    if capture is None:
+        yield
+        return
+    with capture.span(name):
+        yield
+
+@contextmanager
+def thread_profile():
+    """Profile the calling thread if the cycle in progress is being profiled"""
+    capture = cycle_profiler.current()
+    if capture is None:
+        yield
+        return
+    with capture.thread_profile():
+        yield
@@ -0,0 +1,294 @@
+"""
+Listener query language and shared match plan
+A search term is either a plain substring (the original behaviour) or a query
+using uppercase AND / OR / NOT, parentheses and "quoted phrases":
+
+    logitech AND mouse NOT wireless
+    "mx master" OR (logitech AND trackball)
+
+Adjacent bare words form one substring; quoted phrases match whole words only.
+A stray quote in a plain term (24" monitor) is just a character of the substring.
+Every active query is compiled into one QueryPlan that evaluates each distinct
+sub-expression once per item and lists the base terms worth scraping
+"""
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+OPERATORS = ('AND', 'OR', 'NOT')
+MIN_TERM_LENGTH = 2
+
+_TOKEN_RE = re.compile(r'"([^"]*)"|(\()|(\))|(\S+?)(?=[()"]|\s|$)')
+
+class QuerySyntaxError(ValueError):
+    """Raised for search terms that are not valid queries"""
+
+def _tokenize(text):
+    tokens = []
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        if text[position].isspace():
+            position += 1
+            continue
+        match = _TOKEN_RE.match(text, position)
+        if match is None:
+            # A quote with no partner; parse_query decides whether that is an error
+            tokens.append(('quote', text[position]))
+            position += 1
+            continue
+        phrase, opening, closing, word = match.groups()
+        if phrase is not None:
+            tokens.append(('phrase', phrase))
+        elif opening:
+            tokens.append(('(', opening))
+        elif closing:
+            tokens.append((')', closing))
+        elif '"' in word:
+            tokens.append(('quote', word))
+        elif word in OPERATORS:
+            tokens.append((word, word))
+        else:
+            tokens.append(('word', word))
+        position = match.end()
+    return tokens
+
+def _leaf(kind, text):
+    text = ' '.join(text.lower().split())
+    if len(text) < MIN_TERM_LENGTH:
+        raise QuerySyntaxError(f'Terms must be at least {MIN_TERM_LENGTH} characters long')
+    return (kind, text)
+
+def _combine(kind, children):
+    """Flatten nested AND/OR and order children so equal expressions share a key"""
+    flat = []
+    for child in children:
+        if child[0] == kind:
+            flat.extend(child[1])
+        else:
+            flat.append(child)
+    flat = sorted(set(flat), key=repr)
+    return flat[0] if len(flat) == 1 else (kind, tuple(flat))
+
+class _Parser:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position][0] if self.position < len(self.tokens) else None
+
+    def take(self):
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def parse(self):
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise QuerySyntaxError(f"Unexpected '{self.tokens[self.position][1]}'")
+        return node
+
+    def parse_or(self):
+        children = [self.parse_and()]
+        while self.peek() == 'OR':
+            self.take()
+            children.append(self.parse_and())
+        return _combine('or', children)
+
+    def parse_and(self):
+        children = [self.parse_not()]
+        while self.peek() in ('AND', 'NOT', 'word', 'phrase', '('):
+            # "a NOT b" reads as "a AND NOT b"; adjacent terms are ANDed
+            if self.peek() == 'AND':
+                self.take()
+            children.append(self.parse_not())
+        return _combine('and', children)
+
+    def parse_not(self):
+        if self.peek() == 'NOT':
+            self.take()
+            return ('not', self.parse_not())
+        return self.parse_atom()
+
+    def parse_atom(self):
+        kind = self.peek()
+        if kind is None:
+            raise QuerySyntaxError('Query ends where a term was expected')
+        if kind == '(':
+            self.take()
+            node = self.parse_or()
+            if self.peek() != ')':
+                raise QuerySyntaxError("Missing ')'")
+            self.take()
+            return node
+        if kind == 'phrase':
+            return _leaf('word', self.take()[1])
+        if kind == 'word':
+            words = [self.take()[1]]
+            while self.peek() == 'word':
+                words.append(self.take()[1])
+            return _leaf('sub', ' '.join(words))
+        raise QuerySyntaxError(f"Unexpected '{self.tokens[self.position][1]}'")
+
+def parse_query(text):
+    """
+    Parse a search term into an expression tree of tuples:
+    ('sub', text), ('word', text), ('not', node), ('and', nodes), ('or', nodes)
+    """
+    if not text or not text.strip():
+        raise QuerySyntaxError('Search term is empty')
+
+    tokens = _tokenize(text)
+    syntax = [kind for kind, _ in tokens if kind not in ('word', 'quote')]
+    unbalanced = text.count('"') % 2 == 1
+    if not syntax or (unbalanced and all(kind == 'phrase' for kind in syntax)):
+        # Plain term: the whole string is one substring, exactly as before;
+        # quotes that do not pair up are literal characters
+        term = text.strip().lower()
+        if len(term) < MIN_TERM_LENGTH:
+            raise QuerySyntaxError(f'Terms must be at least {MIN_TERM_LENGTH} characters long')
+        return ('sub', term)
+
+    if any(kind == 'quote' for kind, _ in tokens):
+        raise QuerySyntaxError('Unterminated quoted phrase')
+
+    node = _Parser(tokens).parse()
+    if fetch_terms_for(node) is None:
+        raise QuerySyntaxError('Query needs at least one term that is not negated')
+    return node
+
+def fetch_terms_for(node):
+    """
+    Base terms whose search results cover every item the expression can match,
+    or None if it cannot be covered (a bare NOT). For AND any one operand is
+    enough, so the one needing the fewest and longest terms is chosen
+    """
+    kind = node[0]
+    if kind in ('sub', 'word'):
+        return [node[1]]
+    if kind == 'not':
+        return None
+    options = [fetch_terms_for(child) for child in node[1]]
+    if kind == 'or':
+        if any(option is None for option in options):
+            return None
+        return list(dict.fromkeys(term for option in options for term in option))
+    options = [option for option in options if option is not None]
+    if not options:
+        return None
+    return min(options, key=lambda option: (len(option), -sum(len(term) for term in option)))
+
+# Relative cost of evaluating a node, for ordering AND/OR operands
+_COST = {'sub': 0, 'word': 1, 'and': 2, 'or': 2, 'not': 3}
+
+def _word_pattern(phrase):
+    words = [re.escape(word) for word in phrase.split()]
+    return re.compile(r'(?<!\w)' + r'\s+'.join(words) + r'(?!\w)')
+
+class QueryPlan:
+    """All active queries compiled together so shared sub-expressions are evaluated once per item"""
+
+    def __init__(self, queries):
+        self.queries = {}
+        for query in dict.fromkeys(queries):
+            try:
+                self.queries[query] = parse_query(query)
+            except QuerySyntaxError as e:
+                # Stored before queries were validated; keep matching it as a plain substring
+                logger.warning(f"Search term '{query}' is not a valid query ({e}), matching it as plain text")
+                self.queries[query] = ('sub', query.strip().lower())
+
+        self.nodes = set()
+        self.patterns = {}
+        for node in self.queries.values():
+            self._collect(node)
+
+        # Plain substring queries are the common case and need no memo
+        self._plain = [(query, node[1]) for query, node in self.queries.items() if node[0] == 'sub']
+        # Compound queries are compiled to numbered steps so the per-item memo is
+        # a list; hashing nested tuples on every lookup cost more than evaluating
+        self._ids = {}
+        self._steps = []
+        # and grouped by their fetch terms: an item containing none of them
+        # cannot match, so most queries are ruled out by one substring check
+        self._compound = {}
+        for query, node in self.queries.items():
+            if node[0] != 'sub':
+                terms = tuple(fetch_terms_for(node) or ())
+                self._compound.setdefault(terms, []).append((query, self._compile(node)))
+
+        self.fetch_terms = list(dict.fromkeys(
+            term for node in self.queries.values() for term in (fetch_terms_for(node) or [])
+        ))
+
+    def _collect(self, node):
+        self.nodes.add(node)
+        kind = node[0]
+        if kind == 'word':
+            self.patterns.setdefault(node[1], _word_pattern(node[1]))
+        elif kind == 'not':
+            self._collect(node[1])
+        elif kind in ('and', 'or'):
+            for child in node[1]:
+                self._collect(child)
+
+    def _compile(self, node):
+        """Step id for a node; AND/OR operands run cheapest first to short-circuit sooner"""
+        step = self._ids.get(node)
+        if step is not None:
+            return step
+        kind = node[0]
+        if kind == 'sub':
+            argument = node[1]
+        elif kind == 'word':
+            argument = self.patterns[node[1]]
+        elif kind == 'not':
+            argument = self._compile(node[1])
+        else:
+            children = sorted(node[1], key=lambda child: _COST[child[0]])
+            argument = tuple(self._compile(child) for child in children)
+        step = self._ids[node] = len(self._steps)
+        self._steps.append((kind, argument))
+        return step
+
+    def _evaluate(self, step, text, memo):
+        result = memo[step]
+        if result is None:
+            kind, argument = self._steps[step]
+            if kind == 'sub':
+                result = argument in text
+            elif kind == 'word':
+                result = argument.search(text) is not None
+            elif kind == 'not':
+                result = not self._evaluate(argument, text, memo)
+            elif kind == 'and':
+                result = all(self._evaluate(child, text, memo) for child in argument)
+            else:
+                result = any(self._evaluate(child, text, memo) for child in argument)
+            memo[step] = result
+        return result
+
+    def match(self, item):
+        """The queries (as stored on listeners) that an auction item satisfies"""
+        text = f"{item.title} {item.description}".lower()
+        matched = [query for query, term in self._plain if term in text]
+        if self._compound:
+            # Phrases allow any whitespace between words; fetch terms have single spaces
+            spaced = ' '.join(text.split())
+            memo = None
+            for terms, group in self._compound.items():
+                if terms and not any(term in spaced for term in terms):
+                    continue
+                if memo is None:
+                    memo = [None] * len(self._steps)
+                matched.extend(query for query, step in group if self._evaluate(step, text, memo))
+        return matched
+
+    def stats(self):
+        return {
+            'queries': len(self.queries),
+            'distinct_expressions': len(self.nodes),
+            'fetch_terms': len(self.fetch_terms)
+        }
@@ -0,0 +1,236 @@
+"""
+Record/replay of Aucor search pages for offline scraper benchmarks
+With SCRAPE_RECORD_DIR set, both scrapers save every search response (raw HTML
+for the HTTP scraper, the rendered DOM for the Chrome scraper) as fixtures.
+ReplayServer serves those fixtures locally with configurable latency; point
+the scrapers at it with AUCOR_BASE_URL
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+RECORD_DIR = os.getenv('SCRAPE_RECORD_DIR')
+
+MANIFEST = 'manifest.json'
+# 'http' is the page as served; 'rendered' is the DOM after JavaScript ran
+VARIANTS = ('rendered', 'http')
+
+_SCRIPT_RE = re.compile(r'<script\b[^>]*>.*?</script>', re.IGNORECASE | re.DOTALL)
+
+def fixture_key(url):
+    """Path and query of a URL; fixtures are looked up by this, not by host"""
+    parts = urlsplit(url)
+    return f"{parts.path or '/'}?{parts.query}" if parts.query else (parts.path or '/')
+
+def strip_scripts(html):
+    """Drop script tags so a rendered snapshot replays without re-running JavaScript"""
+    return _SCRIPT_RE.sub('', html)
+
+def _load_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+class Recorder:
+    """Writes scraped pages and a manifest of what was captured to a fixture directory"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def record(self, variant, url, body, status=200, content_type='text/html; charset=utf-8'):
+        """Save one response; later recordings of the same URL replace earlier ones"""
+        key = fixture_key(url)
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        filename = f"{variant}-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}.html"
+
+        try:
+            with self._lock:
+                with open(os.path.join(self.directory, filename), 'wb') as f:
+                    f.write(body)
+                manifest = _load_manifest(self.directory)
+                manifest.setdefault(key, {})[variant] = {
+                    'file': filename,
+                    'url': url,
+                    'status': status,
+                    'content_type': content_type,
+                    'bytes': len(body),
+                    'recorded_at': datetime.utcnow().isoformat()
+                }
+                with open(os.path.join(self.directory, MANIFEST), 'w') as f:
+                    json.dump(manifest, f, indent=2, sort_keys=True)
+        except OSError as e:
+            logger.warning(f"Could not record fixture for {url}: {e}")
+
+recorder = Recorder(RECORD_DIR) if RECORD_DIR else None
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    """Serves recorded fixtures by path and query"""
+
+    def do_GET(self):
+        server = self.server
+        delay = server.latency + random.uniform(0, server.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        entry = server.lookup(self.path)
+        if entry is None:
+            server.count('missed')
+            self.send_error(404, 'No fixture recorded for this URL')
+            return
+
+        with open(os.path.join(server.directory, entry['file']), 'rb') as f:
+            body = f.read()
+        server.count('served')
+        self.send_response(entry.get('status', 200))
+        self.send_header('Content-Type', entry.get('content_type', 'text/html; charset=utf-8'))
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class ReplayServer(ThreadingHTTPServer):
+    """Local Aucor stand-in; runs on a background thread"""
+
+    daemon_threads = True
+
+    def __init__(self, directory, host='127.0.0.1', port=8808, latency=0.0, jitter=0.0, variant='rendered'):
+        super().__init__((host, port), ReplayHandler)
+        self.directory = directory
+        self.latency = latency
+        self.jitter = jitter
+        self.variant = variant
+        self.manifest = _load_manifest(directory)
+        self.counts = {'served': 0, 'missed': 0}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def lookup(self, path):
+        """Fixture for a request path, preferring the configured variant"""
+        variants = self.manifest.get(path)
+        if not variants:
+            return None
+        for variant in (self.variant,) + VARIANTS:
+            if variant in variants:
+                return variants[variant]
+        return None
+
+    def count(self, outcome):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def stats(self):
+        """Return counts of served and missed requests"""
+        with self._lock:
+            return dict(self.counts)
+
+    def start(self):
+        """Start serving"""
+        self._thread = threading.Thread(target=self.serve_forever, name='replay-http', daemon=True)
+        self._thread.start()
+        logger.info(f"Replaying {len(self.manifest)} recorded URLs from {self.directory} at {self.base_url}")
+
+    def stop(self):
+        """Stop serving"""
+        self.shutdown()
+        self.server_close()
+        logger.info("Replay server stopped")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+def _record(args):
+    # Scrapers look the recorder up on the importable module, not on __main__
+    import replay
+    replay.recorder = Recorder(args.dir)
+    if args.scraper == 'web':
+        from web_scraper import WebScraper
+        scraper = WebScraper()
+    else:
+        from fallback_scraper import FallbackScraper
+        scraper = FallbackScraper()
+
+    from crawl import ScrapeError
+    try:
+        for term in args.terms:
+            try:
+                items = scraper.scrape_term(term)
+            except ScrapeError as e:
+                print(f"{term}: failed ({e})")
+                continue
+            print(f"{term}: {len(items)} items")
+    finally:
+        if hasattr(scraper, 'close'):
+            scraper.close()
+
+def _list(args):
+    for key, variants in sorted(_load_manifest(args.dir).items()):
+        described = ', '.join(f"{variant} {entry['bytes']}B" for variant, entry in sorted(variants.items()))
+        print(f"{key}  [{described}]")
+
+def _serve(args):
+    server = ReplayServer(args.dir, args.host, args.port, args.latency, args.jitter, args.variant)
+    server.start()
+    print(f"Set AUCOR_BASE_URL={server.base_url} to scrape from the fixtures", flush=True)
+    try:
+        while True:
+            time.sleep(5)
+            logger.info(f"Replay stats: {server.stats()}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description='Record Aucor search pages or replay them locally')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    record = sub.add_parser('record', help='Scrape terms from the live site and save the pages')
+    record.add_argument('terms', nargs='+')
+    record.add_argument('--dir', default='fixtures')
+    record.add_argument('--scraper', choices=['web', 'http'], default='http')
+
+    listing = sub.add_parser('list', help='Show recorded URLs')
+    listing.add_argument('--dir', default='fixtures')
+
+    serve = sub.add_parser('serve', help='Serve recorded pages over HTTP')
+    serve.add_argument('--dir', default='fixtures')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8808)
+    serve.add_argument('--latency', type=float, default=0.0, help='Seconds to delay each response')
+    serve.add_argument('--jitter', type=float, default=0.0, help='Extra random delay up to this many seconds')
+    serve.add_argument('--variant', choices=VARIANTS, default='rendered',
+                       help='Which recording to serve when a URL has both')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    {'record': _record, 'list': _list, 'serve': _serve}[args.command](args)
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,19 @@
 from apscheduler.schedulers.background import BackgroundScheduler
-from fallback_scraper import FallbackScraper, match_search_terms
-from models import Listener, Notification
-from email_service import email_service
+from fallback_scraper import FallbackScraper
+from models import Listener, AuctionItem, JobRecord, DetailCache
+from pipeline import CheckPipeline
+from scraper_router import ScraperRouter
+from listener_snapshot import listener_snapshot
+from seen_urls import seen_urls
+from jobs import JobCoordinator
+from polling import PollPlanner, parse_end_time
+from leases import LeaseManager, HEARTBEAT_SECONDS, default_worker_id
+from profiling import cycle_profiler, span
 import logging
 import atexit
+import os
+import time
+from datetime import datetime, timedelta
 
 # Try to import web scraper, fall back to basic scraper if not available
 try:
@@ -20,24 +30,81 @@ except ImportError as e:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Minimum seconds between targeted fetches of the same term
+TERM_COOLDOWN_SECONDS = int(os.getenv('TERM_COOLDOWN_SECONDS', '300'))
+
+# New listeners are matched against lots stored within this many days
+RETROACTIVE_MATCH_DAYS = int(os.getenv('RETROACTIVE_MATCH_DAYS', '14'))
+RETROACTIVE_MATCH_LIMIT = int(os.getenv('RETROACTIVE_MATCH_LIMIT', '100'))
+
+# Poll terms adaptively instead of re-scraping everything every 30 minutes
+ADAPTIVE_POLLING = os.getenv('ADAPTIVE_POLLING', 'true').lower() == 'true'
+POLL_TICK_MINUTES = int(os.getenv('POLL_TICK_MINUTES', '5'))
+
+# Split terms between worker processes through leases in the database
+SHARDING_ENABLED = os.getenv('SHARDING_ENABLED', 'true').lower() == 'true'
+
+# How often to look for checks requested by API processes
+JOB_POLL_SECONDS = int(os.getenv('JOB_POLL_SECONDS', '5'))
+
 class AuctionScheduler:
     def __init__(self):
         self.scheduler = BackgroundScheduler()
-        # Use web scraper if available, otherwise fall back to basic scraper
+        self.pipeline = None
+        self.leases = LeaseManager() if SHARDING_ENABLED else None
+        self.worker_id = self.leases.worker_id if self.leases else default_worker_id()
+        self.jobs = JobCoordinator(self.run_job, worker_id=self.worker_id)
+        # When each term was last fetched, for targeted-scrape rate limiting
+        self.last_scraped = {}
+        self.planner = PollPlanner()
+        # Prefer the web scraper when available; the router fails over to basic HTTP
+        # whenever Chrome is unhealthy and probes it before switching back
+        backends = []
         if WEB_SCRAPER_AVAILABLE:
             logger.info("🚀 Initializing with web scraper (JavaScript enabled)")
-            self.scraper = WebScraper()
+            backends.append(('web', WebScraper()))
         else:
             logger.info("📄 Initializing with fallback scraper (basic HTTP)")
-            self.scraper = FallbackScraper()
+        backends.append(('http', FallbackScraper()))
+        self.scraper = ScraperRouter(backends)
+        
+        if ADAPTIVE_POLLING:
+            # Poll each term on its own schedule, driven by its yield and closing lots
+            self.scheduler.add_job(
+                func=self.poll_due_terms,
+                trigger="interval",
+                minutes=POLL_TICK_MINUTES,
+                id='auction_checker',
+                name='Poll search terms that are due'
+            )
+        else:
+            # Schedule the auction checking job to run every 30 minutes
+            self.scheduler.add_job(
+                func=self.request_check,
+                kwargs={'source': 'scheduled'},
+                trigger="interval",
+                minutes=30,
+                id='auction_checker',
+                name='Check for new auction items'
+            )
         
-        # Schedule the auction checking job to run every 30 minutes
+        if SHARDING_ENABLED:
+            # Keep our shard leases alive and pick up shards from crashed workers
+            self.scheduler.add_job(
+                func=self.heartbeat,
+                trigger="interval",
+                seconds=HEARTBEAT_SECONDS,
+                id='lease_heartbeat',
+                name='Renew shard leases'
+            )
+        
+        # Pick up checks requested through the jobs table by API processes
         self.scheduler.add_job(
-            func=self.check_auctions,
+            func=self.dispatch_requested_jobs,
             trigger="interval",
-            minutes=30,
-            id='auction_checker',
-            name='Check for new auction items'
+            seconds=JOB_POLL_SECONDS,
+            id='job_dispatcher',
+            name='Dispatch requested check jobs'
         )
         
         # Also run a job every hour to clean up old data if needed
@@ -52,7 +119,14 @@ class AuctionScheduler:
     def start(self):
         """Start the scheduler"""
         try:
+            if self.leases:
+                self.heartbeat()
+                atexit.register(self.leases.release)
+            
+            # Stored URLs load once here; cycles then only add other workers' inserts
+            self.sync_seen_urls()
             self.scheduler.start()
+            self.scraper.start()
             logger.info("Auction scheduler started successfully")
             
             # Register shutdown handler
@@ -61,78 +135,220 @@ class AuctionScheduler:
         except Exception as e:
             logger.error(f"Failed to start scheduler: {e}")
     
+    def heartbeat(self):
+        """Renew this worker's shard leases"""
+        try:
+            self.leases.heartbeat()
+        except Exception as e:
+            logger.error(f"Lease heartbeat failed: {e}")
+    
+    def owned_terms(self, terms):
+        """Restrict terms to the shards this worker holds leases on"""
+        if not self.leases:
+            return terms
+        return self.leases.filter_terms(terms)
+    
     def stop(self):
         """Stop the scheduler"""
+        self.scraper.stop()
         if self.scheduler.running:
             self.scheduler.shutdown()
             logger.info("Auction scheduler stopped")
     
-    def check_auctions(self):
+    def request_check(self, source='manual'):
+        """Request a check through the job coordinator, merging with any run in progress"""
+        job, merged = self.jobs.submit('full', source=source)
+        if merged:
+            logger.info(f"Check request ({source}) merged into job {job.id}")
+        return job, merged
+    
+    def request_term_check(self, listener):
+        """Queue a high-priority scrape of a single listener's term, backfilling only that listener"""
+        job, merged = self.jobs.submit('term', source='listener', term=listener.search_term,
+                                       listener_ids=[listener.id])
+        if merged:
+            logger.info(f"Targeted check for '{listener.search_term}' merged into job {job.id}")
+        return job, merged
+    
+    def dispatch_requested_jobs(self):
+        """Hand check requests recorded in the database to the local job coordinator"""
+        try:
+            for record in JobRecord.claim_requested(self.worker_id):
+                self.jobs.submit(
+                    record['kind'],
+                    source=record['source'],
+                    term=record['term'],
+                    listener_ids=record['listener_ids'],
+                    terms=record['terms'],
+                    job_id=record['id'],
+                    requests=record['requests']
+                )
+        except Exception as e:
+            logger.error(f"Error dispatching requested jobs: {e}")
+    
+    def poll_due_terms(self):
+        """Queue a scrape of the terms whose adaptive poll interval has elapsed"""
+        if self.jobs.busy():
+            # Whatever is running will refresh the poll history; decide on the next tick
+            logger.info("Check already in progress, skipping poll tick")
+            return None
+        
+        # Poll the base terms the listener queries need, not the queries themselves
+        all_terms = listener_snapshot.get().plan.fetch_terms
+        terms = self.owned_terms(all_terms)
+        due = self.planner.due_terms(terms, share=len(terms) / len(all_terms) if all_terms else 1.0)
+        
+        if not due:
+            logger.info("No search terms due for polling")
+            return None
+        
+        logger.info(f"Polling {len(due)} of {len(set(t.lower() for t in terms))} search terms: {due}")
+        job, _ = self.jobs.submit('poll', source='scheduled', terms=due)
+        return job
+    
+    def run_job(self, job):
+        """Run a coordinated job, capturing a profile if armed or slow"""
+        with cycle_profiler.cycle(job) as capture:
+            try:
+                if job.kind == 'term':
+                    return self.check_term(job)
+                return self.check_auctions(job)
+            finally:
+                capture.pipeline = job.pipeline
+    
+    def check_term(self, job):
+        """Scrape one query's terms and notify only the listeners that asked for it"""
+        with span('load_listeners'):
+            listeners = Listener.get_by_ids(job.listener_ids)
+        self.sync_seen_urls()
+        
+        if not listeners:
+            logger.info(f"No active listeners left for targeted check of '{job.term}'")
+            return None
+        
+        self.pipeline = CheckPipeline(self.scraper, listeners, include_known=True)
+        job.pipeline = self.pipeline
+        
+        # The base terms this query needs fetched, e.g. 'logitech' for "logitech AND mouse NOT wireless"
+        terms = self.pipeline.search_terms
+        
+        # Lots already stored from earlier scrapes match retroactively through the full-text index
+        with span('load_stored_items'):
+            stored_items = self.stored_matches(terms)
+        
+        now = time.monotonic()
+        last = [self.last_scraped.get(term.lower()) for term in terms]
+        if all(scraped is not None and now - scraped < TERM_COOLDOWN_SECONDS for scraped in last):
+            # Fetched moments ago - match what is already stored instead of hitting the site again
+            logger.info(f"'{job.term}' was scraped {now - min(last):.0f}s ago, backfilling from stored items")
+            with span('pipeline'):
+                stats = self.pipeline.run(terms=[], stored_items=stored_items)
+        else:
+            for term in terms:
+                self.last_scraped[term.lower()] = now
+            with span('pipeline'):
+                stats = self.pipeline.run(terms=terms, stored_items=stored_items)
+            with span('record_polls'):
+                self._record_polls(self.pipeline)
+        
+        logger.info(f"Targeted check for '{job.term}' completed in {stats['elapsed_s']}s. "
+                    f"{stats['notifications_sent']} notifications sent.")
+        return stats
+    
+    def sync_seen_urls(self):
+        """Load the seen-URL filter, or add items other workers stored since the last cycle"""
+        with span('sync_seen_urls'):
+            try:
+                first = not seen_urls.loaded
+                added = AuctionItem.load_seen_urls()
+                if first:
+                    status = seen_urls.status()
+                    logger.info(f"Seen-URL filter loaded with {added} URLs "
+                                f"({status['memory_bytes'] / 1024 / 1024:.1f} MB, "
+                                f"{status['false_positive_rate']:.2%} false positives)")
+            except Exception as e:
+                logger.error(f"Could not sync the seen-URL filter: {e}")
+    
+    def stored_matches(self, terms):
+        """Recently stored lots containing any of the terms that have not closed yet"""
+        since = (datetime.utcnow() - timedelta(days=RETROACTIVE_MATCH_DAYS)).strftime('%Y-%m-%d %H:%M:%S')
+        now = time.time()
+        items = {}
+        for term in terms:
+            for item in AuctionItem.search(term, limit=RETROACTIVE_MATCH_LIMIT, since=since):
+                end_at = parse_end_time(item.end_time)
+                if end_at is None or end_at > now:
+                    items.setdefault(item.url, item)
+        return list(items.values())
+    
+    def check_auctions(self, job=None):
         """Main job function - check for new auctions and send notifications"""
         logger.info("Starting auction check...")
         
-        try:
-            # Get new auction items
-            new_items = self.scraper.get_new_items()
-            
-            if not new_items:
-                logger.info("No new auction items found")
-                return
-            
-            # Get all active listeners
-            listeners = Listener.get_all()
-            
-            if not listeners:
-                logger.info("No active listeners found")
-                return
-            
-            # Check each new item against each listener's search terms
-            notifications_sent = 0
-            
-            for item in new_items:
-                # Get all unique search terms from listeners
-                search_terms = [listener.search_term for listener in listeners]
-                
-                # Check if this item matches any search terms
-                matching_terms = match_search_terms(item, search_terms)
-                
-                if matching_terms:
-                    logger.info(f"Item '{item.title}' matches terms: {matching_terms}")
-                    
-                    # Send notifications to relevant listeners
-                    for listener in listeners:
-                        if listener.search_term in matching_terms:
-                            # Check if we've already sent a notification for this combination
-                            if not Notification.already_sent(listener.id, item.id):
-                                # Send email notification
-                                if email_service.send_notification(
-                                    listener.email, 
-                                    item, 
-                                    listener.search_term
-                                ):
-                                    # Record the notification
-                                    Notification.save(listener.id, item.id)
-                                    notifications_sent += 1
-                                    logger.info(f"Notification sent to {listener.email} for '{item.title}'")
-                                else:
-                                    logger.error(f"Failed to send notification to {listener.email}")
-            
-            logger.info(f"Auction check completed. {notifications_sent} notifications sent.")
-            
-        except Exception as e:
-            logger.error(f"Error during auction check: {e}")
+        # Active listeners from the shared snapshot; reloaded only if they changed
+        with span('load_listeners'):
+            listeners = listener_snapshot.get()
+        
+        if not listeners:
+            logger.info("No active listeners found")
+            return None
+        self.sync_seen_urls()
+        
+        # Scrape, persist, match and notify as overlapping stages
+        self.pipeline = CheckPipeline(self.scraper, listeners)
+        if job is not None:
+            job.pipeline = self.pipeline
+        if job is not None and job.terms:
+            terms = job.terms
+        elif job is not None and job.source == 'scheduled':
+            terms = self.owned_terms(self.pipeline.search_terms)
+        else:
+            # A manual check covers every term, whichever worker owns it
+            terms = self.pipeline.search_terms
+        now = time.monotonic()
+        for term in terms:
+            self.last_scraped[term.lower()] = now
+        with span('pipeline'):
+            stats = self.pipeline.run(terms=terms)
+        with span('record_polls'):
+            self._record_polls(self.pipeline)
+        
+        logger.info(f"Auction check completed in {stats['elapsed_s']}s. "
+                    f"{stats['new_items']} new items, {stats['changed_items']} changed, "
+                    f"{stats['notifications_sent']} notifications sent.")
+        return stats
+    
+    def _record_polls(self, pipeline):
+        """Feed per-term yields from a finished pipeline into the poll planner"""
+        for term in pipeline.terms:
+            self.planner.record_poll(
+                term,
+                pipeline.term_new_items.get(term, 0),
+                pipeline.term_soonest_end.get(term)
+            )
+    
+    def scraper_status(self):
+        """Active scraper backend and circuit breaker states"""
+        return self.scraper.status()
+    
+    def pipeline_stats(self):
+        """Per-stage statistics for the current or most recent check"""
+        if not self.pipeline:
+            return None
+        return self.pipeline.stats()
     
     def cleanup_old_data(self):
         """Clean up old auction data (optional maintenance job)"""
         logger.info("Running cleanup job...")
         # This could be expanded to remove old auction items, notifications, etc.
-        # For now, we'll just log that it ran
-        logger.info("Cleanup job completed")
+        removed = DetailCache.prune()
+        self.scraper.maintain()
+        logger.info(f"Cleanup job completed ({removed} expired lot details removed)")
     
     def run_immediate_check(self):
-        """Run an immediate auction check (useful for testing)"""
+        """Queue an immediate auction check (useful for testing)"""
         logger.info("Running immediate auction check...")
-        self.check_auctions()
+        return self.request_check(source='manual')
 
 # Create global scheduler instance
 auction_scheduler = AuctionScheduler()
@@ -145,6 +361,10 @@ def stop_scheduler():
     """Stop the auction scheduler"""
     auction_scheduler.stop()
 
+def run_term_check(listener):
+    """Run a targeted check for a newly added listener, returning (job, merged)"""
+    return auction_scheduler.request_term_check(listener)
+
 def run_manual_check():
-    """Run a manual check"""
-    auction_scheduler.run_immediate_check()
+    """Run a manual check, returning (job, merged)"""
+    return auction_scheduler.run_immediate_check()
@@ -0,0 +1,185 @@
+"""
+Scraper failover with per-backend circuit breakers
+Backends are tried in order of preference (Chrome rendering, then plain HTTP).
+A backend that fails repeatedly is taken out of rotation for an exponentially
+growing backoff; a background thread then probes it and only puts it back once
+the probe passes, so a dead Chrome never costs a cycle its results
+"""
+import logging
+import os
+import threading
+import time
+
+from crawl import ScrapeError
+from metrics import SCRAPER_ACTIVE, SCRAPER_BREAKER_STATE, SCRAPER_FAILOVERS
+
+logger = logging.getLogger(__name__)
+
+FAILURE_THRESHOLD = int(os.getenv('SCRAPER_FAILURE_THRESHOLD', '3'))
+BACKOFF_SECONDS = float(os.getenv('SCRAPER_BACKOFF_SECONDS', '60'))
+MAX_BACKOFF_SECONDS = float(os.getenv('SCRAPER_MAX_BACKOFF_SECONDS', '1800'))
+PROBE_INTERVAL_SECONDS = float(os.getenv('SCRAPER_PROBE_INTERVAL_SECONDS', '15'))
+
+CLOSED = 'closed'
+OPEN = 'open'
+PROBING = 'probing'
+# Gauge values for SCRAPER_BREAKER_STATE
+STATE_VALUES = {CLOSED: 0, OPEN: 1, PROBING: 2}
+
+class CircuitBreaker:
+    """Consecutive-failure breaker whose open period doubles each time it trips"""
+
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD, backoff=BACKOFF_SECONDS,
+                 max_backoff=MAX_BACKOFF_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.retry_at = None
+        self.last_error = None
+        self._lock = threading.Lock()
+        SCRAPER_BREAKER_STATE.set(STATE_VALUES[CLOSED], backend=name)
+
+    def _set_state(self, state):
+        self.state = state
+        SCRAPER_BREAKER_STATE.set(STATE_VALUES[state], backend=self.name)
+
+    def allow(self):
+        """True if requests may go to this backend"""
+        return self.state == CLOSED
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.trips = 0
+            self.retry_at = None
+            self._set_state(CLOSED)
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error) if error else None
+            if self.state == CLOSED and self.failures < self.failure_threshold:
+                return
+            # Threshold reached, or a probe failed: back off for longer
+            self.trips += 1
+            delay = min(self.backoff * 2 ** (self.trips - 1), self.max_backoff)
+            self.retry_at = time.time() + delay
+            self._set_state(OPEN)
+        logger.warning(f"Scraper backend '{self.name}' circuit open for {delay:.0f}s: {self.last_error}")
+
+    def begin_probe(self):
+        """Claim an open breaker whose backoff has elapsed; True if the caller should probe"""
+        with self._lock:
+            if self.state != OPEN or time.time() < self.retry_at:
+                return False
+            self._set_state(PROBING)
+            return True
+
+    def status(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'trips': self.trips,
+                'retry_in_s': round(max(0.0, self.retry_at - time.time()), 1) if self.retry_at else None,
+                'last_error': self.last_error
+            }
+
+class ScraperRouter:
+    """Sends each term to the most preferred healthy backend, failing over down the list"""
+
+    def __init__(self, backends, probe_interval=PROBE_INTERVAL_SECONDS):
+        # [(name, scraper)] in order of preference
+        self.backends = list(backends)
+        self.breakers = {name: CircuitBreaker(name) for name, _ in self.backends}
+        self.probe_interval = probe_interval
+        self.active = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def scrape_term(self, search_term):
+        """Scrape a term with the first backend whose breaker is closed"""
+        for name, scraper in self.backends:
+            breaker = self.breakers[name]
+            if not breaker.allow():
+                continue
+            try:
+                items = scraper.scrape_term(search_term)
+            except ScrapeError as e:
+                breaker.record_failure(e)
+                SCRAPER_FAILOVERS.inc(backend=name)
+                logger.warning(f"Scraper backend '{name}' failed for '{search_term}', trying the next one: {e}")
+                continue
+            breaker.record_success()
+            self._set_active(name)
+            return items
+
+        raise ScrapeError(f"No healthy scraper backend for '{search_term}'")
+
+    def _set_active(self, name):
+        if name == self.active:
+            return
+        if self.active is not None:
+            logger.info(f"Scraping switched from '{self.active}' to '{name}'")
+        self.active = name
+        for backend, _ in self.backends:
+            SCRAPER_ACTIVE.set(1 if backend == name else 0, backend=backend)
+
+    def probe_due(self):
+        """Probe every open backend whose backoff has elapsed"""
+        for name, scraper in self.backends:
+            breaker = self.breakers[name]
+            if not breaker.begin_probe():
+                continue
+            try:
+                healthy = scraper.probe()
+            except Exception as e:
+                logger.warning(f"Probe of scraper backend '{name}' raised: {e}")
+                healthy = False
+            if healthy:
+                logger.info(f"✅ Scraper backend '{name}' passed its probe, back in rotation")
+                breaker.record_success()
+            else:
+                breaker.record_failure(breaker.last_error or 'probe failed')
+
+    def _probe_loop(self):
+        while not self._stop.wait(self.probe_interval):
+            try:
+                self.probe_due()
+            except Exception as e:
+                logger.error(f"Scraper probe loop failed: {e}")
+
+    def start(self):
+        """Start probing tripped backends in the background"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._probe_loop, name='scraper-probe', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def close(self):
+        self.stop()
+        for _, scraper in self.backends:
+            if hasattr(scraper, 'close'):
+                scraper.close()
+
+    def maintain(self):
+        """Periodic upkeep of backends that keep local state, such as a browser profile"""
+        for _, scraper in self.backends:
+            if hasattr(scraper, 'maintain'):
+                scraper.maintain()
+
+    def status(self):
+        """Active backend and breaker state per backend, in order of preference"""
+        backends = []
+        for name, scraper in self.backends:
+            backend = dict(name=name, **self.breakers[name].status())
+            if hasattr(scraper, 'cache_stats'):
+                backend['cache'] = scraper.cache_stats()
+            backends.append(backend)
+        return {'active': self.active, 'backends': backends}
@@ -0,0 +1,110 @@
+"""
+Bloom filter of stored auction item URLs
+Loaded from auction_items when scraping starts and updated as items are saved,
+it answers "definitely not stored" without touching SQLite, so only URLs that
+may be known are looked up. Its size is fixed by SEEN_URL_CAPACITY and
+SEEN_URL_ERROR_RATE (about 1.2 bytes per URL at 1%); past capacity the false
+positive rate rises, costing extra lookups but never a missed item
+"""
+import hashlib
+import math
+import os
+import threading
+
+from metrics import SEEN_URL_CHECKS, SEEN_URL_FILTER_BYTES, SEEN_URL_FILTER_ENTRIES
+
+CAPACITY = int(os.getenv('SEEN_URL_CAPACITY', '5000000'))
+ERROR_RATE = float(os.getenv('SEEN_URL_ERROR_RATE', '0.01'))
+
+class SeenUrlFilter:
+    """Thread-safe Bloom filter over URLs using double hashing of one blake2b digest"""
+
+    def __init__(self, capacity=CAPACITY, error_rate=ERROR_RATE):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bits = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self.entries = 0
+        # Until the initial load finishes every URL counts as possibly stored
+        self.loaded = False
+        # Highest auction_items id loaded, for catching up on other processes' inserts
+        self.last_id = 0
+        self._array = bytearray((self.bits + 7) // 8)
+        self._lock = threading.Lock()
+        SEEN_URL_FILTER_BYTES.set(len(self._array))
+
+    def _positions(self, url):
+        digest = hashlib.blake2b(url.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        step = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * step) % self.bits for i in range(self.hashes)]
+
+    def _set(self, positions):
+        added = False
+        for position in positions:
+            mask = 1 << (position & 7)
+            if not self._array[position >> 3] & mask:
+                self._array[position >> 3] |= mask
+                added = True
+        if added:
+            self.entries += 1
+
+    def add(self, url):
+        positions = self._positions(url)
+        with self._lock:
+            self._set(positions)
+        SEEN_URL_FILTER_ENTRIES.set(self.entries)
+
+    def add_many(self, urls, last_id=None):
+        """Add a batch of stored URLs, optionally advancing the loaded id"""
+        positions = [self._positions(url) for url in urls]
+        with self._lock:
+            for url_positions in positions:
+                self._set(url_positions)
+            if last_id is not None:
+                self.last_id = max(self.last_id, last_id)
+        SEEN_URL_FILTER_ENTRIES.set(self.entries)
+
+    def possibly_stored(self, urls):
+        """The URLs among urls that may have been stored; the rest are definitely new"""
+        urls = list(urls)
+        if not self.loaded:
+            return urls
+
+        array, bits, hashes = self._array, self.bits, self.hashes
+        maybe = []
+        for url in urls:
+            digest = hashlib.blake2b(url.encode('utf-8'), digest_size=16).digest()
+            first = int.from_bytes(digest[:8], 'little')
+            step = int.from_bytes(digest[8:], 'little') | 1
+            for i in range(hashes):
+                position = (first + i * step) % bits
+                if not array[position >> 3] & (1 << (position & 7)):
+                    break
+            else:
+                maybe.append(url)
+
+        SEEN_URL_CHECKS.inc(len(maybe), result='maybe')
+        SEEN_URL_CHECKS.inc(len(urls) - len(maybe), result='new')
+        return maybe
+
+    def might_contain(self, url):
+        """False only if the URL has definitely never been stored"""
+        return bool(self.possibly_stored([url]))
+
+    def false_positive_rate(self):
+        """Expected false positive rate at the current number of entries"""
+        return (1 - math.exp(-self.hashes * self.entries / self.bits)) ** self.hashes
+
+    def status(self):
+        return {
+            'loaded': self.loaded,
+            'entries': self.entries,
+            'capacity': self.capacity,
+            'memory_bytes': len(self._array),
+            'hash_functions': self.hashes,
+            'false_positive_rate': round(self.false_positive_rate(), 5),
+            'saturated': self.entries > self.capacity
+        }
+
+seen_urls = SeenUrlFilter()
@@ -0,0 +1,107 @@
+"""
+Local SMTP stand-in for exercising EmailService without sending real mail
+Accepts any login, can inject per-message latency and transient failures
+"""
+import argparse
+import asyncio
+import logging
+import random
+import threading
+import time
+
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+
+logger = logging.getLogger(__name__)
+
+class AcceptAllAuthenticator:
+    """Authenticator that accepts every username/password pair"""
+
+    def __call__(self, server, session, envelope, mechanism, auth_data):
+        return AuthResult(success=True)
+
+class SinkHandler:
+    """aiosmtpd handler that discards messages after optional delay/failure injection"""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.accepted = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    async def handle_DATA(self, server, session, envelope):
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if self.error_rate and random.random() < self.error_rate:
+            with self._lock:
+                self.rejected += 1
+            return '451 4.3.0 Injected transient failure'
+
+        with self._lock:
+            self.accepted += 1
+        return '250 Message accepted for delivery'
+
+    def stats(self):
+        """Return counts of accepted and rejected messages"""
+        with self._lock:
+            return {'accepted': self.accepted, 'rejected': self.rejected}
+
+class SMTPSink:
+    """Runs a SinkHandler on a background thread"""
+
+    def __init__(self, host='127.0.0.1', port=8025, latency=0.0, jitter=0.0, error_rate=0.0):
+        self.host = host
+        self.port = port
+        self.handler = SinkHandler(latency=latency, jitter=jitter, error_rate=error_rate)
+        self.controller = Controller(
+            self.handler,
+            hostname=host,
+            port=port,
+            authenticator=AcceptAllAuthenticator(),
+            auth_require_tls=False
+        )
+
+    def start(self):
+        """Start accepting connections"""
+        self.controller.start()
+        logger.info(f"SMTP sink listening on {self.host}:{self.port}")
+
+    def stop(self):
+        """Stop the sink"""
+        self.controller.stop()
+        logger.info("SMTP sink stopped")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local SMTP sink')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds to delay each message')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Extra random delay up to this many seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of messages to reject with 451')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    sink = SMTPSink(args.host, args.port, args.latency, args.jitter, args.error_rate)
+    sink.start()
+    try:
+        while True:
+            time.sleep(5)
+            logger.info(f"SMTP sink stats: {sink.handler.stats()}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sink.stop()
+
+if __name__ == '__main__':
+    main()
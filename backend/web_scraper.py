@@ -3,6 +3,8 @@ Enhanced web scraper with JavaScript rendering capabilities
 Only searches for exact listener terms, no variations
 """
 import logging
+import os
+import threading
 import time
 import chromedriver_autoinstaller
 from selenium import webdriver
@@ -13,16 +15,48 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
 from bs4 import BeautifulSoup
 from models import AuctionItem
+from metrics import PAGE_LOAD_SECONDS, PARSE_SECONDS, ITEMS_EXTRACTED, SCRAPE_ERRORS, BROWSER_CACHE_REQUESTS
+from browser_profile import BrowserProfile, PREWARM
+from crawl import search_url, crawl_term, ScrapeError
+import replay
 
 logger = logging.getLogger(__name__)
 
+# Point at a replay server to scrape recorded fixtures instead of the live site
+BASE_URL = os.getenv('AUCOR_BASE_URL', 'https://live.aucor.com').rstrip('/')
+# Multiplier on the waits for dynamic content; 0 when replaying
+SCRAPE_DELAY_SCALE = float(os.getenv('SCRAPE_DELAY_SCALE', '1'))
+# Longest wait for a page's requests to settle after load, and how long the
+# request count must stay unchanged to count as settled
+RENDER_MAX_SECONDS = 5
+RENDER_SETTLE_SECONDS = 0.5
+
+# [cache hits, misses] among the page's own and asset requests; a zero transfer
+# size with a body means the response came from the HTTP cache. Cross-origin
+# assets without Timing-Allow-Origin report no sizes and are left out
+_CACHE_USAGE_SCRIPT = """
+return performance.getEntriesByType('navigation').concat(performance.getEntriesByType('resource'))
+    .reduce(function (counts, entry) {
+        if (entry.decodedBodySize > 0) counts[entry.transferSize === 0 ? 0 : 1] += 1;
+        return counts;
+    }, [0, 0]);
+"""
+
 class WebScraper:
     """JavaScript-enabled web scraper"""
     
-    def __init__(self):
-        self.base_url = "https://live.aucor.com"
+    def __init__(self, launch=True):
+        self.base_url = BASE_URL
         self.driver = None
-        self.setup_driver()
+        # Persistent user data and disk cache, shared by every launch of this worker's Chrome
+        self.profile = BrowserProfile()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # One Chrome instance is shared by every caller; serialize access to it
+        self.driver_lock = threading.RLock()
+        # launch=False gives a parser-only instance, e.g. for extraction benchmarks
+        if launch:
+            self.setup_driver()
     
     def setup_driver(self):
         """Setup Chrome driver with automatic driver management"""
@@ -41,10 +75,21 @@ class WebScraper:
             chrome_options.add_experimental_option('useAutomationExtension', False)
             chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
             
-            self.driver = webdriver.Chrome(options=chrome_options)
+            try:
+                profile_options = self._with_profile(chrome_options)
+                self.driver = webdriver.Chrome(options=profile_options)
+            except WebDriverException as e:
+                if not self.profile.enabled:
+                    raise
+                # Usually the profile is locked by a Chrome that did not exit cleanly
+                logger.warning(f"⚠️ Chrome could not start with profile {self.profile.path}, "
+                               f"using a throwaway one: {e}")
+                self.driver = webdriver.Chrome(options=chrome_options)
             self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
             
             logger.info("✅ Chrome driver initialized successfully")
+            if PREWARM:
+                self._prewarm()
             return True
             
         except Exception as e:
@@ -52,6 +97,85 @@ class WebScraper:
             self.driver = None
             return False
     
+    def _with_profile(self, chrome_options):
+        """A copy of chrome_options using the persistent profile, if enabled"""
+        profile_options = Options()
+        for argument in chrome_options.arguments + self.profile.chrome_arguments():
+            profile_options.add_argument(argument)
+        for name, value in chrome_options.experimental_options.items():
+            profile_options.add_experimental_option(name, value)
+        return profile_options
+    
+    def _prewarm(self):
+        """Load the site shell once so its scripts and styles are cached before the first term"""
+        try:
+            started = time.perf_counter()
+            self.driver.get(f"{self.base_url}/")
+            self._wait_for_render()
+            self._record_cache_usage()
+            logger.info(f"🔥 Pre-warmed Chrome cache in {time.perf_counter() - started:.1f}s")
+        except WebDriverException as e:
+            logger.warning(f"⚠️ Chrome pre-warm failed: {e}")
+    
+    def _wait_for_render(self):
+        """
+        Wait for the document to load and its requests to settle, rather than a
+        fixed delay, so cached pages are read as soon as their data has arrived
+        """
+        try:
+            WebDriverWait(self.driver, 10).until(
+                lambda driver: driver.execute_script("return document.readyState") == "complete"
+            )
+            logger.info("✅ Page loaded completely")
+        except TimeoutException:
+            logger.warning("⚠️ Page load timeout, proceeding anyway")
+        
+        # Dynamic content arrives through requests made after load
+        deadline = time.monotonic() + RENDER_MAX_SECONDS * SCRAPE_DELAY_SCALE
+        settle = RENDER_SETTLE_SECONDS * SCRAPE_DELAY_SCALE
+        requests_seen = -1
+        stable_since = time.monotonic()
+        while time.monotonic() < deadline:
+            count = self.driver.execute_script("return performance.getEntriesByType('resource').length")
+            if count != requests_seen:
+                requests_seen = count
+                stable_since = time.monotonic()
+            elif time.monotonic() - stable_since >= settle:
+                break
+            time.sleep(0.1)
+    
+    def _record_cache_usage(self):
+        """Count the current page's requests served from Chrome's HTTP cache"""
+        try:
+            hits, misses = self.driver.execute_script(_CACHE_USAGE_SCRIPT)
+        except WebDriverException:
+            return
+        self.cache_hits += hits
+        self.cache_misses += misses
+        BROWSER_CACHE_REQUESTS.inc(hits, result='hit')
+        BROWSER_CACHE_REQUESTS.inc(misses, result='miss')
+    
+    def cache_stats(self):
+        """Browser HTTP cache hit ratio since start, and the profile's size on disk"""
+        requests = self.cache_hits + self.cache_misses
+        return dict(
+            self.profile.status(),
+            hits=self.cache_hits,
+            misses=self.cache_misses,
+            hit_ratio=round(self.cache_hits / requests, 3) if requests else None
+        )
+    
+    def maintain(self):
+        """Prune the profile if it outgrew its limit; Chrome is restarted around the prune"""
+        with self.driver_lock:
+            if not self.profile.needs_pruning():
+                return
+            running = self.driver is not None
+            self.close()
+            self.profile.prune()
+            if running:
+                self.setup_driver()
+    
     def scrape_auction_listings(self, search_terms=None):
         """
         Scrape auction listings using exact search terms only (no variations)
@@ -69,7 +193,12 @@ class WebScraper:
         # Use exact search terms only, no variations
         for search_term in search_terms:
             logger.info(f"🔍 Searching Aucor for EXACT term: '{search_term}'")
-            items = self._scrape_for_term(search_term.strip())
+            try:
+                with self.driver_lock:
+                    items = self._scrape_for_term(search_term.strip())
+            except ScrapeError as e:
+                logger.error(f"❌ {e}")
+                continue
             all_items.extend(items)
         
         # Remove duplicates based on URL
@@ -84,50 +213,75 @@ class WebScraper:
         logger.info(f"🎯 Found {len(unique_items)} unique auction items")
         return unique_items
     
+    def scrape_term(self, search_term):
+        """Scrape listings for a single exact search term; raises ScrapeError if Chrome is unusable"""
+        if not self.driver:
+            raise ScrapeError("Chrome driver not available")
+        
+        logger.info(f"🔍 Searching Aucor for EXACT term: '{search_term}'")
+        with self.driver_lock:
+            return self._scrape_for_term(search_term.strip())
+    
+    def probe(self):
+        """Health check for the scraper router: (re)start Chrome if needed and load the home page"""
+        with self.driver_lock:
+            if not self.driver and not self.setup_driver():
+                return False
+            try:
+                self.driver.get(f"{self.base_url}/")
+                return self.driver.execute_script("return document.readyState") in ('interactive', 'complete')
+            except WebDriverException as e:
+                logger.warning(f"⚠️ Chrome probe failed, restarting the driver next time: {e}")
+                self.close()
+                return False
+    
     def _scrape_for_term(self, search_term):
-        """Scrape for a specific exact search term"""
-        search_url = f"{self.base_url}/lots?search={search_term.replace(' ', '+')}&lots_range=upcoming"
+        """Scrape for a specific exact search term, following result pages"""
+        return crawl_term(search_term, lambda page: self._scrape_page(search_term, page), scraper='web')
+    
+    def _scrape_page(self, search_term, page):
+        """Items on one result page, [] for a page without lots, or None if loading failed"""
+        page_url = search_url(self.base_url, search_term, page)
         
         try:
-            logger.info(f"📡 Loading: {search_url}")
-            self.driver.get(search_url)
+            logger.info(f"📡 Loading: {page_url}")
+            load_started = time.perf_counter()
+            self.driver.get(page_url)
             
-            # Wait for page to load
-            time.sleep(3)
-            
-            # Wait for content to appear
-            try:
-                WebDriverWait(self.driver, 10).until(
-                    lambda driver: driver.execute_script("return document.readyState") == "complete"
-                )
-                logger.info("✅ Page loaded completely")
-            except TimeoutException:
-                logger.warning("⚠️ Page load timeout, proceeding anyway")
-            
-            # Additional wait for dynamic content
-            time.sleep(2)
+            # Wait for the page and the requests that fill in its lots
+            self._wait_for_render()
             
             # Get page source after JavaScript execution
             html = self.driver.page_source
-            soup = BeautifulSoup(html, 'html.parser')
+            PAGE_LOAD_SECONDS.observe(time.perf_counter() - load_started, scraper='web')
+            self._record_cache_usage()
             
-            # Check if we have real content or template data
-            if self._is_template_page(soup):
-                logger.warning(f"⚠️ Page appears to contain template data for term: {search_term}")
-                return []
+            if replay.recorder is not None:
+                replay.recorder.record('rendered', page_url, replay.strip_scripts(html))
             
-            # Extract auction items
-            items = self._extract_auction_items(soup, search_url)
+            with PARSE_SECONDS.time(scraper='web'):
+                soup = BeautifulSoup(html, 'html.parser')
+                
+                # Check if we have real content or template data
+                if self._is_template_page(soup):
+                    logger.warning(f"⚠️ Page {page} appears to contain template data for term: {search_term}")
+                    return []
+                
+                # Extract auction items
+                items = self._extract_auction_items(soup, page_url)
             
-            logger.info(f"📦 Found {len(items)} items for term: {search_term}")
+            ITEMS_EXTRACTED.inc(len(items), scraper='web')
+            logger.info(f"📦 Found {len(items)} items on page {page} for term: {search_term}")
             return items
             
         except WebDriverException as e:
-            logger.error(f"❌ WebDriver error for term '{search_term}': {e}")
-            return []
+            SCRAPE_ERRORS.inc(scraper='web')
+            logger.error(f"❌ WebDriver error for term '{search_term}' (page {page}): {e}")
+            return None
         except Exception as e:
-            logger.error(f"❌ Unexpected error for term '{search_term}': {e}")
-            return []
+            SCRAPE_ERRORS.inc(scraper='web')
+            logger.error(f"❌ Unexpected error for term '{search_term}' (page {page}): {e}")
+            return None
     
     def _is_template_page(self, soup):
         """Check if the page contains only template/placeholder data"""
@@ -186,7 +340,7 @@ class WebScraper:
             auction_elements = [elem for elem in auction_elements if self._looks_like_auction_link(elem)]
         
         # Extract data from found elements
-        for elem in auction_elements[:20]:  # Limit to 20 items per search
+        for elem in auction_elements:
             item = self._extract_item_data(elem, source_url)
             if item:
                 items.append(item)
@@ -324,13 +478,13 @@ class WebScraper:
     
     def get_new_items(self):
         """Get new auction items that haven't been processed yet"""
-        from models import Listener
+        from listener_snapshot import listener_snapshot
         
         try:
-            listeners = Listener.get_all()
+            listeners = listener_snapshot.get()
             if listeners:
-                # Use exact search terms from listeners (no variations)
-                search_terms = [listener.search_term for listener in listeners]
+                # Base terms of the listeners' queries; operators are not sent to the site
+                search_terms = listeners.plan.fetch_terms
                 logger.info(f"🎯 Using EXACT search terms from {len(listeners)} listeners: {search_terms}")
                 
                 all_items = self.scrape_auction_listings(search_terms)
@@ -358,10 +512,12 @@ class WebScraper:
         """Clean up the driver"""
         if self.driver:
             try:
-                self.driver.quit()
+                with self.driver_lock:
+                    self.driver.quit()
                 logger.info("🔒 Chrome driver closed")
             except:
                 pass
+            self.driver = None
     
     def __del__(self):
         """Ensure driver is closed when object is destroyed"""
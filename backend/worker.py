@@ -0,0 +1,39 @@
+"""
+Dedicated scheduler/worker process
+Runs polling, scraping and notifications on its own so the API can be served by
+a multi-worker WSGI server with SCHEDULER_MODE=external
+"""
+import logging
+import os
+import signal
+import sys
+import time
+
+import metrics
+from scheduler import auction_scheduler
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def main():
+    # Exit through atexit handlers so shard leases are released
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    metrics_port = os.getenv('WORKER_METRICS_PORT')
+    if metrics_port:
+        metrics.serve(int(metrics_port))
+        logger.info(f"Worker metrics available on port {metrics_port}")
+    
+    auction_scheduler.start()
+    logger.info(f"Scheduler worker {auction_scheduler.worker_id} running")
+
+    try:
+        while True:
+            time.sleep(60)
+    except (KeyboardInterrupt, SystemExit):
+        logger.info("Scheduler worker shutting down")
+    finally:
+        auction_scheduler.stop()
+
+if __name__ == '__main__':
+    main()
@@ -5,12 +5,18 @@ createApp({
         return {
             newListener: {
                 email: '',
-                searchTerm: ''
+                searchTerm: '',
+                minPrice: '',
+                maxPrice: ''
             },
             searchEmail: '',
             testEmailAddress: '',
             listeners: [],
             stats: null,
+            checkJob: null,
+            watchedJobId: null,
+            liveMatches: [],
+            events: null,
             loading: false,
             notification: null,
             apiBaseUrl: 'http://localhost:5000/api'
@@ -19,6 +25,13 @@ createApp({
     
     mounted() {
         this.loadStats();
+        this.connectEvents();
+    },
+    
+    computed: {
+        checkRunning() {
+            return !!this.checkJob && ['queued', 'running'].includes(this.checkJob.status);
+        }
     },
     
     methods: {
@@ -33,13 +46,15 @@ createApp({
             try {
                 const response = await axios.post(`${this.apiBaseUrl}/listeners`, {
                     email: this.newListener.email,
-                    search_term: this.newListener.searchTerm
+                    search_term: this.newListener.searchTerm,
+                    min_price: this.newListener.minPrice,
+                    max_price: this.newListener.maxPrice
                 });
                 
                 this.showNotification('Listener added successfully! You will receive email notifications when matching items are found.', 'success');
                 
                 // Clear form
-                this.newListener = { email: '', searchTerm: '' };
+                this.newListener = { email: '', searchTerm: '', minPrice: '', maxPrice: '' };
                 
                 // Reload stats
                 this.loadStats();
@@ -72,6 +87,9 @@ createApp({
                 const response = await axios.get(`${this.apiBaseUrl}/listeners/${encodeURIComponent(this.searchEmail)}`);
                 this.listeners = response.data.listeners;
                 
+                // Follow live matches for this email
+                this.connectEvents(this.searchEmail);
+                
                 if (this.listeners.length === 0) {
                     this.showNotification('No listeners found for this email address', 'info');
                 }
@@ -146,8 +164,15 @@ createApp({
             this.loading = true;
             
             try {
-                await axios.post(`${this.apiBaseUrl}/manual-check`);
-                this.showNotification('Manual auction check started! This will run in the background.', 'info');
+                const response = await axios.post(`${this.apiBaseUrl}/manual-check`);
+                this.watchedJobId = response.data.job.id;
+                
+                if (this.events) {
+                    this.checkJob = response.data.job;
+                    this.showNotification(`${response.data.message}. Progress is shown below.`, 'info');
+                } else {
+                    this.showNotification(`${response.data.message}. This will run in the background.`, 'info');
+                }
                 
             } catch (error) {
                 let message = 'Failed to start manual check';
@@ -160,6 +185,46 @@ createApp({
             }
         },
         
+        connectEvents(email = null) {
+            // Live check progress and matches, pushed by the server instead of polled
+            if (!window.EventSource) return;
+            if (this.events) this.events.close();
+            
+            const query = email ? `?email=${encodeURIComponent(email)}` : '';
+            const source = new EventSource(`${this.apiBaseUrl}/events${query}`);
+            this.events = source;
+            
+            source.addEventListener('job', (event) => {
+                const job = JSON.parse(event.data);
+                if (job.kind !== 'full' && job.id !== this.watchedJobId) return;
+                this.checkJob = job;
+                
+                if (job.id === this.watchedJobId && ['completed', 'failed'].includes(job.status)) {
+                    this.watchedJobId = null;
+                    if (job.status === 'completed') {
+                        this.showNotification(`Check finished: ${job.new_items || 0} new items, ` +
+                                              `${job.notifications_sent || 0} notifications sent`, 'success');
+                    } else {
+                        this.showNotification(`Check failed: ${job.error || 'unknown error'}`, 'error');
+                    }
+                    this.loadStats();
+                }
+            });
+            
+            source.addEventListener('match', (event) => {
+                const match = JSON.parse(event.data);
+                this.liveMatches = [match, ...this.liveMatches].slice(0, 20);
+                this.showNotification(`New match for "${match.search_term}": ${match.title}`, 'success');
+            });
+            
+            source.onerror = () => {
+                // The browser retries by itself unless the server refused the stream
+                if (source.readyState === EventSource.CLOSED && this.events === source) {
+                    this.events = null;
+                }
+            };
+        },
+        
         async loadStats() {
             try {
                 const response = await axios.get(`${this.apiBaseUrl}/stats`);